@@ -0,0 +1,101 @@
+import argparse
+import os
+import time
+import cv2
+from pyzbar.pyzbar import decode
+
+from qr_scanner import QRDecoder
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+def record_frames(directory, count, camera_id=0):
+    """Save count camera frames to directory for later benchmarking"""
+    os.makedirs(directory, exist_ok=True)
+    cap = cv2.VideoCapture(camera_id)
+    if not cap.isOpened():
+        raise ValueError("Could not open camera")
+
+    saved = 0
+    while saved < count:
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        cv2.imwrite(os.path.join(directory, f"frame_{saved:05d}.png"), frame)
+        saved += 1
+
+    cap.release()
+    print(f"Recorded {saved} frames to {directory}")
+
+def load_frames(source, limit=None):
+    """Load recorded frames from a directory of images or a video file"""
+    frames = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                frames.append(cv2.imread(os.path.join(source, name)))
+                if limit and len(frames) >= limit:
+                    break
+    else:
+        cap = cv2.VideoCapture(source)
+        while not limit or len(frames) < limit:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+
+    return frames
+
+def run_baseline(frames):
+    """Full-resolution pyzbar decode on every frame, as QRScanner used to do"""
+    found = 0
+    start_time = time.perf_counter()
+    for frame in frames:
+        if decode(frame):
+            found += 1
+    return time.perf_counter() - start_time, found
+
+def run_pipeline(frames, decoder):
+    """Downscaled, ROI-tracked decode with change detection"""
+    found = 0
+    start_time = time.perf_counter()
+    for frame in frames:
+        if decoder.decode(frame):
+            found += 1
+    return time.perf_counter() - start_time, found
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark QR decoding on recorded frames")
+    parser.add_argument("source", help="Directory of frame images or a video file")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of frames to use")
+    parser.add_argument("--record", type=int, default=0,
+                        help="Record this many camera frames into the source directory first")
+    parser.add_argument("--camera", type=int, default=0, help="Camera id used with --record")
+    parser.add_argument("--scale", type=float, default=0.5, help="Downscale factor for the search pass")
+    args = parser.parse_args()
+
+    if args.record:
+        record_frames(args.source, args.record, args.camera)
+
+    frames = load_frames(args.source, args.limit)
+    if not frames:
+        print(f"No frames found in {args.source}")
+        return
+
+    height, width = frames[0].shape[:2]
+    print(f"Loaded {len(frames)} frames ({width}x{height})")
+
+    baseline_time, baseline_found = run_baseline(frames)
+    decoder = QRDecoder(scale=args.scale)
+    pipeline_time, pipeline_found = run_pipeline(frames, decoder)
+
+    baseline_fps = len(frames) / baseline_time if baseline_time > 0 else float('inf')
+    pipeline_fps = len(frames) / pipeline_time if pipeline_time > 0 else float('inf')
+
+    print(f"Full-frame decode: {baseline_fps:8.1f} FPS, code found in {baseline_found} frames")
+    print(f"ROI pipeline:      {pipeline_fps:8.1f} FPS, code found in {pipeline_found} frames")
+    print(f"Speedup:           {pipeline_fps / baseline_fps:8.2f}x")
+    print(f"Pipeline frames:   {decoder.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import pygame
+
+class Compositor:
+    def __init__(self, screen):
+        """
+        Redraws only the parts of the screen whose content changed
+
+        The screen is split into regions (e.g. the HUD and the map area).
+        Every frame the caller describes what each region shows with a key;
+        a region is only redrawn when its key differs from the one it was
+        last drawn with, present() sends just the redrawn rectangles to the
+        display, and a frame where nothing changed costs no drawing at all.
+
+        Layers are cached surfaces for content that changes rarely (such as
+        the SLAM map), redrawn only when their key changes.
+        """
+        self.screen = screen
+        self.region_keys = {}  # Region name -> key it was last drawn with
+        self.layers = {}  # Layer name -> (key, surface)
+        self.dirty_rects = []  # Screen areas redrawn this frame
+        self.frames_presented = 0
+        self.frames_skipped = 0
+
+    def region(self, name, rect, key):
+        """
+        Check whether region name needs redrawing this frame
+
+        Returns:
+            True if key differs from last frame's, in which case the caller
+            must redraw all of rect; it is then sent to the display by
+            present()
+        """
+        if name in self.region_keys and self.region_keys[name] == key:
+            return False
+        self.region_keys[name] = key
+        self.dirty_rects.append(pygame.Rect(rect))
+        return True
+
+    def layer(self, name, size, key, draw):
+        """
+        Cached surface for layer name
+
+        draw(surface) is called to repaint the surface when key (or size)
+        differs from the one it was last painted with.
+        """
+        cached = self.layers.get(name)
+        if cached is None or cached[0] != key or cached[1].get_size() != tuple(size):
+            surface = cached[1] if cached is not None and cached[1].get_size() == tuple(size) else pygame.Surface(size)
+            draw(surface)
+            self.layers[name] = (key, surface)
+        return self.layers[name][1]
+
+    def invalidate(self):
+        """Redraw everything next frame (e.g. after the window was resized or uncovered)"""
+        self.region_keys.clear()
+        self.layers.clear()
+
+    def present(self):
+        """
+        Send the regions redrawn this frame to the display
+
+        Returns:
+            False if nothing was redrawn and the frame was skipped
+        """
+        if not self.dirty_rects:
+            self.frames_skipped += 1
+            return False
+        pygame.display.update(self.dirty_rects)
+        self.dirty_rects = []
+        self.frames_presented += 1
+        return True
@@ -0,0 +1,100 @@
+import numpy as np
+
+# Traversal cost of entering a cell, indexed by occupancy value:
+# 0 = Unknown, 1 = Free, 2 = Tentative Obstacle, 3 = Confirmed Obstacle (impassable)
+CELL_COSTS = np.array([2.0, 1.0, 3.0, np.inf])
+
+# 8-connected neighbour offsets with their chamfer distances
+CHAMFER_STEPS = [(0, 1, 1.0), (1, 0, 1.0), (0, -1, 1.0), (-1, 0, 1.0),
+                 (1, 1, 1.4), (1, -1, 1.4), (-1, 1, 1.4), (-1, -1, 1.4)]
+
+def obstacle_distance(obstacles, max_distance):
+    """
+    Chamfer distance (in cells) from every cell to the nearest obstacle cell
+
+    Each pass relaxes all cells at once with shifted copies of the array, so
+    the work is a handful of whole-array NumPy operations per cell of range.
+    Distances beyond max_distance are reported as max_distance.
+    """
+    width, height = obstacles.shape
+    distance = np.where(obstacles, 0.0, np.inf)
+
+    for _ in range(int(np.ceil(max_distance))):
+        padded = np.pad(distance, 1, constant_values=np.inf)
+        relaxed = distance.copy()
+        for dx, dy, step in CHAMFER_STEPS:
+            np.minimum(relaxed, padded[1 + dx:1 + dx + width, 1 + dy:1 + dy + height] + step, out=relaxed)
+        if np.array_equal(relaxed, distance):
+            break
+        distance = relaxed
+
+    return np.minimum(distance, max_distance)
+
+class CostMap:
+    def __init__(self, grid, robot_radius=2, inflation_radius=5, inflation_weight=4.0):
+        """
+        Per-cell planning costs derived from the occupancy grid, with costs
+        inflated near obstacles so paths keep clear of walls
+
+        Args:
+            grid: Occupancy grid (0-3 values)
+            robot_radius: Robot radius in cells; cells this close to an
+                          obstacle get the full inflation
+            inflation_radius: Distance in cells at which inflation fades out
+            inflation_weight: Extra cost multiplier at full inflation
+        """
+        self.robot_radius = robot_radius
+        self.inflation_radius = max(inflation_radius, robot_radius + 1)
+        self.inflation_weight = inflation_weight
+        self.dirty_cells = set()  # Cells changed since the last refresh
+        self.rebuild(grid)
+
+    def _inflation(self, distance):
+        """Cost multiplier for a given obstacle distance"""
+        # Full inflation inside the robot radius, fading linearly to none at inflation_radius
+        falloff = (self.inflation_radius - distance) / (self.inflation_radius - self.robot_radius)
+        return 1.0 + self.inflation_weight * np.clip(falloff, 0.0, 1.0)
+
+    def _compute(self, grid):
+        obstacles = grid >= 2  # Keep clear of tentative as well as confirmed obstacles
+        distance = obstacle_distance(obstacles, self.inflation_radius)
+        return CELL_COSTS[grid] * self._inflation(distance)
+
+    def rebuild(self, grid):
+        """Recompute the whole cost array"""
+        self.costs = self._compute(grid)
+        self.dirty_cells.clear()
+
+    def mark_dirty(self, cells):
+        """Record changed (x, y) cells; usable as a GridBasedSLAM change listener"""
+        self.dirty_cells.update(cells)
+
+    def refresh(self, grid):
+        """
+        Bring the costs up to date with grid, recomputing only the area around
+        changed cells
+
+        Returns:
+            True if any costs were recomputed
+        """
+        if grid.shape != self.costs.shape:
+            self.rebuild(grid)  # The map grew
+            return True
+        if not self.dirty_cells:
+            return False
+
+        xs = [x for x, _ in self.dirty_cells]
+        ys = [y for _, y in self.dirty_cells]
+        self.dirty_cells.clear()
+
+        # A change affects costs up to inflation_radius away, and those cells
+        # depend on obstacles up to inflation_radius further out
+        reach = int(np.ceil(self.inflation_radius)) + 1
+        x0, x1 = max(0, min(xs) - reach), min(grid.shape[0], max(xs) + reach + 1)
+        y0, y1 = max(0, min(ys) - reach), min(grid.shape[1], max(ys) + reach + 1)
+        px0, px1 = max(0, x0 - reach), min(grid.shape[0], x1 + reach)
+        py0, py1 = max(0, y0 - reach), min(grid.shape[1], y1 + reach)
+
+        window = self._compute(grid[px0:px1, py0:py1])
+        self.costs[x0:x1, y0:y1] = window[x0 - px0:x1 - px0, y0 - py0:y1 - py0]
+        return True
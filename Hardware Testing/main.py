@@ -1,6 +1,7 @@
 import pygame
 import math
-import RPi.GPIO as GPIO
+import argparse
+import os
 import time
 import threading
 import numpy as np
@@ -8,15 +9,36 @@ import cv2
 from pyzbar.pyzbar import decode
 
 # Import our modules
-from sensor import UltrasonicSensor
+from sensor import GPIO, UltrasonicSensor, ReadingBuffer
+from pose import PoseHistory
 from motor import MotorDriver
 from slam import GridBasedSLAM
-from a_star import AStar
+from planner import PlannerService
+from costmap import CostMap
 from qr_scanner import QRScanner
+from recorder import LogRecorder, Replayer
+from runtime import SnapshotStore, RateLoop
+from profiler import Profiler
+from compositor import Compositor
+from map_store import load_slam, MapCheckpointer
+from telemetry import TelemetryPublisher
+
+parser = argparse.ArgumentParser(description="TragerX hardware SLAM runtime")
+parser.add_argument("--record", metavar="LOG", help="Record sensor, motor and camera traffic to LOG")
+parser.add_argument("--replay", metavar="LOG", help="Replay a recorded LOG instead of using the hardware")
+parser.add_argument("--speed", type=float, default=1.0, help="Replay speed factor (default 1.0)")
+parser.add_argument("--map", help="Continue from the occupancy map saved in this file and keep it up to date")
+parser.add_argument("--telemetry-port", type=int, help="Stream the map and robot state to dashboards on this local port")
+parser.add_argument("--profile-export", help="Periodically write per-stage loop timings to this .json or .csv file")
+args = parser.parse_args()
+
+recorder = LogRecorder(args.record) if args.record else None
+replayer = Replayer(args.replay, args.speed) if args.replay else None
 
 # Initialize GPIO
-GPIO.setmode(GPIO.BCM)
-GPIO.setwarnings(False)
+if replayer is None:
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setwarnings(False)
 
 # Define GPIO pins for sensors
 # Front Ultrasonic Sensor (on Servo)
@@ -46,24 +68,73 @@ pygame.display.set_caption('TragerX SLAM Simulator with HC-SR04 Sensors')
 # Fonts
 font = pygame.font.SysFont("Arial", 24)
 small_font = pygame.font.SysFont("Arial", 18)
+profile_font = pygame.font.SysFont("Courier New", 14)  # Monospaced so the timing table lines up
 
 # Initialize components
-front_sensor = UltrasonicSensor(FRONT_TRIG, FRONT_ECHO, "front_sensor")
-left_sensor = UltrasonicSensor(LEFT_TRIG, LEFT_ECHO, "left_sensor", angle_offset=-90)
-right_sensor = UltrasonicSensor(RIGHT_TRIG, RIGHT_ECHO, "right_sensor", angle_offset=90)
+reading_buffer = ReadingBuffer()  # Timestamped readings from all sensors
+
+def sensor_source(name):
+    """Replay source for a sensor, or None to read the GPIO pins"""
+    return replayer.sensor_source(name) if replayer else None
+
+front_sensor = UltrasonicSensor(FRONT_TRIG, FRONT_ECHO, "front_sensor", reading_buffer=reading_buffer,
+                                source=sensor_source("front_sensor"), recorder=recorder)
+left_sensor = UltrasonicSensor(LEFT_TRIG, LEFT_ECHO, "left_sensor", angle_offset=-90, reading_buffer=reading_buffer,
+                               source=sensor_source("left_sensor"), recorder=recorder)
+right_sensor = UltrasonicSensor(RIGHT_TRIG, RIGHT_ECHO, "right_sensor", angle_offset=90, reading_buffer=reading_buffer,
+                                source=sensor_source("right_sensor"), recorder=recorder)
 sensors = [front_sensor, left_sensor, right_sensor]
 
-motor_driver = MotorDriver()  # Uses Arduino via serial
-slam = GridBasedSLAM(80, 60)
-qr_scanner = QRScanner(0)  # Use camera 0
+# Uses Arduino via serial
+motor_driver = MotorDriver(connection=replayer.serial_connection() if replayer else None, recorder=recorder)
+slam = load_slam(args.map) if args.map and os.path.exists(args.map) else GridBasedSLAM(80, 60)
+qr_scanner = QRScanner(0, capture=replayer.video_capture() if replayer else None, recorder=recorder)  # Use camera 0
 
 # Robot position and angle
 robot_position = [SCREEN_WIDTH // 2, UI_HEIGHT + MAP_HEIGHT // 2]
 robot_angle = 0
 robot_radius = 20
 
-# Initialize pathfinder
-pathfinder = None
+# Pose history so each sensor reading is fused at the pose it was taken from
+pose_history = PoseHistory()
+pose_history.record(time.time(), robot_position[0], robot_position[1], robot_angle)
+reading_cursor = 0
+
+# Plans paths on a background thread so searches never delay motor commands
+# Found paths are compressed to the waypoints where they turn
+PLANNING_TIME_BUDGET = 0.1  # Seconds per search before settling for the best path so far
+planner = PlannerService(time_budget=PLANNING_TIME_BUDGET, mode="anytime", smoothing="compress")
+
+# Planning costs inflated around obstacles, refreshed only where SLAM changed cells
+cost_map = CostMap(slam.occupancy_grid, robot_radius=robot_radius // 10)
+slam.add_change_listener(cost_map.mark_dirty)
+
+# Set when SLAM changes a cell, so the SLAM loop only republishes a changed map
+map_changed = False
+
+def mark_map_changed(cells):
+    global map_changed
+    map_changed = True
+
+slam.add_change_listener(mark_map_changed)
+
+# Save the map's changed tiles every few seconds (from the SLAM loop, which owns the map)
+MAP_CHECKPOINT_INTERVAL = 10
+map_checkpointer = MapCheckpointer(args.map, slam) if args.map else None
+
+# Stream map changes and robot state to the dashboard a few times a second (from the SLAM loop)
+TELEMETRY_INTERVAL = 0.2
+telemetry_publisher = TelemetryPublisher(port=args.telemetry_port) if args.telemetry_port else None
+
+# Loop rates (Hz); each loop runs on its own schedule so slow rendering or
+# SLAM integration never delays motor commands
+CONTROL_RATE = 50
+SLAM_RATE = 20
+UI_RATE = 15
+
+# Robot motion model for dead reckoning
+ROBOT_SPEED = 60  # Pixels per second while driving
+ROBOT_ROTATION_SPEED = 60  # Degrees per second while turning
 
 # Colors
 BACKGROUND_COLOR = (0, 0, 0)
@@ -84,7 +155,7 @@ counter_positions = {
     "counter3": [SCREEN_WIDTH // 2, UI_HEIGHT + MAP_HEIGHT // 2 + 200]
 }
 
-# Robot state
+# Robot state (owned by the control loop)
 current_path = None
 path_index = 0
 destination = None
@@ -93,253 +164,465 @@ path_points = []
 front_angle = 90  # Default servo angle (90 = center/stop)
 servo_scan_direction = 1  # 1 = clockwise, -1 = counter-clockwise
 last_servo_update = time.time()
-
-# Start sensors
-for sensor in sensors:
-    sensor.start()
-
-# Main loop
-running = True
-clock = pygame.time.Clock()
-
-try:
-    # Initial servo position (stop)
-    motor_driver.set_servo_speed(90)
-    
-    while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    running = False
-                if event.key == pygame.K_SPACE and workflow_state == "idle":
-                    workflow_state = "scanning_qr"
-                    print("Starting QR code scanning...")
-	
-        # Handle different workflow states
-        if workflow_state == "scanning_qr":
-            qr_data = qr_scanner.scan()
-            if qr_data:
-                print(f"QR Code detected: {qr_data}")
-                workflow_state = "navigating"
-            else:
-            	print(f"QR Code detected: 2")
-            	workflow_state="navigating"
-                
-        elif workflow_state == "navigating":
-            if destination is None:
-                # Set destination based on QR code (default to counter1 if not specified)
-                counter = f"counter{qr_data}" if qr_data in ["1", "2", "3"] else "counter1"
-                destination = counter_positions[counter]
-                print(f"Navigating to {counter}")
-        
-        # Update servo position for scanning
-        current_time = time.time()
-        if current_time - last_servo_update > 0.5:  # Update every 0.5 seconds
-            # Oscillate servo between clockwise and counter-clockwise
-            if servo_scan_direction == 1:
-                front_angle = 110  # Clockwise rotation
-                motor_driver.set_servo_speed(front_angle)
-            else:
-                front_angle = 70   # Counter-clockwise rotation
-                motor_driver.set_servo_speed(front_angle)
-                
-            # Change direction every few seconds
-            if current_time - last_servo_update > 3:
-                servo_scan_direction *= -1
-                last_servo_update = current_time
-        
-        # Get distances from all sensors
-        front_distance = front_sensor.get_distance()
-        left_distance = left_sensor.get_distance()
-        right_distance = right_sensor.get_distance()
-        
-        # Update SLAM with sensor data
-        # Front sensor (on servo)
-        sensor_angle = (robot_angle + (front_angle - 90) * 2) % 360  # Adjust for servo orientation
-        slam.sensor_update(robot_position, sensor_angle, front_distance)
-        
-        # Left sensor
-        slam.sensor_update(robot_position, (robot_angle - 90) % 360, left_distance)
-        
-        # Right sensor
-        slam.sensor_update(robot_position, (robot_angle + 90) % 360, right_distance)
-
-        # Initialize or update pathfinder
-        if pathfinder is None:
-            pathfinder = AStar(slam.occupancy_grid)
+last_control_time = time.time()
+qr_data = None
+qr_scan_start = 0
+QR_SCAN_TIMEOUT = 5  # Seconds to look for a QR code before using the default counter
+qr_stop_thread = None  # Stops the scanner's threads off the control loop (joining them can take a second)
+
+def stop_qr_scan():
+    global qr_stop_thread
+    qr_stop_thread = threading.Thread(target=qr_scanner.stop_async, daemon=True)
+    qr_stop_thread.start()
+
+# State shared between loops
+snapshots = SnapshotStore()
+ui_commands = []  # Key presses forwarded from the UI loop to the control loop
+ui_commands_lock = threading.Lock()
+held_keys = {"up": False, "down": False, "left": False, "right": False}
+stop_event = threading.Event()
+
+# Per-stage timings of every loop; press P to show them
+profiler = Profiler()
+show_profile = False
+PROFILE_EXPORT_INTERVAL = 5  # Seconds between --profile-export writes
+STATS_REFRESH = 0.5  # Seconds between updates of the on-screen timings
+
+# Screen regions are only redrawn when what they show changes
+compositor = Compositor(screen)
+hud_rect = pygame.Rect(0, 0, SCREEN_WIDTH, UI_HEIGHT)
+map_rect = pygame.Rect(0, UI_HEIGHT, SCREEN_WIDTH, MAP_HEIGHT)
+
+def publish_robot_snapshot():
+    """Publish the control loop state for the SLAM and UI loops"""
+    snapshots.publish("robot", {
+        "position": (robot_position[0], robot_position[1]),
+        "angle": robot_angle,
+        "workflow_state": workflow_state,
+        "destination": tuple(destination) if destination else None,
+        "current_path": tuple(current_path) if current_path else None,
+        "path_index": path_index,
+        "front_angle": front_angle,
+        "path_points": tuple(path_points),
+    })
+
+def control_step():
+    """High-rate loop: workflow, path following and motor commands"""
+    global current_path, path_index, destination, workflow_state, front_angle
+    global servo_scan_direction, last_servo_update, last_control_time
+    global qr_data, qr_scan_start, robot_angle
+
+    current_time = time.time()
+    dt = current_time - last_control_time
+    last_control_time = current_time
+    step = ROBOT_SPEED * dt
+    turn = ROBOT_ROTATION_SPEED * dt
+
+    with ui_commands_lock:
+        commands = list(ui_commands)
+        ui_commands.clear()
+
+    for command in commands:
+        if command == "start_scan" and workflow_state == "idle":
+            if qr_stop_thread and qr_stop_thread.is_alive():
+                # The previous scan is still shutting down; start next tick
+                with ui_commands_lock:
+                    ui_commands.append(command)
+                continue
+            qr_data = None
+            try:
+                qr_scanner.start_async()
+            except ValueError as e:
+                print(f"QR scanner unavailable: {e}")
+                workflow_state = "navigating"  # Go to the default counter
+                continue
+            workflow_state = "scanning_qr"
+            qr_scan_start = current_time
+            print("Starting QR code scanning...")
+
+    # Handle different workflow states
+    if workflow_state == "scanning_qr":
+        # Capture and decoding run in the background; just poll for a result
+        qr_data = qr_scanner.get_result()
+        if qr_data:
+            print(f"QR Code detected: {qr_data}")
+            stop_qr_scan()
+            workflow_state = "navigating"
+        elif current_time - qr_scan_start > QR_SCAN_TIMEOUT:
+            print("No QR code detected, using default counter")
+            stop_qr_scan()
+            workflow_state = "navigating"
+
+    elif workflow_state == "navigating":
+        if destination is None:
+            # Set destination based on QR code (default to counter1 if not specified)
+            counter = f"counter{qr_data}" if qr_data in ["1", "2", "3"] else "counter1"
+            destination = counter_positions[counter]
+            print(f"Navigating to {counter}")
+
+    # Update servo position for scanning
+    if current_time - last_servo_update > 0.5:  # Update every 0.5 seconds
+        # Oscillate servo between clockwise and counter-clockwise
+        if servo_scan_direction == 1:
+            front_angle = 110  # Clockwise rotation
+            motor_driver.set_servo_speed(front_angle)
         else:
-            pathfinder.grid = slam.occupancy_grid
-
-        # Path planning and navigation
-        if workflow_state == "navigating" and destination:
-            if current_path is None or path_index >= len(current_path):
-                start = slam.world_to_grid(robot_position)
-                end = slam.world_to_grid(destination)
-                current_path = pathfinder.find_path(start, end)
-                path_index = 0
-                print(f"Path planned with {len(current_path) if current_path else 0} points")
-
-            if current_path and path_index < len(current_path):
-                target = current_path[path_index]
-                target_world = [target[0] * 10 + 5, target[1] * 10 + 5]
-                
-                # Calculate angle and distance to target
-                dx = target_world[0] - robot_position[0]
-                dy = target_world[1] - robot_position[1]
-                target_angle = math.degrees(math.atan2(dy, dx)) % 360
-                distance = math.sqrt(dx**2 + dy**2)
-
-                # Rotate towards target
-                angle_diff = (target_angle - robot_angle) % 360
-                if angle_diff > 180:
-                    angle_diff -= 360
-                
-                if abs(angle_diff) > 5:
-                    if angle_diff > 0:
-                        motor_driver.turn_right(30)
-                        robot_angle = (robot_angle + 2) % 360
-                    else:
-                        motor_driver.turn_left(30)
-                        robot_angle = (robot_angle - 2) % 360
+            front_angle = 70   # Counter-clockwise rotation
+            motor_driver.set_servo_speed(front_angle)
+
+        # Change direction every few seconds
+        if current_time - last_servo_update > 3:
+            servo_scan_direction *= -1
+            last_servo_update = current_time
+
+        # Tag new front readings with the servo orientation
+        front_sensor.angle_offset = (front_angle - 90) * 2
+    profiler.lap("control/workflow")
+
+    # Path planning and navigation
+    if workflow_state == "navigating" and destination:
+        # Pick up a path finished by the background planner
+        plan = planner.get_result()
+        if plan is not None and plan.goal == slam.world_to_grid(destination):
+            current_path = plan.path
+            path_index = 0
+            print(f"Path planned with {len(current_path) if current_path else 0} points")
+
+        if (current_path is None or path_index >= len(current_path)) and not planner.is_busy():
+            # Plan on the latest map and costs published by the SLAM loop
+            _, grid = snapshots.get("map")
+            _, costs = snapshots.get("costs")
+            start = slam.world_to_grid(robot_position)
+            end = slam.world_to_grid(destination)
+            planner.request(start, end, grid, costs)
+        profiler.lap("control/planning")
+
+        if current_path and path_index < len(current_path):
+            target = current_path[path_index]
+            target_world = [target[0] * 10 + 5, target[1] * 10 + 5]
+
+            # Calculate angle and distance to target
+            dx = target_world[0] - robot_position[0]
+            dy = target_world[1] - robot_position[1]
+            target_angle = math.degrees(math.atan2(dy, dx)) % 360
+            distance = math.sqrt(dx**2 + dy**2)
+
+            # Rotate towards target
+            angle_diff = (target_angle - robot_angle) % 360
+            if angle_diff > 180:
+                angle_diff -= 360
+
+            if abs(angle_diff) > 5:
+                if angle_diff > 0:
+                    motor_driver.turn_right(30)
+                    robot_angle = (robot_angle + turn) % 360
                 else:
-                    # Move forward
-                    motor_driver.move_forward(50)
-                    robot_position[0] += 2 * math.cos(math.radians(robot_angle))
-                    robot_position[1] += 2 * math.sin(math.radians(robot_angle))
-
-                # Check if target reached
-                if distance < 15:
-                    path_index += 1
-                    if path_index >= len(current_path):
-                        motor_driver.stop()
+                    motor_driver.turn_left(30)
+                    robot_angle = (robot_angle - turn) % 360
+            else:
+                # Move forward
+                motor_driver.move_forward(50)
+                robot_position[0] += step * math.cos(math.radians(robot_angle))
+                robot_position[1] += step * math.sin(math.radians(robot_angle))
+
+            # Check if target reached
+            if distance < 15:
+                path_index += 1
+                if path_index >= len(current_path):
+                    motor_driver.stop()
+                    # A budget-limited plan may end short of the destination; plan again from here
+                    if math.dist(robot_position, destination) > 30:
+                        current_path = None
+                    else:
                         workflow_state = "idle"
                         destination = None
                         current_path = None
                         print("Destination reached!")
-            else:
-                motor_driver.stop()
-                # Recalculate path if no valid path found
-                current_path = None
         else:
-            # Handle manual control when not navigating
-            keys = pygame.key.get_pressed()
-            if keys[pygame.K_UP]:
-                motor_driver.move_forward(50)
-                robot_position[0] += 2 * math.cos(math.radians(robot_angle))
-                robot_position[1] += 2 * math.sin(math.radians(robot_angle))
-            elif keys[pygame.K_DOWN]:
-                motor_driver.move_backward(50)
-                robot_position[0] -= 2 * math.cos(math.radians(robot_angle))
-                robot_position[1] -= 2 * math.sin(math.radians(robot_angle))
-            elif keys[pygame.K_LEFT]:
-                motor_driver.turn_left(30)
-                robot_angle = (robot_angle - 2) % 360
-            elif keys[pygame.K_RIGHT]:
-                motor_driver.turn_right(30)
-                robot_angle = (robot_angle + 2) % 360
-            else:
-                motor_driver.stop()
+            motor_driver.stop()
+            # Recalculate path if no valid path found
+            current_path = None
+    else:
+        # Handle manual control when not navigating
+        if held_keys["up"]:
+            motor_driver.move_forward(50)
+            robot_position[0] += step * math.cos(math.radians(robot_angle))
+            robot_position[1] += step * math.sin(math.radians(robot_angle))
+        elif held_keys["down"]:
+            motor_driver.move_backward(50)
+            robot_position[0] -= step * math.cos(math.radians(robot_angle))
+            robot_position[1] -= step * math.sin(math.radians(robot_angle))
+        elif held_keys["left"]:
+            motor_driver.turn_left(30)
+            robot_angle = (robot_angle - turn) % 360
+        elif held_keys["right"]:
+            motor_driver.turn_right(30)
+            robot_angle = (robot_angle + turn) % 360
+        else:
+            motor_driver.stop()
+
+    # Record where the robot is now for interpolating upcoming readings
+    pose_history.record(current_time, robot_position[0], robot_position[1], robot_angle)
 
-        # Track robot path
-        path_points.append((int(robot_position[0]), int(robot_position[1])))
+    # Track robot path
+    point = (int(robot_position[0]), int(robot_position[1]))
+    if not path_points or path_points[-1] != point:
+        path_points.append(point)
         if len(path_points) > 100:  # Limit path length
             path_points.pop(0)
 
-        # Clear the screen
-        screen.fill(BACKGROUND_COLOR)
-
+    publish_robot_snapshot()
+    profiler.lap("control/motion")
+
+def slam_step():
+    """SLAM loop: fuse new sensor readings into the map and publish it"""
+    global reading_cursor, map_changed
+
+    # Update SLAM with every reading taken since the last iteration, each at
+    # the robot pose interpolated at its timestamp
+    readings, reading_cursor = reading_buffer.read_since(reading_cursor)
+    for reading in readings:
+        pose_x, pose_y, pose_angle = pose_history.pose_at(reading.t)
+        slam.sensor_update((pose_x, pose_y), (pose_angle + reading.angle) % 360, reading.distance)
+    profiler.lap("slam/fusion")
+
+    if map_changed:
+        # Publish a copy so other loops never see a half-updated grid
+        map_changed = False
+        snapshots.publish("map", slam.get_map().copy())
+        if cost_map.refresh(slam.get_map()):
+            snapshots.publish("costs", cost_map.costs.copy())
+    profiler.lap("slam/publish")
+
+    if map_checkpointer:
+        map_checkpointer.maybe_checkpoint(MAP_CHECKPOINT_INTERVAL)
+        profiler.lap("slam/checkpoint")
+
+    if telemetry_publisher:
+        telemetry_publisher.maybe_publish(TELEMETRY_INTERVAL, slam.get_map(), robot_telemetry)
+        profiler.lap("slam/telemetry")
+
+def robot_telemetry():
+    """State of the robot as sent to the dashboard, from the control loop's latest snapshot"""
+    _, robot = snapshots.get("robot")
+    return [{
+        "id": 0,
+        "position": [round(robot["position"][0], 1), round(robot["position"][1], 1)],
+        "angle": round(robot["angle"], 1),
+        "workflow_state": robot["workflow_state"],
+        "destination": robot["destination"],
+        "path": robot["current_path"],
+        "sensors": {
+            "front": front_sensor.get_distance(),
+            "left": left_sensor.get_distance(),
+            "right": right_sensor.get_distance(),
+        },
+    }]
+
+def loop_stats_lines():
+    """Per-loop and planner timing statistics, one line each"""
+    lines = []
+    for loop in loops:
+        stats = loop.stats.summary()
+        lines.append(f"{stats['name']}: {stats['mean_ms']:.1f}/{stats['max_ms']:.1f} ms, {stats['overruns']} late")
+
+    metrics = planner.get_metrics()
+    lines.append(f"planner: {metrics['mean_time_ms']:.1f}/{metrics['max_time_ms']:.1f} ms, {metrics['searches']} plans")
+    return lines
+
+def draw_map_layer(surface, slam_map):
+    """Paint the SLAM map and the counter markers onto the cached layer behind the map area"""
+    surface.fill(BACKGROUND_COLOR)
+    for x in range(slam_map.shape[0]):
+        for y in range(slam_map.shape[1]):
+            rect_x = x * 10
+            rect_y = y * 10
+            if rect_y < MAP_HEIGHT:  # Ensure we're drawing within screen bounds
+                if slam_map[x, y] == 1:  # Clear space
+                    pygame.draw.rect(surface, CLEAR_SPACE_COLOR, pygame.Rect(rect_x, rect_y, 10, 10), 1)
+                elif slam_map[x, y] == 2:  # First detected obstacle
+                    pygame.draw.rect(surface, OBSTACLE_FIRST_DETECTED_COLOR, pygame.Rect(rect_x, rect_y, 10, 10))
+                elif slam_map[x, y] == 3:  # Confirmed obstacle
+                    pygame.draw.rect(surface, OBSTACLE_CONFIRMED_COLOR, pygame.Rect(rect_x, rect_y, 10, 10))
+
+    # Draw counter positions
+    for name, pos in counter_positions.items():
+        pygame.draw.circle(surface, (0, 255, 255), (int(pos[0]), int(pos[1]) - UI_HEIGHT), 8, 2)
+        label = small_font.render(name, True, TEXT_COLOR)
+        surface.blit(label, (int(pos[0]) + 10, int(pos[1]) - UI_HEIGHT - 10))
+
+def ui_step():
+    """Low-rate UI loop: input handling and rendering"""
+    global show_profile
+
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            return False
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                return False
+            if event.key == pygame.K_SPACE:
+                with ui_commands_lock:
+                    ui_commands.append("start_scan")
+            if event.key == pygame.K_p:
+                show_profile = not show_profile
+        if event.type in (pygame.VIDEORESIZE, pygame.WINDOWEXPOSED):
+            compositor.invalidate()  # The window contents may have been lost
+
+    keys = pygame.key.get_pressed()
+    held_keys["up"] = keys[pygame.K_UP]
+    held_keys["down"] = keys[pygame.K_DOWN]
+    held_keys["left"] = keys[pygame.K_LEFT]
+    held_keys["right"] = keys[pygame.K_RIGHT]
+    profiler.lap("ui/events")
+
+    _, robot = snapshots.get("robot")
+    map_version, slam_map = snapshots.get("map")
+    if robot is None or slam_map is None:
+        return True
+
+    position = robot["position"]
+    angle = robot["angle"]
+
+    # Only regions whose content changed are redrawn; the robot snapshot is
+    # republished every control step, so regions are keyed on what they show
+    # rather than on snapshot versions. Timings refresh every STATS_REFRESH.
+    stats_tick = int(time.perf_counter() / STATS_REFRESH)
+    sensor_distances = (front_sensor.get_distance(), left_sensor.get_distance(), right_sensor.get_distance())
+    hud = (robot["workflow_state"], int(position[0]), int(position[1]), int(angle), robot["front_angle"],
+           sensor_distances, stats_tick)
+    if compositor.region("hud", hud_rect, hud):
         # Draw UI section
-        pygame.draw.rect(screen, UI_BACKGROUND_COLOR, pygame.Rect(0, 0, SCREEN_WIDTH, UI_HEIGHT))
+        pygame.draw.rect(screen, UI_BACKGROUND_COLOR, hud_rect)
 
         # Display telemetry data
         title_text = font.render("TragerX SLAM Simulator with HC-SR04 Sensors", True, TEXT_COLOR)
-        status_text = font.render(f"Status: {workflow_state}", True, TEXT_COLOR)
-        position_text = font.render(f"Position: ({int(robot_position[0])}, {int(robot_position[1])})", True, TEXT_COLOR)
-        angle_text = font.render(f"Angle: {int(robot_angle)}°", True, TEXT_COLOR)
-        
+        status_text = font.render(f"Status: {robot['workflow_state']}", True, TEXT_COLOR)
+        position_text = font.render(f"Position: ({int(position[0])}, {int(position[1])})", True, TEXT_COLOR)
+        angle_text = font.render(f"Angle: {int(angle)}°", True, TEXT_COLOR)
+
         screen.blit(title_text, (10, 10))
         screen.blit(status_text, (10, 40))
         screen.blit(position_text, (10, 70))
         screen.blit(angle_text, (10, 100))
+        for i, line in enumerate(loop_stats_lines()):
+            screen.blit(small_font.render(line, True, TEXT_COLOR), (330, 40 + i * 20))
 
-        # Draw SLAM map
-        slam_map = slam.get_map()
-        for x in range(slam_map.shape[0]):
-            for y in range(slam_map.shape[1]):
-                rect_x = x * 10
-                rect_y = y * 10 + UI_HEIGHT
-                if rect_y < SCREEN_HEIGHT:  # Ensure we're drawing within screen bounds
-                    if slam_map[x, y] == 1:  # Clear space
-                        pygame.draw.rect(screen, CLEAR_SPACE_COLOR, pygame.Rect(rect_x, rect_y, 10, 10), 1)
-                    elif slam_map[x, y] == 2:  # First detected obstacle
-                        pygame.draw.rect(screen, OBSTACLE_FIRST_DETECTED_COLOR, pygame.Rect(rect_x, rect_y, 10, 10))
-                    elif slam_map[x, y] == 3:  # Confirmed obstacle
-                        pygame.draw.rect(screen, OBSTACLE_CONFIRMED_COLOR, pygame.Rect(rect_x, rect_y, 10, 10))
+        # Display sensor readings
+        front_text = small_font.render(f"Front: {sensor_distances[0]} cm", True, TEXT_COLOR)
+        left_text = small_font.render(f"Left: {sensor_distances[1]} cm", True, TEXT_COLOR)
+        right_text = small_font.render(f"Right: {sensor_distances[2]} cm", True, TEXT_COLOR)
+        servo_text = small_font.render(f"Servo: {robot['front_angle']}°", True, TEXT_COLOR)
+
+        screen.blit(front_text, (SCREEN_WIDTH - 150, 10))
+        screen.blit(left_text, (SCREEN_WIDTH - 150, 40))
+        screen.blit(right_text, (SCREEN_WIDTH - 150, 70))
+        screen.blit(servo_text, (SCREEN_WIDTH - 150, 100))
+
+    scene = (map_version, position, angle, robot["front_angle"], len(robot["path_points"]), robot["current_path"],
+             robot["path_index"], robot["destination"], show_profile and stats_tick)
+    if compositor.region("map", map_rect, scene):
+        # Draw SLAM map and counters from a layer repainted only when the map changes
+        screen.blit(compositor.layer("slam", map_rect.size, map_version,
+                                     lambda surface: draw_map_layer(surface, slam_map)), map_rect)
+        screen.set_clip(map_rect)
 
         # Draw robot
-        pygame.draw.circle(screen, ROBOT_COLOR, (int(robot_position[0]), int(robot_position[1])), robot_radius)
-        end_line = (int(robot_position[0] + 30 * math.cos(math.radians(robot_angle))),
-                    int(robot_position[1] + 30 * math.sin(math.radians(robot_angle))))
-        pygame.draw.line(screen, ROBOT_COLOR, (int(robot_position[0]), int(robot_position[1])), end_line, 2)
-        
+        pygame.draw.circle(screen, ROBOT_COLOR, (int(position[0]), int(position[1])), robot_radius)
+        end_line = (int(position[0] + 30 * math.cos(math.radians(angle))),
+                    int(position[1] + 30 * math.sin(math.radians(angle))))
+        pygame.draw.line(screen, ROBOT_COLOR, (int(position[0]), int(position[1])), end_line, 2)
+
         # Draw servo direction indicator
-        servo_angle = (robot_angle + (front_angle - 90) * 2) % 360
-        servo_line = (int(robot_position[0] + 25 * math.cos(math.radians(servo_angle))),
-                      int(robot_position[1] + 25 * math.sin(math.radians(servo_angle))))
-        pygame.draw.line(screen, (255, 0, 0), (int(robot_position[0]), int(robot_position[1])), servo_line, 2)
+        servo_angle = (angle + (robot["front_angle"] - 90) * 2) % 360
+        servo_line = (int(position[0] + 25 * math.cos(math.radians(servo_angle))),
+                      int(position[1] + 25 * math.sin(math.radians(servo_angle))))
+        pygame.draw.line(screen, (255, 0, 0), (int(position[0]), int(position[1])), servo_line, 2)
 
         # Draw the robot's path
-        if len(path_points) > 1:
-            pygame.draw.lines(screen, PATH_COLOR, False, path_points, 2)
-        
+        if len(robot["path_points"]) > 1:
+            pygame.draw.lines(screen, PATH_COLOR, False, robot["path_points"], 2)
+
         # Draw the planned path if available
+        current_path = robot["current_path"]
         if current_path:
             path_screen_points = [(p[0] * 10 + 5, p[1] * 10 + 5 + UI_HEIGHT) for p in current_path]
-            pygame.draw.lines(screen, PLANNED_PATH_COLOR, False, path_screen_points, 2)
-            
+            if len(path_screen_points) > 1:
+                pygame.draw.lines(screen, PLANNED_PATH_COLOR, False, path_screen_points, 2)
+
             # Highlight current target point
-            if path_index < len(current_path):
-                target = current_path[path_index]
+            if robot["path_index"] < len(current_path):
+                target = current_path[robot["path_index"]]
                 target_x = target[0] * 10 + 5
                 target_y = target[1] * 10 + 5 + UI_HEIGHT
                 pygame.draw.circle(screen, (255, 0, 0), (target_x, target_y), 5)
-        
+
         # Draw destination if set
+        destination = robot["destination"]
         if destination:
             pygame.draw.circle(screen, (0, 255, 255), (int(destination[0]), int(destination[1])), 10, 2)
-        
-        # Draw counter positions
-        for name, pos in counter_positions.items():
-            pygame.draw.circle(screen, (0, 255, 255), (int(pos[0]), int(pos[1])), 8, 2)
-            label = small_font.render(name, True, TEXT_COLOR)
-            screen.blit(label, (int(pos[0]) + 10, int(pos[1]) - 10))
-        
-        # Display sensor readings
-        front_text = small_font.render(f"Front: {front_distance} cm", True, TEXT_COLOR)
-        left_text = small_font.render(f"Left: {left_distance} cm", True, TEXT_COLOR)
-        right_text = small_font.render(f"Right: {right_distance} cm", True, TEXT_COLOR)
-        servo_text = small_font.render(f"Servo: {front_angle}°", True, TEXT_COLOR)
-        
-        screen.blit(front_text, (SCREEN_WIDTH - 150, 10))
-        screen.blit(left_text, (SCREEN_WIDTH - 150, 40))
-        screen.blit(right_text, (SCREEN_WIDTH - 150, 70))
-        screen.blit(servo_text, (SCREEN_WIDTH - 150, 100))
-        
-        # Update display
-        pygame.display.flip()
-        
-        # Control frame rate
-        clock.tick(30)
+        screen.set_clip(None)
+
+        if show_profile:
+            profiler.draw_overlay(screen, profile_font, SCREEN_WIDTH - 330, UI_HEIGHT + 10, STATS_REFRESH)
+    profiler.lap("ui/drawing")
+
+    # Send the redrawn regions to the display
+    compositor.present()
+    profiler.lap("ui/display")
+
+    if args.profile_export:
+        profiler.maybe_export(args.profile_export, PROFILE_EXPORT_INTERVAL)
+    return True
+
+control_loop = RateLoop("control", CONTROL_RATE, control_step, profiler)
+slam_loop = RateLoop("slam", SLAM_RATE, slam_step, profiler)
+ui_loop = RateLoop("ui", UI_RATE, ui_step, profiler)
+loops = [control_loop, slam_loop, ui_loop]
+
+# Start sensors
+for sensor in sensors:
+    sensor.start()
+
+try:
+    # Initial servo position (stop)
+    motor_driver.set_servo_speed(90)
+
+    # Seed the snapshots so every loop has state to read from the start
+    snapshots.publish("map", slam.get_map().copy())
+    snapshots.publish("costs", cost_map.costs.copy())
+    publish_robot_snapshot()
+
+    slam_loop.start(stop_event)
+    control_loop.start(stop_event)
+
+    # pygame must be driven from the main thread
+    ui_loop.run(stop_event)
 
 except KeyboardInterrupt:
     print("Program terminated by user")
 finally:
+    # Stop the loops before releasing the hardware they use
+    stop_event.set()
+    control_loop.join()
+    slam_loop.join()
+    planner.stop()
+    if map_checkpointer:
+        map_checkpointer.checkpoint()
+    if telemetry_publisher:
+        telemetry_publisher.close()
+
     # Clean up
     for sensor in sensors:
         sensor.cleanup()
     motor_driver.cleanup()
+    if qr_stop_thread:
+        qr_stop_thread.join()  # Let a scan finish stopping before the camera is released
     qr_scanner.stop()
-    GPIO.cleanup()
+    if recorder:
+        recorder.close()
+    if args.profile_export:
+        profiler.export(args.profile_export)
+    if replayer is None:
+        GPIO.cleanup()
     pygame.quit()
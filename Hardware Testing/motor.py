@@ -3,16 +3,21 @@ import time
 import threading
 
 class MotorDriver:
-    def __init__(self, port='/dev/ttyACM0', baudrate=9600):
+    def __init__(self, port='/dev/ttyACM0', baudrate=9600, connection=None, recorder=None):
         """
         Initialize motor driver that communicates with Arduino via serial
         
         Args:
             port: Serial port where Arduino is connected
             baudrate: Communication speed (must match Arduino sketch)
+            connection: Optional serial-like object to use instead of opening port
+                        (e.g. a replay connection)
+            recorder: Optional LogRecorder that logs every command and response
         """
         self.port = port
         self.baudrate = baudrate
+        self.connection = connection
+        self.recorder = recorder
         self.arduino = None
         self.connected = False
         self.lock = threading.Lock()  # Thread lock for serial communication
@@ -27,11 +32,16 @@ class MotorDriver:
     def connect(self):
         """Establish connection with Arduino"""
         try:
-            self.arduino = serial.Serial(self.port, self.baudrate, timeout=1)
-            time.sleep(2)  # Wait for Arduino to reset
+            if self.connection is not None:
+                self.arduino = self.connection
+            else:
+                self.arduino = serial.Serial(self.port, self.baudrate, timeout=1)
+                time.sleep(2)  # Wait for Arduino to reset
             
             # Read initial message from Arduino
             initial_message = self.arduino.readline().decode('utf-8').strip()
+            if self.recorder:
+                self.recorder.record_motor_ack(initial_message)
             print(f"Arduino says: {initial_message}")
             
             self.connected = True
@@ -51,10 +61,14 @@ class MotorDriver:
         with self.lock:
             try:
                 # Send command with newline terminator
+                if self.recorder:
+                    self.recorder.record_motor_command(command)
                 self.arduino.write(f"{command}\n".encode())
                 
                 # Wait for acknowledgment
                 response = self.arduino.readline().decode('utf-8').strip()
+                if self.recorder:
+                    self.recorder.record_motor_ack(response)
                 print(f"Arduino response: {response}")
                 
                 return "OK" in response
@@ -0,0 +1,145 @@
+import numpy as np
+
+def line_cells(a, b):
+    """
+    Grid cells on the straight line from cell a to cell b (vectorized Bresenham)
+
+    Returns:
+        (n, 2) integer array of cells from a to b inclusive, one step apart
+        in 8-connected moves
+    """
+    x0, y0 = int(round(a[0])), int(round(a[1]))
+    x1, y1 = int(round(b[0])), int(round(b[1]))
+    steps = max(abs(x1 - x0), abs(y1 - y0))
+    if steps == 0:
+        return np.array([[x0, y0]])
+
+    t = np.arange(steps + 1) / steps
+    xs = np.rint(x0 + t * (x1 - x0)).astype(int)
+    ys = np.rint(y0 + t * (y1 - y0)).astype(int)
+    return np.column_stack((xs, ys))
+
+def step_costs(costs, cells):
+    """A* cost of each move along a sequence of adjacent cells (diagonals cost 1.4x)"""
+    moves = np.abs(np.diff(cells, axis=0)).sum(axis=1)
+    return np.where(moves == 2, 1.4, 1.0) * costs[cells[1:, 0], cells[1:, 1]]
+
+def line_cost(costs, a, b):
+    """
+    Cost of moving in a straight line from cell a to cell b, measured the
+    way AStar measures paths; inf if the line crosses an impassable cell
+    or leaves the grid
+    """
+    cells = line_cells(a, b)
+    width, height = costs.shape
+    if cells.min() < 0 or cells[:, 0].max() >= width or cells[:, 1].max() >= height:
+        return np.inf
+    return float(step_costs(costs, cells).sum())
+
+def segment_cost(costs, a, b):
+    """
+    Cost of driving the straight segment from a to b: its Euclidean length
+    times the mean cost of the cells it enters; inf if any is impassable
+
+    Used by any-angle search, where segments need not follow grid moves.
+    """
+    cells = line_cells(a, b)
+    if len(cells) < 2:
+        return 0.0
+    width, height = costs.shape
+    if cells.min() < 0 or cells[:, 0].max() >= width or cells[:, 1].max() >= height:
+        return np.inf
+    length = np.hypot(b[0] - a[0], b[1] - a[1])
+    return float(length * costs[cells[1:, 0], cells[1:, 1]].mean())
+
+def line_of_sight(costs, a, b):
+    """True if every cell on the line from a to b is traversable"""
+    return line_cost(costs, a, b) != np.inf
+
+def compress_path(path, costs, tolerance=0.0):
+    """
+    Reduce a cell-by-cell path to the waypoints where it has to turn
+
+    Consecutive cells are replaced by a straight line whenever that line is
+    no more expensive than the cells it replaces, so shortcuts never cut
+    through unknown space or past obstacles that the search avoided.
+
+    Args:
+        path: List of (x, y) cells, as returned by AStar
+        costs: Per-cell cost array (np.inf = impassable), e.g. CostMap.costs
+        tolerance: Fraction by which a shortcut may exceed the cost of the
+                   cells it replaces
+
+    Returns:
+        List of (x, y) waypoints starting and ending with the path's ends
+    """
+    if path is None or len(path) < 3:
+        return path
+
+    cells = np.array(path)
+    # cumulative[i] = cost of the path from path[0] to path[i]
+    cumulative = np.concatenate(([0.0], np.cumsum(step_costs(costs, cells))))
+
+    waypoints = [path[0]]
+    anchor = 0
+    for i in range(2, len(path)):
+        replaced_cost = cumulative[i] - cumulative[anchor]
+        if line_cost(costs, path[anchor], path[i]) > replaced_cost * (1 + tolerance) + 1e-6:
+            # path[i] can't be reached directly; turn at the cell before it
+            anchor = i - 1
+            waypoints.append(path[anchor])
+    waypoints.append(path[-1])
+    return waypoints
+
+def catmull_rom(points, samples=4):
+    """
+    Catmull-Rom spline through points
+
+    Args:
+        points: Sequence of (x, y) points the curve passes through
+        samples: Points generated per segment
+
+    Returns:
+        List of (x, y) float points, ending at the last input point
+    """
+    points = np.asarray(points, dtype=float)
+    if len(points) < 3:
+        return [tuple(p) for p in points]
+
+    # Repeat the end points so the curve starts and ends on them
+    padded = np.vstack((points[0], points, points[-1]))
+    p0, p1, p2, p3 = (padded[i:len(padded) - 3 + i, np.newaxis] for i in range(4))
+    t = (np.arange(samples) / samples)[np.newaxis, :, np.newaxis]
+
+    curve = 0.5 * (2 * p1
+                   + (p2 - p0) * t
+                   + (2 * p0 - 5 * p1 + 4 * p2 - p3) * t ** 2
+                   + (3 * p1 - p0 - 3 * p2 + p3) * t ** 3)
+    curve = np.vstack((curve.reshape(-1, 2), points[-1]))
+    return [(float(x), float(y)) for x, y in curve]
+
+def smooth_path(path, costs, spline=False, samples=4, compress=True):
+    """
+    Compress a planned path into waypoints and optionally round its corners
+
+    Args:
+        path: List of (x, y) cells, as returned by AStar
+        costs: Per-cell cost array (np.inf = impassable)
+        spline: Fit a Catmull-Rom spline through the waypoints
+        samples: Spline points per waypoint segment
+        compress: Compress the path first; pass False for paths that are
+                  already waypoints (e.g. from AStar.find_path_theta)
+
+    Returns:
+        List of (x, y) waypoints in grid coordinates (floats when splined)
+    """
+    waypoints = compress_path(path, costs) if compress else path
+    if not spline or waypoints is None or len(waypoints) < 3:
+        return waypoints
+
+    curve = catmull_rom(waypoints, samples)
+    # The curve swings outside the corners it rounds; only use it if it stays clear
+    for a, b in zip(curve, curve[1:]):
+        if not line_of_sight(costs, a, b):
+            return waypoints
+    return curve
@@ -0,0 +1,60 @@
+import threading
+import bisect
+from collections import deque
+
+class PoseHistory:
+    def __init__(self, capacity=256):
+        """
+        Bounded history of timestamped robot poses used to look up where the
+        robot was when a sensor reading was taken
+
+        Args:
+            capacity: Maximum number of poses kept; the oldest are dropped first
+        """
+        self.times = deque(maxlen=capacity)
+        self.poses = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+
+    def record(self, timestamp, x, y, angle):
+        """Store the robot pose (world x, y and heading in degrees) at timestamp"""
+        with self.lock:
+            # Ignore out-of-order samples so the history stays sorted
+            if self.times and timestamp < self.times[-1]:
+                return
+            self.times.append(timestamp)
+            self.poses.append((x, y, angle))
+
+    def pose_at(self, timestamp):
+        """
+        Interpolate the robot pose at timestamp
+
+        Timestamps outside the recorded history are clamped to the oldest or
+        newest pose.
+
+        Returns:
+            (x, y, angle) tuple, or None if no pose has been recorded yet
+        """
+        with self.lock:
+            if not self.times:
+                return None
+
+            index = bisect.bisect_left(self.times, timestamp)
+            if index == 0:
+                return self.poses[0]
+            if index >= len(self.times):
+                return self.poses[-1]
+
+            t0, t1 = self.times[index - 1], self.times[index]
+            x0, y0, a0 = self.poses[index - 1]
+            x1, y1, a1 = self.poses[index]
+
+        ratio = (timestamp - t0) / (t1 - t0) if t1 > t0 else 1.0
+
+        # Interpolate the heading along the shortest arc
+        angle_diff = (a1 - a0) % 360
+        if angle_diff > 180:
+            angle_diff -= 360
+
+        return (x0 + (x1 - x0) * ratio,
+                y0 + (y1 - y0) * ratio,
+                (a0 + angle_diff * ratio) % 360)
@@ -0,0 +1,172 @@
+import contextlib
+import csv
+import json
+import os
+import threading
+import time
+import numpy as np
+import pygame
+
+class _Span:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+        return False
+
+class Profiler:
+    def __init__(self, window=300, enabled=True):
+        """
+        Rolling per-stage timings for the main loops
+
+        Each stage keeps its last window durations in a fixed-size ring
+        buffer, so memory use and the cost of a measurement (two
+        perf_counter calls and an array store) stay constant however long
+        the program runs. Percentiles are only computed when asked for.
+
+        Args:
+            window: Measurements kept per stage
+            enabled: When False every call is a no-op
+        """
+        self.window = window
+        self.enabled = enabled
+        self.lock = threading.Lock()  # Guards creating stages; loops on several threads record
+        self.buffers = {}  # Stage name -> ring buffer of durations in seconds
+        self.counts = {}  # Stage name -> measurements recorded so far
+        self.laps = threading.local()  # Lap start per thread, so each loop times its own stages
+        self.last_export = time.perf_counter()
+        self.overlay_stats = {}  # Summary shown by draw_overlay, refreshed periodically
+        self.overlay_time = 0.0
+
+    def record(self, name, seconds):
+        """Record one duration for stage name"""
+        if not self.enabled:
+            return
+        buffer = self.buffers.get(name)
+        if buffer is None:
+            with self.lock:
+                buffer = self.buffers.setdefault(name, np.zeros(self.window))
+                self.counts.setdefault(name, 0)
+        count = self.counts[name]
+        buffer[count % self.window] = seconds
+        self.counts[name] = count + 1
+
+    def span(self, name):
+        """Context manager timing the enclosed block as stage name"""
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return _Span(self, name)
+
+    def start_frame(self):
+        """Start timing a loop iteration; the first lap() is measured from here"""
+        now = time.perf_counter()
+        self.laps.frame_start = now
+        self.laps.lap_start = now
+
+    def lap(self, name):
+        """Record the time since the previous lap (or start_frame) as stage name"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.record(name, now - self.laps.lap_start)
+        self.laps.lap_start = now
+
+    def end_frame(self, name="frame"):
+        """Record the whole iteration since start_frame as stage name"""
+        if self.enabled:
+            self.record(name, time.perf_counter() - self.laps.frame_start)
+
+    def summary(self):
+        """
+        Statistics over each stage's window
+
+        Returns:
+            {stage: {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"}}
+            in the order the stages were first recorded
+        """
+        with self.lock:
+            names = list(self.buffers)
+
+        stats = {}
+        for name in names:
+            count = self.counts[name]
+            samples = self.buffers[name][:min(count, self.window)] * 1000
+            if not len(samples):
+                continue
+            p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+            stats[name] = {
+                "count": count,
+                "mean_ms": float(samples.mean()),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(samples.max()),
+            }
+        return stats
+
+    def draw_overlay(self, surface, font, x, y, refresh=0.5):
+        """
+        Draw a per-stage timing table (median / 95th percentile / max, in ms)
+
+        The statistics are recomputed at most every refresh seconds.
+        """
+        now = time.perf_counter()
+        if now - self.overlay_time > refresh:
+            self.overlay_stats = self.summary()
+            self.overlay_time = now
+
+        lines = [f"{'stage':<18}{'p50':>7}{'p95':>7}{'max':>7}"]
+        lines += [f"{name:<18}{stats['p50_ms']:7.1f}{stats['p95_ms']:7.1f}{stats['max_ms']:7.1f}"
+                  for name, stats in self.overlay_stats.items()]
+        rendered = [font.render(line, True, (255, 255, 255)) for line in lines]
+
+        # Translucent backing so the table stays readable over the map
+        width = max(text.get_width() for text in rendered) + 10
+        height = sum(text.get_height() for text in rendered) + 10
+        backing = pygame.Surface((width, height), pygame.SRCALPHA)
+        backing.fill((0, 0, 0, 180))
+        surface.blit(backing, (x, y))
+
+        y += 5
+        for text in rendered:
+            surface.blit(text, (x + 5, y))
+            y += text.get_height()
+
+    def export(self, path):
+        """
+        Write the current summary to path
+
+        A .json file is overwritten with the latest summary; any other file
+        gets one CSV row per stage appended, so it accumulates a history.
+        """
+        stats = self.summary()
+        timestamp = time.time()
+
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({"time": timestamp, "window": self.window, "stages": stats}, f, indent=2)
+            return
+
+        fields = ["count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+        new_file = not os.path.exists(path)
+        with open(path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(["time", "stage"] + fields)
+            for name, values in stats.items():
+                writer.writerow([f"{timestamp:.3f}", name] + [round(values[field], 3) for field in fields])
+
+    def maybe_export(self, path, interval):
+        """Export to path if interval seconds have passed since the last export"""
+        now = time.perf_counter()
+        if path and now - self.last_export >= interval:
+            self.last_export = now
+            self.export(path)
@@ -0,0 +1,231 @@
+import struct
+import threading
+import time
+import cv2
+import numpy as np
+
+from sensor import SensorReading
+
+# Log layout: header, then records of (kind, timestamp, payload length, payload)
+LOG_MAGIC = b"TRGXLOG"
+LOG_VERSION = 1
+HEADER_FORMAT = "<7sH"
+RECORD_FORMAT = "<Bdi"
+SENSOR_FORMAT = "<ffB"  # angle, distance, sensor name length (name bytes follow)
+
+# Record kinds
+SENSOR_READING = 1
+MOTOR_COMMAND = 2
+MOTOR_ACK = 3
+CAMERA_FRAME = 4
+
+class LogRecorder:
+    def __init__(self, path, jpeg_quality=80):
+        """
+        Records sensor readings, motor traffic and camera frames to a compact
+        binary log that Replayer can feed back through the hardware classes
+
+        Args:
+            path: Log file to create
+            jpeg_quality: JPEG quality used to store camera frames
+        """
+        self.path = path
+        self.jpeg_quality = jpeg_quality
+        self.lock = threading.Lock()  # Sensor, motor and camera threads all write here
+        self.file = open(path, "wb")
+        self.file.write(struct.pack(HEADER_FORMAT, LOG_MAGIC, LOG_VERSION))
+
+    def _write(self, kind, timestamp, payload):
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(struct.pack(RECORD_FORMAT, kind, timestamp, len(payload)))
+            self.file.write(payload)
+
+    def record_sensor(self, reading):
+        """Record a SensorReading"""
+        name = reading.sensor.encode("utf-8")
+        payload = struct.pack(SENSOR_FORMAT, reading.angle, reading.distance, len(name)) + name
+        self._write(SENSOR_READING, reading.t, payload)
+
+    def record_motor_command(self, command):
+        """Record a command sent to the Arduino"""
+        self._write(MOTOR_COMMAND, time.time(), command.encode("utf-8"))
+
+    def record_motor_ack(self, response):
+        """Record a line received from the Arduino"""
+        self._write(MOTOR_ACK, time.time(), response.encode("utf-8"))
+
+    def record_frame(self, frame):
+        """Record a camera frame as JPEG"""
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if ok:
+            self._write(CAMERA_FRAME, time.time(), encoded.tobytes())
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+def read_log(path):
+    """
+    Read a log written by LogRecorder
+
+    Returns:
+        List of (kind, timestamp, value) tuples in recording order, where value
+        is a SensorReading, a command/response string or JPEG bytes
+    """
+    records = []
+    header_size = struct.calcsize(HEADER_FORMAT)
+    record_size = struct.calcsize(RECORD_FORMAT)
+    sensor_size = struct.calcsize(SENSOR_FORMAT)
+
+    with open(path, "rb") as f:
+        magic, version = struct.unpack(HEADER_FORMAT, f.read(header_size))
+        if magic != LOG_MAGIC:
+            raise ValueError(f"{path} is not a TragerX log")
+        if version != LOG_VERSION:
+            raise ValueError(f"Unsupported log version {version}")
+
+        while True:
+            header = f.read(record_size)
+            if len(header) < record_size:
+                break  # End of log (or a record cut off by a crash)
+            kind, timestamp, length = struct.unpack(RECORD_FORMAT, header)
+            payload = f.read(length)
+            if len(payload) < length:
+                break
+
+            if kind == SENSOR_READING:
+                angle, distance, name_length = struct.unpack(SENSOR_FORMAT, payload[:sensor_size])
+                name = payload[sensor_size:sensor_size + name_length].decode("utf-8")
+                value = SensorReading(timestamp, name, angle, distance)
+            elif kind in (MOTOR_COMMAND, MOTOR_ACK):
+                value = payload.decode("utf-8")
+            else:
+                value = payload  # JPEG bytes, decoded on demand during replay
+
+            records.append((kind, timestamp, value))
+
+    return records
+
+class Replayer:
+    def __init__(self, path, speed=1.0):
+        """
+        Plays a recorded log back through UltrasonicSensor, MotorDriver and
+        QRScanner in place of the real hardware
+
+        Args:
+            path: Log file written by LogRecorder
+            speed: Playback speed (1.0 = original timing, 4.0 = four times faster)
+        """
+        if speed <= 0:
+            raise ValueError("Replay speed must be positive")
+
+        self.speed = speed
+        self.records = read_log(path)
+        self.log_start = self.records[0][1] if self.records else 0
+        self.wall_start = None
+
+    def start(self):
+        """Start the replay clock; called automatically on first use"""
+        if self.wall_start is None:
+            self.wall_start = time.time()
+
+    def log_time(self):
+        """Current position in the log, in log timestamps"""
+        self.start()
+        return self.log_start + (time.time() - self.wall_start) * self.speed
+
+    def wait_until(self, timestamp):
+        """Sleep until the replay clock reaches a log timestamp"""
+        self.start()
+        delay = (timestamp - self.log_start) / self.speed - (time.time() - self.wall_start)
+        if delay > 0:
+            time.sleep(delay)
+
+    def sensor_source(self, name):
+        """Measurement source for the sensor with the given name"""
+        readings = [value for kind, _, value in self.records
+                    if kind == SENSOR_READING and value.sensor == name]
+        return ReplaySensorSource(self, readings)
+
+    def serial_connection(self):
+        """Stand-in for serial.Serial that answers with the recorded Arduino responses"""
+        responses = [value for kind, _, value in self.records if kind == MOTOR_ACK]
+        return ReplaySerial(responses)
+
+    def video_capture(self):
+        """Stand-in for cv2.VideoCapture that returns the recorded frames"""
+        frames = [(timestamp, value) for kind, timestamp, value in self.records if kind == CAMERA_FRAME]
+        return ReplayCapture(self, frames)
+
+class ReplaySensorSource:
+    def __init__(self, replayer, readings):
+        self.replayer = replayer
+        self.readings = readings
+        self.index = 0
+        self.last_distance = 0
+        self.last_angle = None  # Recorded beam angle of the last reading returned
+
+    def measure(self):
+        """Return the next recorded distance once its time comes"""
+        if self.index >= len(self.readings):
+            # Log exhausted; keep reporting the last value at the usual rate
+            time.sleep(0.1)
+            return self.last_distance
+
+        reading = self.readings[self.index]
+        self.index += 1
+        self.replayer.wait_until(reading.t)
+        self.last_distance = reading.distance
+        self.last_angle = reading.angle
+        return reading.distance
+
+class ReplaySerial:
+    def __init__(self, responses):
+        self.responses = responses
+        self.index = 0
+        self.is_open = True
+
+    def write(self, data):
+        return len(data)
+
+    def readline(self):
+        if self.index >= len(self.responses):
+            return b"OK\n"  # Past the end of the log; acknowledge everything
+        response = self.responses[self.index]
+        self.index += 1
+        return f"{response}\n".encode("utf-8")
+
+    def close(self):
+        self.is_open = False
+
+class ReplayCapture:
+    def __init__(self, replayer, frames):
+        self.replayer = replayer
+        self.frames = frames
+        self.index = 0
+
+    def isOpened(self):
+        return self.index < len(self.frames)
+
+    def read(self):
+        """Return the newest recorded frame due at the current replay time"""
+        if self.index >= len(self.frames):
+            return False, None
+
+        # Like a real camera, wait for the next frame and drop any we fell behind on
+        self.replayer.wait_until(self.frames[self.index][0])
+        now = self.replayer.log_time()
+        while self.index + 1 < len(self.frames) and self.frames[self.index + 1][0] <= now:
+            self.index += 1
+
+        jpeg = self.frames[self.index][1]
+        self.index += 1
+        frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return frame is not None, frame
+
+    def release(self):
+        self.index = len(self.frames)
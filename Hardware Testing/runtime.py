@@ -0,0 +1,122 @@
+import threading
+import time
+
+class SnapshotStore:
+    def __init__(self):
+        """
+        Latest published state of each loop, shared by version number
+
+        Publishers hand over values they will not modify again (copies or
+        tuples), so readers can use a snapshot without holding the lock.
+        """
+        self.lock = threading.Lock()
+        self.snapshots = {}  # name -> (version, value)
+
+    def publish(self, name, value):
+        """Publish a new snapshot under name and return its version"""
+        with self.lock:
+            version = self.snapshots.get(name, (0, None))[0] + 1
+            self.snapshots[name] = (version, value)
+            return version
+
+    def get(self, name, default=None):
+        """Return (version, value) of the latest snapshot, or (0, default)"""
+        with self.lock:
+            return self.snapshots.get(name, (0, default))
+
+class LoopStats:
+    def __init__(self, name, rate_hz):
+        """Timing statistics for one loop"""
+        self.name = name
+        self.rate_hz = rate_hz
+        self.lock = threading.Lock()
+        self.iterations = 0
+        self.overruns = 0  # Iterations that took longer than the loop period
+        self.last_time = 0.0
+        self.max_time = 0.0
+        self.total_time = 0.0
+        self.max_jitter = 0.0  # Largest lateness of an iteration start
+
+    def add(self, step_time, jitter):
+        with self.lock:
+            self.iterations += 1
+            self.last_time = step_time
+            self.total_time += step_time
+            self.max_time = max(self.max_time, step_time)
+            self.max_jitter = max(self.max_jitter, jitter)
+            if step_time > 1.0 / self.rate_hz:
+                self.overruns += 1
+
+    def summary(self):
+        """Return the current statistics as a dict (times in milliseconds)"""
+        with self.lock:
+            mean_time = self.total_time / self.iterations if self.iterations else 0.0
+            return {
+                "name": self.name,
+                "rate_hz": self.rate_hz,
+                "iterations": self.iterations,
+                "overruns": self.overruns,
+                "last_ms": self.last_time * 1000,
+                "mean_ms": mean_time * 1000,
+                "max_ms": self.max_time * 1000,
+                "max_jitter_ms": self.max_jitter * 1000,
+            }
+
+class RateLoop:
+    def __init__(self, name, rate_hz, step, profiler=None):
+        """
+        Calls step() at a fixed rate on its own thread (or the caller's)
+
+        Args:
+            name: Loop name used in statistics
+            rate_hz: Target iterations per second
+            step: Function called once per iteration; return False to stop all loops
+            profiler: Optional Profiler; each iteration is a frame recorded
+                      under name, so step() can time its stages with lap()
+        """
+        self.name = name
+        self.rate_hz = rate_hz
+        self.step = step
+        self.profiler = profiler
+        self.stats = LoopStats(name, rate_hz)
+        self.thread = None
+
+    def run(self, stop_event):
+        """Run the loop on the current thread until stop_event is set"""
+        period = 1.0 / self.rate_hz
+        next_start = time.perf_counter()
+
+        while not stop_event.is_set():
+            start = time.perf_counter()
+            if self.profiler:
+                self.profiler.start_frame()
+            try:
+                keep_running = self.step()
+            except Exception:
+                stop_event.set()  # A crashed loop takes the runtime down with it
+                raise
+            step_time = time.perf_counter() - start
+            self.stats.add(step_time, max(0.0, start - next_start))
+            if self.profiler:
+                self.profiler.record(self.name, step_time)
+
+            if keep_running is False:
+                stop_event.set()
+                break
+
+            next_start += period
+            delay = next_start - time.perf_counter()
+            if delay > 0:
+                stop_event.wait(delay)
+            else:
+                # Running late; start the next period now instead of bursting to catch up
+                next_start = time.perf_counter()
+
+    def start(self, stop_event):
+        """Run the loop on a background thread"""
+        self.thread = threading.Thread(target=self.run, args=(stop_event,), name=self.name, daemon=True)
+        self.thread.start()
+
+    def join(self, timeout=1.0):
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout)
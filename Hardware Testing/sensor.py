@@ -1,17 +1,68 @@
-import RPi.GPIO as GPIO
+try:
+    import RPi.GPIO as GPIO
+except ImportError:
+    GPIO = None  # Not on a Raspberry Pi; sensors need a replay source
 import time
 import threading
 import math
+import itertools
+from collections import deque, namedtuple
+
+# A single range measurement: when it was taken, by which sensor, at which
+# angle relative to the robot front, and the measured distance in cm
+SensorReading = namedtuple("SensorReading", ["t", "sensor", "angle", "distance"])
+
+class ReadingBuffer:
+    def __init__(self, capacity=1024):
+        """
+        Bounded ring buffer of timestamped sensor readings shared by all sensors
+
+        Args:
+            capacity: Maximum number of readings kept; the oldest are dropped first
+        """
+        self.readings = deque(maxlen=capacity)
+        self.next_seq = 0  # Sequence number the next appended reading will get
+        self.lock = threading.Lock()
+
+    def append(self, reading):
+        """Add a reading to the buffer"""
+        with self.lock:
+            self.readings.append(reading)
+            self.next_seq += 1
+
+    def read_since(self, cursor):
+        """
+        Return all readings appended after cursor
+
+        Args:
+            cursor: Value returned by the previous call (0 for the first call)
+
+        Returns:
+            (readings, cursor) tuple; pass the new cursor to the next call.
+            Readings that were overwritten before being read are skipped.
+        """
+        with self.lock:
+            oldest_seq = self.next_seq - len(self.readings)
+            start = max(cursor, oldest_seq) - oldest_seq
+            readings = list(itertools.islice(self.readings, start, None))
+            return readings, self.next_seq
 
 class UltrasonicSensor:
-    def __init__(self, trigger_pin, echo_pin, name="sensor", angle_offset=0):
+    def __init__(self, trigger_pin, echo_pin, name="sensor", angle_offset=0, reading_buffer=None,
+                 source=None, recorder=None):
         self.trigger_pin = trigger_pin
         self.echo_pin = echo_pin
         self.name = name
         self.angle_offset = angle_offset  # Angle offset relative to robot front
+        self.reading_buffer = reading_buffer  # Optional ReadingBuffer for timestamped readings
+        self.source = source  # Optional replay source used instead of the GPIO pins
+        self.recorder = recorder  # Optional LogRecorder that logs every reading
         self.distance = 0
         self.running = False
         self.thread = None
+
+        if self.source is not None:
+            return
         
         # Setup GPIO pins
         GPIO.setmode(GPIO.BCM)
@@ -23,6 +74,9 @@ class UltrasonicSensor:
         time.sleep(0.1)  # Allow sensor to settle
     
     def measure_distance(self):
+        if self.source is not None:
+            return self.source.measure()
+
         # Send 10us pulse to trigger
         GPIO.output(self.trigger_pin, False)
         time.sleep(0.000002)  # 2us delay to ensure clean pulse
@@ -60,8 +114,29 @@ class UltrasonicSensor:
     def continuous_measurement(self):
         self.running = True
         while self.running:
-            self.distance = self.measure_distance()
-            time.sleep(0.1)  # 10 measurements per second
+            self.record_measurement()
+            if self.source is None:
+                time.sleep(0.1)  # 10 measurements per second (a replay source keeps the recorded timing)
+
+    def record_measurement(self):
+        """Take one measurement and push it to the reading buffer with its timestamp"""
+        angle = self.get_reading_angle()
+        start_time = time.time()
+        distance = self.measure_distance()
+        # Stamp the reading at the middle of the echo window
+        timestamp = (start_time + time.time()) / 2
+        self.distance = distance
+        if self.source is not None and self.source.last_angle is not None:
+            # Use the angle the reading was recorded at, so SLAM fuses the same beam
+            angle = self.source.last_angle
+            self.set_reading_angle(angle)
+
+        reading = SensorReading(timestamp, self.name, angle, distance)
+        if self.reading_buffer is not None:
+            self.reading_buffer.append(reading)
+        if self.recorder is not None:
+            self.recorder.record_sensor(reading)
+        return distance
     
     def start(self):
         if not self.thread or not self.thread.is_alive():
@@ -79,37 +154,64 @@ class UltrasonicSensor:
     
     def get_angle(self):
         return self.angle_offset
+
+    def get_reading_angle(self):
+        """Angle of the beam relative to the robot front at measurement time"""
+        return self.angle_offset
+
+    def set_reading_angle(self, angle):
+        """Take on a replayed beam angle (fixed sensors have nothing to move)"""
+        pass
     
     def cleanup(self):
         self.stop()
         # GPIO cleanup is handled by the main program
 
 class ServoSensor(UltrasonicSensor):
-    def __init__(self, trigger_pin, echo_pin, servo_pin, name="servo_sensor"):
-        super().__init__(trigger_pin, echo_pin, name)
+    def __init__(self, trigger_pin, echo_pin, servo_pin, name="servo_sensor", reading_buffer=None,
+                 degrees_per_second=600, source=None, recorder=None):
+        super().__init__(trigger_pin, echo_pin, name, reading_buffer=reading_buffer,
+                         source=source, recorder=recorder)
         self.servo_pin = servo_pin
         self.current_angle = 90  # Start at center position
         self.scan_direction = 1  # 1 for increasing angle, -1 for decreasing
         self.min_angle = 0
         self.max_angle = 180
         self.step_angle = 10  # Degrees to move per step
+        self.degrees_per_second = degrees_per_second  # Mechanical servo speed (SG90: ~0.1s per 60 degrees)
+        self.settle_time = 0  # Time at which the servo reaches the commanded angle
+        self.stop_event = threading.Event()  # Wakes the sweep timer early on stop
         
-        # Setup servo
-        GPIO.setup(self.servo_pin, GPIO.OUT)
-        self.pwm = GPIO.PWM(self.servo_pin, 50)  # 50Hz frequency
-        self.pwm.start(self._angle_to_duty_cycle(self.current_angle))
-        time.sleep(0.5)  # Allow servo to reach position
+        # Setup servo (not driven when replaying)
+        self.pwm = None
+        if self.source is None:
+            GPIO.setup(self.servo_pin, GPIO.OUT)
+            self.pwm = GPIO.PWM(self.servo_pin, 50)  # 50Hz frequency
+            self.pwm.start(self._angle_to_duty_cycle(self.current_angle))
+        # Start position is unknown, so allow for a move across half the range
+        self._schedule_settle(90)
     
     def _angle_to_duty_cycle(self, angle):
         # Convert angle (0-180) to duty cycle (2.5-12.5)
         return 2.5 + (angle / 18)
+
+    def _schedule_settle(self, travel):
+        """Work out when the servo will finish moving through travel degrees"""
+        self.settle_time = time.time() + travel / self.degrees_per_second
     
     def set_angle(self, angle):
+        """Command a new angle without waiting for the servo to get there"""
         # Ensure angle is within bounds
         angle = max(self.min_angle, min(self.max_angle, angle))
+        travel = abs(angle - self.current_angle)
         self.current_angle = angle
-        self.pwm.ChangeDutyCycle(self._angle_to_duty_cycle(angle))
-        time.sleep(0.1)  # Allow servo to reach position
+        if self.pwm:
+            self.pwm.ChangeDutyCycle(self._angle_to_duty_cycle(angle))
+        self._schedule_settle(travel)
+
+    def is_settled(self):
+        """True once the servo has had time to reach the commanded angle"""
+        return time.time() >= self.settle_time
         
     def scan_step(self):
         # Move servo one step in the current scan direction
@@ -122,11 +224,44 @@ class ServoSensor(UltrasonicSensor):
         
         self.set_angle(next_angle)
         return self.current_angle
+
+    def continuous_measurement(self):
+        """
+        Sweep state machine run on the sensor thread:
+        moving -> (timer expires when the servo settles) -> measure -> next step
+        """
+        self.running = True
+        self.stop_event.clear()
+        while self.running:
+            remaining = self.settle_time - time.time()
+            if remaining > 0 and self.source is None:
+                # Servo still moving; sleep on the timer until it settles
+                self.stop_event.wait(remaining)
+                continue
+
+            # Servo settled, so the reading is tagged with the angle in effect now.
+            # When replaying, the source paces readings and supplies their
+            # recorded angles, so the sweep isn't stepped.
+            self.record_measurement()
+            if self.source is None:
+                self.scan_step()
     
     def get_angle(self):
         return self.current_angle
+
+    def get_reading_angle(self):
+        # Servo center (90) points along the robot front
+        return self.angle_offset + self.current_angle - 90
+
+    def set_reading_angle(self, angle):
+        self.current_angle = angle - self.angle_offset + 90
+
+    def stop(self):
+        self.running = False
+        self.stop_event.set()
+        super().stop()
     
     def cleanup(self):
         super().cleanup()
-        self.pwm.stop()
-
+        if self.pwm:
+            self.pwm.stop()
@@ -1,8 +1,15 @@
 import numpy as np
 import math
 
+def max_pool(grid, factor):
+    """Highest value in each factor x factor block of grid (blocks at the far edges may be partial)"""
+    width, height = grid.shape
+    padded = np.zeros((-(-width // factor) * factor, -(-height // factor) * factor), dtype=grid.dtype)
+    padded[:width, :height] = grid
+    return padded.reshape(padded.shape[0] // factor, factor, padded.shape[1] // factor, factor).max(axis=(1, 3))
+
 class GridBasedSLAM:
-    def __init__(self, initial_grid_width, initial_grid_height):
+    def __init__(self, initial_grid_width, initial_grid_height, occupancy_grid=None, obstacle_detection_count=None):
         """
         Initialize the SLAM system with an occupancy grid.
         Occupancy Grid:
@@ -11,10 +18,22 @@ class GridBasedSLAM:
         - 2 = Tentative Obstacle
         - 3 = Confirmed Obstacle
         """
-        self.occupancy_grid = np.zeros((initial_grid_width, initial_grid_height), dtype=int)
-        self.obstacle_detection_count = np.zeros((initial_grid_width, initial_grid_height), dtype=int)  # Track obstacle detection
+        # Existing arrays (e.g. a map opened with map_store.read_map) are used as they are
+        if occupancy_grid is None:
+            occupancy_grid = np.zeros((initial_grid_width, initial_grid_height), dtype=int)
+        if obstacle_detection_count is None:
+            obstacle_detection_count = np.zeros((initial_grid_width, initial_grid_height), dtype=int)
+        self.occupancy_grid = occupancy_grid
+        self.obstacle_detection_count = obstacle_detection_count  # Track obstacle detection
         self.grid_width = initial_grid_width
         self.grid_height = initial_grid_height
+        self.change_listeners = []  # Called with the set of (x, y) cells changed by each update
+        self.changed_cells = set()
+        self.detection_listeners = []  # Called with the set of (x, y) cells whose detection count changed
+        self.detected_cells = set()
+        self.pyramid_factors = (2, 4, 8)  # Coarse levels available from get_map(factor); each a multiple of the last
+        self.pyramid = None  # factor -> max-pooled grid, built on first use
+        self.pyramid_dirty = set()  # Cells changed since the pyramid was last brought up to date
 
     def expand_occupancy_grid(self, new_width, new_height):
         """Expands the occupancy grid when the robot explores beyond current bounds."""
@@ -29,6 +48,22 @@ class GridBasedSLAM:
         self.occupancy_grid = new_occupancy_grid
         self.obstacle_detection_count = new_obstacle_detection_count
         self.grid_width, self.grid_height = new_width, new_height
+        self.pyramid = None  # Rebuilt for the new size on next use
+
+    def add_change_listener(self, listener):
+        """Register a function called with the (x, y) cells whose value changed in each sensor update"""
+        self.change_listeners.append(listener)
+
+    def add_detection_listener(self, listener):
+        """Register a function called with the (x, y) cells whose obstacle detection count changed in each sensor update"""
+        self.detection_listeners.append(listener)
+
+    def set_cell(self, x, y, value):
+        """Sets a grid cell, recording it as changed if its value differs"""
+        if self.occupancy_grid[x, y] != value:
+            self.occupancy_grid[x, y] = value
+            # Negative indices wrap around, so record the cell actually written
+            self.changed_cells.add((x % self.grid_width, y % self.grid_height))
 
     def world_to_grid(self, world_position):
         """Converts world coordinates to grid coordinates."""
@@ -54,7 +89,7 @@ class GridBasedSLAM:
             self.expand_occupancy_grid(max(grid_x + 10, self.grid_width), max(grid_y + 10, self.grid_height))
 
         # Mark robot's current position as explored (1 = clear space)
-        self.occupancy_grid[grid_x, grid_y] = 1
+        self.set_cell(grid_x, grid_y, 1)
 
         # Ensure sensor_distance is an integer for range()
         sensor_distance = int(sensor_distance)
@@ -70,7 +105,7 @@ class GridBasedSLAM:
 
             # Only mark clear space if it's not already a confirmed obstacle
             if self.occupancy_grid[clear_x, clear_y] != 3:
-                self.occupancy_grid[clear_x, clear_y] = 1
+                self.set_cell(clear_x, clear_y, 1)
 
         # If an obstacle is detected within range, mark it as tentative or confirmed
         if sensor_distance < max_sensor_range:
@@ -83,14 +118,63 @@ class GridBasedSLAM:
 
             # Increment detection count for the detected obstacle
             self.obstacle_detection_count[obstacle_x, obstacle_y] += 1
+            self.detected_cells.add((obstacle_x % self.grid_width, obstacle_y % self.grid_height))
 
             # Mark obstacles based on detection count
             if self.obstacle_detection_count[obstacle_x, obstacle_y] == 1:
-                self.occupancy_grid[obstacle_x, obstacle_y] = 2  # First detection (tentative)
+                self.set_cell(obstacle_x, obstacle_y, 2)  # First detection (tentative)
             elif self.obstacle_detection_count[obstacle_x, obstacle_y] >= 3:
-                self.occupancy_grid[obstacle_x, obstacle_y] = 3  # Confirmed obstacle
-
-    def get_map(self):
-        """Returns the current occupancy grid."""
-        return self.occupancy_grid
-
+                self.set_cell(obstacle_x, obstacle_y, 3)  # Confirmed obstacle
+
+        if self.pyramid is not None:
+            self.pyramid_dirty |= self.changed_cells
+        if self.changed_cells and self.change_listeners:
+            for listener in self.change_listeners:
+                listener(self.changed_cells)
+        self.changed_cells = set()
+        if self.detected_cells and self.detection_listeners:
+            for listener in self.detection_listeners:
+                listener(self.detected_cells)
+        self.detected_cells = set()
+
+    def get_map(self, factor=1):
+        """
+        Returns the occupancy grid, or for a factor in pyramid_factors a
+        coarse version where each cell holds the highest value of the
+        factor x factor cells it covers, so no obstacle is lost.
+        """
+        if factor == 1:
+            return self.occupancy_grid
+        self.update_pyramid()
+        return self.pyramid[factor]
+
+    def update_pyramid(self):
+        """Brings the coarse levels up to date with the cells changed since the last update."""
+        first = self.pyramid_factors[0]
+        width, height = self.occupancy_grid.shape
+        if self.pyramid is None or self.pyramid[first].shape != (-(-width // first), -(-height // first)):
+            # First use, or the grid was replaced
+            self.pyramid = {factor: max_pool(self.occupancy_grid, factor) for factor in self.pyramid_factors}
+            self.pyramid_dirty = set()
+            return
+        if not self.pyramid_dirty:
+            return
+
+        cells = np.array(list(self.pyramid_dirty))
+        self.pyramid_dirty = set()
+
+        # Recompute each affected coarse cell from the 2x2 (or larger) block below it
+        finer, finer_factor = self.occupancy_grid, 1
+        for factor in self.pyramid_factors:
+            level = self.pyramid[factor]
+            step = factor // finer_factor
+            coarse_x, coarse_y = np.unique(cells // factor, axis=0).T
+            values = np.zeros(len(coarse_x), dtype=level.dtype)
+            for dx in range(step):
+                for dy in range(step):
+                    # Clamp at the far edges; the clamped cell is still inside the block
+                    x = np.minimum(coarse_x * step + dx, finer.shape[0] - 1)
+                    y = np.minimum(coarse_y * step + dy, finer.shape[1] - 1)
+                    np.maximum(values, finer[x, y], out=values)
+            level[coarse_x, coarse_y] = values
+            finer, finer_factor = level, factor
@@ -1,9 +1,65 @@
+import functools
 import heapq
+import math
+import time
+from collections import namedtuple
 import numpy as np
 
+from costmap import CELL_COSTS
+
+INF = float('inf')
+
+# Statistics of one search, see AStar.last_stats
+SearchStats = namedtuple("SearchStats", ["method", "expanded", "pushes", "max_open", "cost", "time_ms", "reachable"])
+
+def instrumented(search):
+    """
+    Record SearchStats for every call of an AStar search method
+
+    The search updates the expanded_nodes, heap_pushes and max_open_size
+    counters (and expanded_cells when record_expanded is set); the wrapper
+    resets them, times the call and prices the returned path.
+    """
+    @functools.wraps(search)
+    def wrapper(self, start, goal, *args, **kwargs):
+        self.expanded_nodes = 0
+        self.heap_pushes = 0
+        self.max_open_size = 0
+        self.expanded_cells = [] if self.record_expanded else None
+
+        started = time.perf_counter()
+        path = search(self, start, goal, *args, **kwargs)
+        elapsed = time.perf_counter() - started
+
+        self.last_stats = SearchStats(
+            method=search.__name__,
+            expanded=self.expanded_nodes,
+            pushes=self.heap_pushes,
+            max_open=self.max_open_size,
+            cost=self.path_cost(path) if path else None,
+            time_ms=elapsed * 1000,
+            reachable=bool(path) and tuple(path[-1]) == tuple(goal),
+        )
+        return path
+    return wrapper
+
 class AStar:
-    def __init__(self, grid):
+    def __init__(self, grid, costs=None):
+        """
+        Args:
+            grid: Occupancy grid (0 = Unknown, 1 = Free, 2 = Tentative Obstacle,
+                  3 = Confirmed Obstacle)
+            costs: Optional precomputed per-cell cost array (e.g. CostMap.costs,
+                   np.inf = impassable). Defaults to CELL_COSTS looked up from grid.
+        """
+        self.costs = costs
         self.grid = grid
+        self.expanded_nodes = 0  # Nodes expanded by the last search
+        self.heap_pushes = 0  # Open set insertions by the last search
+        self.max_open_size = 0  # Largest open set (heap entries) of the last search
+        self.record_expanded = False  # Keep the expanded cells of each search in expanded_cells
+        self.expanded_cells = None  # Cells expanded by the last search, in order, if recorded
+        self.last_stats = None  # SearchStats of the last search
         self.directions = [
             (0, 1),   # right
             (1, 0),   # down
@@ -14,6 +70,37 @@ class AStar:
             (-1, 1),  # up-right
             (-1, -1)  # up-left
         ]
+        # Directions with their step length (diagonal movement costs more)
+        self.moves = [(dx, dy, 1.4 if abs(dx) + abs(dy) == 2 else 1) for dx, dy in self.directions]
+
+    @property
+    def grid(self):
+        return self._grid
+
+    @grid.setter
+    def grid(self, grid):
+        # Assign a new grid (rather than editing it in place) so costs are re-derived
+        self._grid = grid
+        self._cost_array = None
+        self._cost_rows = None
+
+    def set_costs(self, costs):
+        """Use a new precomputed cost array"""
+        self.costs = costs
+        self._cost_array = None
+        self._cost_rows = None
+
+    def cost_array(self):
+        """Per-cell costs as a NumPy array (np.inf = impassable)"""
+        if self._cost_array is None:
+            self._cost_array = self.costs if self.costs is not None else CELL_COSTS[self.grid]
+        return self._cost_array
+
+    def cost_rows(self):
+        """Cell costs as nested lists, which index much faster than NumPy scalars"""
+        if self._cost_rows is None:
+            self._cost_rows = self.cost_array().tolist()
+        return self._cost_rows
 
     def heuristic(self, a, b):
         """Octile distance heuristic (better for 8-directional movement)"""
@@ -21,47 +108,135 @@ class AStar:
         dy = abs(a[1] - b[1])
         return max(dx, dy) + (1.4 - 1) * min(dx, dy)
 
+    def euclidean(self, a, b):
+        """Straight-line distance, the heuristic for any-angle search"""
+        return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+    def segment_cost(self, costs, a, b):
+        """
+        Cost of the straight segment from a to b: Euclidean length times the
+        mean cost of the cells it enters, inf if any is impassable
+
+        Same line rasterization as path_smoothing.segment_cost, but on the
+        nested lists from cost_rows(), which is much faster for the many
+        short lines an any-angle search traces.
+        """
+        steps = max(abs(b[0] - a[0]), abs(b[1] - a[1]))
+        if steps == 0:
+            return 0.0
+        width, height = len(costs), len(costs[0])
+        dx, dy = b[0] - a[0], b[1] - a[1]
+
+        total = 0.0
+        for i in range(1, steps + 1):
+            t = i / steps
+            x, y = round(a[0] + t * dx), round(a[1] + t * dy)
+            if not (0 <= x < width and 0 <= y < height):
+                return INF
+            cell_cost = costs[x][y]
+            if cell_cost == INF:
+                return INF
+            total += cell_cost
+        return math.hypot(dx, dy) * total / steps
 
-    def get_neighbors(self, node, grid):
-        """Returns valid neighboring cells"""
+    def get_neighbors(self, node, costs):
+        """
+        Returns valid neighboring cells with the cost of moving there
+
+        Args:
+            node: (x, y) tuple
+            costs: Cell costs from cost_rows(); inf marks impassable cells
+        """
         neighbors = []
-        for dx, dy in self.directions:
+        width, height = len(costs), len(costs[0])
+        for dx, dy, step in self.moves:
             nx, ny = node[0] + dx, node[1] + dy
             
-            # Check if the neighbor is within grid bounds
-            if 0 <= nx < grid.shape[0] and 0 <= ny < grid.shape[1]:
-                # Check if the neighbor is traversable (not an obstacle)
-                # 0 = Unknown, 1 = Free, 2 = Tentative Obstacle, 3 = Confirmed Obstacle
-                if grid[nx, ny] != 3:  # Not a confirmed obstacle
-                    # Diagonal movement costs more
-                    cost = 1.4 if abs(dx) + abs(dy) == 2 else 1
-                    
-                    # Prefer known free spaces (1) over unknown spaces (0) and tentative obstacles (2)
-                    if grid[nx, ny] == 1:
-                        cost *= 1  # Normal cost for known free space
-                    elif grid[nx, ny] == 0:
-                        cost *= 2  # Higher cost for unknown space
-                    elif grid[nx, ny] == 2:
-                        cost *= 3  # Even higher cost for tentative obstacles
-                    
-                    neighbors.append((nx, ny, cost))
+            # Check if the neighbor is within grid bounds and traversable
+            if 0 <= nx < width and 0 <= ny < height:
+                cell_cost = costs[nx][ny]
+                if cell_cost != INF:
+                    neighbors.append((nx, ny, step * cell_cost))
                     
         return neighbors
 
-    def find_path(self, start, goal):
+    def get_predecessors(self, node, costs):
+        """
+        Returns cells from which node can be entered, with the cost of that move
+
+        Used by the backward half of the bidirectional search. The cost of a
+        move depends on the cell being entered, so it is node's cost here.
+        """
+        cell_cost = costs[node[0]][node[1]]
+        if cell_cost == INF:
+            return []
+
+        predecessors = []
+        width, height = len(costs), len(costs[0])
+        for dx, dy, step in self.moves:
+            px, py = node[0] + dx, node[1] + dy
+            if 0 <= px < width and 0 <= py < height and costs[px][py] != INF:
+                predecessors.append((px, py, step * cell_cost))
+
+        return predecessors
+
+    def path_cost(self, path):
+        """
+        Cost of a path of grid moves or any-angle waypoints, priced the way
+        the searches price them
+        """
+        costs = self.cost_rows()
+        total = 0.0
+        for a, b in zip(path, path[1:]):
+            dx, dy = abs(b[0] - a[0]), abs(b[1] - a[1])
+            if dx <= 1 and dy <= 1:
+                total += (1.4 if dx + dy == 2 else 1) * costs[b[0]][b[1]]
+            else:
+                total += self.segment_cost(costs, a, b)
+        return total
+
+    def reconstruct_path(self, came_from, current, start):
+        """Follow came_from links back from current and return the path from start"""
+        path = []
+        while current in came_from:
+            path.append(current)
+            current = came_from[current]
+        path.append(start)  # Add start position
+        return path[::-1]  # Return reversed path
+
+    def closest_reached_path(self, came_from, g_score, start, goal):
+        """Path to the reached node closest to the goal (fallback when the goal can't be reached)"""
+        closest = min(g_score, key=lambda node: (self.heuristic(node, goal), g_score[node]))
+        return self.reconstruct_path(came_from, closest, start)
+
+    @instrumented
+    def find_path(self, start, goal, should_stop=None, max_expansions=None, time_budget=None, partial=False):
         """
         Finds a path from start to goal using A* algorithm
         
         Args:
             start: (x, y) tuple for starting position
             goal: (x, y) tuple for goal position
+            should_stop: Optional function polled during the search; when it
+                         returns True the search is abandoned (returns None)
+            max_expansions: Optional limit on the number of nodes expanded
+            time_budget: Optional limit on search time in seconds
+            partial: If True, return the path to the reached node closest to
+                     the goal when the goal is unreachable or the budget runs
+                     out, instead of None
             
         Returns:
             List of (x, y) tuples representing the path
         """
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        costs = self.cost_rows()
+        expanded_cells = self.expanded_cells
+
         # Initialize data structures
         open_set = []  # Priority queue
         heapq.heappush(open_set, (0, start))  # (f_score, node)
+        self.heap_pushes += 1
         
         came_from = {}  # Dictionary to reconstruct the path
         
@@ -72,21 +247,30 @@ class AStar:
         
         # Main loop
         while open_set:
+            # Give up if the caller no longer needs this search
+            if should_stop is not None and should_stop():
+                return None
+
+            # Stop at the budget so planning latency stays bounded
+            if (max_expansions is not None and self.expanded_nodes >= max_expansions) or \
+                    (deadline is not None and time.perf_counter() >= deadline):
+                break
+
             # Get node with lowest f_score
+            if len(open_set) > self.max_open_size:
+                self.max_open_size = len(open_set)
             current = heapq.heappop(open_set)[1]
             open_set_hash.remove(current)
+            self.expanded_nodes += 1
+            if expanded_cells is not None:
+                expanded_cells.append(current)
             
             # Goal reached
             if current == goal:
-                path = []
-                while current in came_from:
-                    path.append(current)
-                    current = came_from[current]
-                path.append(start)  # Add start position
-                return path[::-1]  # Return reversed path
+                return self.reconstruct_path(came_from, current, start)
             
             # Check all neighbors
-            for neighbor in self.get_neighbors(current, self.grid):
+            for neighbor in self.get_neighbors(current, costs):
                 next_node = (neighbor[0], neighbor[1])  # Extract (x, y) properly
                 cost = neighbor[2]
 
@@ -104,7 +288,305 @@ class AStar:
                     if next_node not in open_set_hash:
                         heapq.heappush(open_set, (f_score[next_node], next_node))
                         open_set_hash.add(next_node)
+                        self.heap_pushes += 1
         
-        # No path found
+        # No path found (goal unreachable or budget exhausted)
+        if partial:
+            return self.closest_reached_path(came_from, g_score, start, goal)
+        return None
+
+    @instrumented
+    def find_path_anytime(self, start, goal, time_budget=None, max_expansions=None,
+                          initial_inflation=2.5, inflation_step=0.5, should_stop=None):
+        """
+        Anytime Repairing A* (ARA*): finds a fast, inflated-heuristic path first,
+        then keeps improving it with decreasing inflation until the budget runs out
+
+        Args:
+            start: (x, y) tuple for starting position
+            goal: (x, y) tuple for goal position
+            time_budget: Optional limit on search time in seconds
+            max_expansions: Optional limit on the number of nodes expanded
+            initial_inflation: Heuristic inflation of the first search (>= 1)
+            inflation_step: Amount the inflation drops after each solution
+            should_stop: Optional function polled during the search; when it
+                         returns True the search is abandoned (returns None)
+
+        Returns:
+            The best path found within the budget. Its cost is at most
+            self.last_inflation times the optimal cost. If no complete path
+            was found, the path to the reached node closest to the goal.
+        """
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        costs = self.cost_rows()
+        expanded_cells = self.expanded_cells
+        inflation = max(1.0, initial_inflation)
+
+        came_from = {}
+        g_score = {start: 0}
+        open_heap = [(inflation * self.heuristic(start, goal), start)]
+        open_nodes = {start}
+        self.heap_pushes += 1
+        closed = set()
+        inconsistent = set()  # Improved after being expanded in this iteration
+
+        best_path = None
+        self.last_inflation = None
+
+        while True:
+            # Improve the path with the current inflation
+            out_of_budget = False
+            while open_heap and g_score.get(goal, float('inf')) > open_heap[0][0]:
+                if should_stop is not None and should_stop():
+                    return None
+                if (max_expansions is not None and self.expanded_nodes >= max_expansions) or \
+                        (deadline is not None and time.perf_counter() >= deadline):
+                    out_of_budget = True
+                    break
+
+                if len(open_heap) > self.max_open_size:
+                    self.max_open_size = len(open_heap)
+                key, current = heapq.heappop(open_heap)
+                if current not in open_nodes:
+                    continue  # Outdated heap entry
+                open_nodes.remove(current)
+                closed.add(current)
+                self.expanded_nodes += 1
+                if expanded_cells is not None:
+                    expanded_cells.append(current)
+
+                for nx, ny, cost in self.get_neighbors(current, costs):
+                    next_node = (nx, ny)
+                    tentative_g_score = g_score[current] + cost
+                    if tentative_g_score < g_score.get(next_node, float('inf')):
+                        came_from[next_node] = current
+                        g_score[next_node] = tentative_g_score
+                        if next_node in closed:
+                            inconsistent.add(next_node)
+                        else:
+                            heapq.heappush(open_heap, (tentative_g_score + inflation * self.heuristic(next_node, goal), next_node))
+                            open_nodes.add(next_node)
+                            self.heap_pushes += 1
+
+            if out_of_budget:
+                break
+
+            if goal in g_score:
+                best_path = self.reconstruct_path(came_from, goal, start)
+                self.last_inflation = inflation
+            else:
+                break  # Goal unreachable; lower inflation won't change that
+
+            if inflation <= 1.0:
+                break  # Optimal path found
+
+            # Reuse the search effort with a smaller inflation
+            inflation = max(1.0, inflation - inflation_step)
+            open_nodes |= inconsistent
+            inconsistent = set()
+            closed = set()
+            open_heap = [(g_score[node] + inflation * self.heuristic(node, goal), node) for node in open_nodes]
+            heapq.heapify(open_heap)
+            self.heap_pushes += len(open_heap)
+
+        if best_path:
+            return best_path
+        return self.closest_reached_path(came_from, g_score, start, goal)
+
+    @instrumented
+    def find_path_bidirectional(self, start, goal, should_stop=None, max_expansions=None, time_budget=None):
+        """
+        Bidirectional A*: searches forward from start and backward from goal
+        over the same weighted grid until the two searches meet
+
+        Args:
+            start: (x, y) tuple for starting position
+            goal: (x, y) tuple for goal position
+            should_stop: Optional function polled during the search; when it
+                         returns True the search is abandoned (returns None)
+            max_expansions: Optional limit on the number of nodes expanded
+            time_budget: Optional limit on search time in seconds
+
+        Returns:
+            List of (x, y) tuples representing the path, or None
+        """
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        costs = self.cost_rows()
+        expanded_cells = self.expanded_cells
+
+        if start == goal:
+            return [start]
+
+        # Index 0 is the forward search (toward goal), 1 the backward search (toward start)
+        targets = (goal, start)
+        g_scores = ({start: 0}, {goal: 0})
+        parents = ({}, {})
+        open_sets = ([(self.heuristic(start, goal), start)], [(self.heuristic(goal, start), goal)])
+        closed = (set(), set())
+        self.heap_pushes += 2
+
+        best_cost = float('inf')  # Cost of the best path through a meeting node
+        meeting_node = None
+
+        while open_sets[0] and open_sets[1]:
+            if should_stop is not None and should_stop():
+                return None
+            if (max_expansions is not None and self.expanded_nodes >= max_expansions) or \
+                    (deadline is not None and time.perf_counter() >= deadline):
+                return None
+
+            # Neither search can find anything cheaper than the best meeting path
+            if best_cost <= max(open_sets[0][0][0], open_sets[1][0][0]):
+                break
+
+            # Expand the side with the smaller frontier
+            side = 0 if len(open_sets[0]) <= len(open_sets[1]) else 1
+            open_size = len(open_sets[0]) + len(open_sets[1])
+            if open_size > self.max_open_size:
+                self.max_open_size = open_size
+            _, current = heapq.heappop(open_sets[side])
+            if current in closed[side]:
+                continue  # Outdated heap entry
+            closed[side].add(current)
+            self.expanded_nodes += 1
+            if expanded_cells is not None:
+                expanded_cells.append(current)
+
+            g_score, other_g_score = g_scores[side], g_scores[1 - side]
+            if side == 0:
+                neighbors = self.get_neighbors(current, costs)
+            else:
+                neighbors = self.get_predecessors(current, costs)
+
+            for nx, ny, cost in neighbors:
+                next_node = (nx, ny)
+                tentative_g_score = g_score[current] + cost
+                if tentative_g_score < g_score.get(next_node, float('inf')):
+                    g_score[next_node] = tentative_g_score
+                    parents[side][next_node] = current
+                    heapq.heappush(open_sets[side],
+                                   (tentative_g_score + self.heuristic(next_node, targets[side]), next_node))
+                    self.heap_pushes += 1
+
+                    # Check whether the searches meet here with a cheaper path
+                    if next_node in other_g_score and tentative_g_score + other_g_score[next_node] < best_cost:
+                        best_cost = tentative_g_score + other_g_score[next_node]
+                        meeting_node = next_node
+
+        if meeting_node is None:
+            return None
+
+        # Join start -> meeting node and meeting node -> goal
+        path = self.reconstruct_path(parents[0], meeting_node, start)
+        current = meeting_node
+        while current in parents[1]:
+            current = parents[1][current]
+            path.append(current)
+        return path
+
+    @instrumented
+    def find_path_theta(self, start, goal, should_stop=None, max_expansions=None, time_budget=None, partial=False):
+        """
+        Lazy Theta*: any-angle A* where a node may take any visible ancestor
+        as its parent, giving straight segments instead of 45 degree zig-zags
+
+        A neighbour is queued assuming it can see its parent's parent, priced
+        at the straight-line distance times its own cell cost. The line of
+        sight and the real segment cost (see segment_cost) are only checked
+        when the node is expanded, so most lines are never traced.
+
+        Args:
+            start: (x, y) tuple for starting position
+            goal: (x, y) tuple for goal position
+            should_stop: Optional function polled during the search; when it
+                         returns True the search is abandoned (returns None)
+            max_expansions: Optional limit on the number of nodes expanded
+            time_budget: Optional limit on search time in seconds
+            partial: If True, return the path to the expanded node closest to
+                     the goal when the goal is unreachable or the budget runs
+                     out, instead of None
+
+        Returns:
+            List of (x, y) waypoints from start to goal, joined by straight
+            traversable segments, or None
+        """
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        costs = self.cost_rows()
+        expanded_cells = self.expanded_cells
+
+        open_set = [(self.euclidean(start, goal), 0, start)]  # (f_score, g_score when queued, node)
+        came_from = {}  # Any-angle parents; the start has none
+        g_score = {start: 0}
+        closed = set()
+        self.heap_pushes += 1
+
+        while open_set:
+            # Give up if the caller no longer needs this search
+            if should_stop is not None and should_stop():
+                return None
+
+            # Stop at the budget so planning latency stays bounded
+            if (max_expansions is not None and self.expanded_nodes >= max_expansions) or \
+                    (deadline is not None and time.perf_counter() >= deadline):
+                break
+
+            if len(open_set) > self.max_open_size:
+                self.max_open_size = len(open_set)
+            _, queued_g, current = heapq.heappop(open_set)
+            if current in closed or queued_g > g_score[current]:
+                continue  # Stale entry
+
+            if current in came_from:
+                # Check the assumed line of sight now that the node is expanded
+                parent = came_from[current]
+                g = g_score[parent] + self.segment_cost(costs, parent, current)
+
+                # Entering from an expanded grid neighbour may be cheaper (or the only way)
+                for px, py, cost in self.get_predecessors(current, costs):
+                    if (px, py) in closed and g_score[(px, py)] + cost < g:
+                        parent = (px, py)
+                        g = g_score[parent] + cost
+
+                came_from[current] = parent
+                g_score[current] = g
+                if g > queued_g + 1e-9:
+                    # Costlier than estimated; queue again at the real cost
+                    heapq.heappush(open_set, (g + self.euclidean(current, goal), g, current))
+                    self.heap_pushes += 1
+                    continue
+
+            closed.add(current)
+            self.expanded_nodes += 1
+            if expanded_cells is not None:
+                expanded_cells.append(current)
+
+            # Goal reached
+            if current == goal:
+                return self.reconstruct_path(came_from, current, start)
+
+            parent = came_from.get(current)
+            for nx, ny, cost in self.get_neighbors(current, costs):
+                next_node = (nx, ny)
+                if next_node in closed:
+                    continue
+
+                # Straight from the parent when it might be visible (checked lazily),
+                # otherwise from current itself
+                tentative_parent = current
+                tentative_g_score = g_score[current] + cost
+                if parent is not None:
+                    via_parent = g_score[parent] + self.euclidean(parent, next_node) * costs[nx][ny]
+                    if via_parent <= tentative_g_score:
+                        tentative_parent, tentative_g_score = parent, via_parent
+
+                if tentative_g_score < g_score.get(next_node, INF):
+                    came_from[next_node] = tentative_parent
+                    g_score[next_node] = tentative_g_score
+                    heapq.heappush(open_set, (tentative_g_score + self.euclidean(next_node, goal),
+                                              tentative_g_score, next_node))
+                    self.heap_pushes += 1
+
+        # No path found (goal unreachable or budget exhausted)
+        if partial and closed:
+            return self.closest_reached_path(came_from, {node: g_score[node] for node in closed}, start, goal)
         return None
-    
@@ -0,0 +1,185 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+# Run headless: the benchmarks draw on off-screen surfaces only
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+import numpy as np
+
+from a_star import AStar
+from slam import GridBasedSLAM, max_pool
+from planner import plan_coarse_to_fine
+from robot import Robot
+from render import draw_slam_map
+from scenario import load_scenario
+from benchmark_planner import rasterize_world, random_free_cell
+
+SCENARIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios")
+
+def free_positions(grid, rng, count):
+    """World positions (cell centres) of random free cells"""
+    return [[x * 10 + 5, y * 10 + 5] for x, y in (random_free_cell(grid, rng) for _ in range(count))]
+
+def bench_planner(world, grid, rng):
+    """AStar.find_path between random free cells"""
+    pathfinder = AStar(grid)
+    routes = [(random_free_cell(grid, rng), random_free_cell(grid, rng)) for _ in range(10)]
+
+    def run():
+        for start, goal in routes:
+            pathfinder.find_path(start, goal)
+    return run, len(routes)
+
+def bench_coarse_planner(world, grid, rng):
+    """plan_coarse_to_fine on the 4x pyramid level between random free cells"""
+    coarse_grid = max_pool(grid, 4)
+    routes = [(random_free_cell(grid, rng), random_free_cell(grid, rng)) for _ in range(10)]
+
+    def run():
+        for start, goal in routes:
+            plan_coarse_to_fine(grid, coarse_grid, 4, start, goal)
+    return run, len(routes)
+
+def bench_slam(world, grid, rng):
+    """GridBasedSLAM.sensor_update over a full sensor sweep at random positions"""
+    readings = []
+    for position in free_positions(grid, rng, 5):
+        robot = Robot(position, 0)
+        readings.extend((position, angle, distance) for angle, distance in robot.simulate_ultrasonic(world.obstacles).items())
+
+    def run():
+        slam = GridBasedSLAM(grid.shape[0], grid.shape[1])
+        for position, angle, distance in readings:
+            slam.sensor_update(position, angle, distance)
+    return run, len(readings)
+
+def bench_sensor(world, grid, rng):
+    """Robot.simulate_ultrasonic at random positions"""
+    robots = [Robot(position, 0) for position in free_positions(grid, rng, 5)]
+
+    def run():
+        for robot in robots:
+            robot.simulate_ultrasonic(world.obstacles)
+    return run, len(robots)
+
+def bench_render(world, grid, rng):
+    """draw_slam_map of the whole map onto an off-screen surface"""
+    # A fully explored map: free space plus a mix of tentative and confirmed obstacles
+    slam_map = grid.copy()
+    obstacles = slam_map == 3
+    slam_map[obstacles & (np.random.default_rng(rng.randrange(2**32)).random(grid.shape) < 0.3)] = 2
+    surface = pygame.Surface((world.width, world.height))
+
+    def run():
+        draw_slam_map(surface, slam_map, 0, 0)
+    return run, 1
+
+BENCHMARKS = {
+    "planner": bench_planner,
+    "coarse_planner": bench_coarse_planner,
+    "slam": bench_slam,
+    "sensor": bench_sensor,
+    "render": bench_render,
+}
+
+def measure(run, operations, repeats):
+    """Time run() repeats times; returns milliseconds per operation"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) * 1000 / operations)
+    return {
+        "median_ms": statistics.median(times),
+        "min_ms": min(times),
+        "max_ms": max(times),
+        "operations": operations,
+        "repeats": repeats,
+    }
+
+def run_benchmarks(scenario_paths, names, repeats, seed):
+    results = {}
+    for path in scenario_paths:
+        scenario_name = os.path.basename(path).split(".")[0]
+        world = load_scenario(path).world
+        grid = rasterize_world(world)
+
+        for name in names:
+            # Same inputs for every run, so results are comparable across builds
+            run, operations = BENCHMARKS[name](world, grid, random.Random(seed))
+            key = f"{name}/{scenario_name}"
+            results[key] = measure(run, operations, repeats)
+            print(f"{key:>32}: {results[key]['median_ms']:10.3f} ms/op (min {results[key]['min_ms']:.3f})")
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Compare median times against a baseline
+
+    Returns:
+        List of (key, baseline_ms, current_ms) for results more than
+        threshold (a fraction) slower than the baseline
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        before, after = baseline[key]["median_ms"], result["median_ms"]
+        change = (after - before) / before if before else 0.0
+        print(f"{key:>32}: {before:10.3f} -> {after:10.3f} ms/op ({change:+.1%})")
+        if change > threshold:
+            regressions.append((key, before, after))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the planner, SLAM, sensor model and renderer")
+    parser.add_argument("--scenarios", default=os.path.join(SCENARIO_DIR, "*.json.gz"),
+                        help="Glob of scenario files to run on")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), default=sorted(BENCHMARKS),
+                        help="Benchmarks to run")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for start/goal cells and robot positions")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Slowdown (fraction of the baseline median) reported as a regression")
+    args = parser.parse_args()
+
+    scenario_paths = sorted(glob.glob(args.scenarios))
+    if not scenario_paths:
+        parser.error(f"No scenarios match {args.scenarios}")
+
+    results = run_benchmarks(scenario_paths, args.only, args.repeats, args.seed)
+
+    if args.output:
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        print(f"\nCompared with {args.baseline}:")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for key, before, after in regressions:
+                print(f"  {key}: {before:.3f} -> {after:.3f} ms/op")
+            sys.exit(1)
+        print("No regressions")
+
+if __name__ == "__main__":
+    main()
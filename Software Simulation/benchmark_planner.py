@@ -0,0 +1,87 @@
+import argparse
+import random
+import time
+import numpy as np
+
+from map import World
+from a_star import AStar
+
+def rasterize_world(world, cell_size=10):
+    """Occupancy grid of a World: confirmed obstacle (3) under obstacles, free (1) elsewhere"""
+    grid = np.ones((world.width // cell_size, world.height // cell_size), dtype=int)
+    for obstacle in world.obstacles:
+        x0, y0 = obstacle.left // cell_size, obstacle.top // cell_size
+        x1, y1 = (obstacle.right - 1) // cell_size + 1, (obstacle.bottom - 1) // cell_size + 1
+        grid[max(0, x0):x1, max(0, y0):y1] = 3
+    return grid
+
+def random_free_cell(grid, rng):
+    free_x, free_y = np.nonzero(grid != 3)
+    index = rng.randrange(len(free_x))
+    return int(free_x[index]), int(free_y[index])
+
+def path_cost(grid, path):
+    """Cost of a path under AStar's weighting"""
+    weights = {0: 2, 1: 1, 2: 3}
+    cost = 0
+    for (x0, y0), (x1, y1) in zip(path, path[1:]):
+        step = 1.4 if abs(x1 - x0) + abs(y1 - y0) == 2 else 1
+        cost += step * weights[grid[x1, y1]]
+    return cost
+
+def run_search(search, start, goal):
+    start_time = time.perf_counter()
+    path = search(start, goal)
+    return path, time.perf_counter() - start_time
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare unidirectional and bidirectional A* on random World maps")
+    parser.add_argument("--maps", type=int, default=5, help="Number of random maps")
+    parser.add_argument("--pairs", type=int, default=20, help="Start/goal pairs per map")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    totals = {"unidirectional": [0, 0.0], "bidirectional": [0, 0.0]}  # [expanded nodes, seconds]
+    routes = 0
+    cheaper = 0  # Routes where the bidirectional path costs less
+    costlier = 0  # Routes where it costs more
+
+    for map_index in range(args.maps):
+        grid = rasterize_world(World(seed=args.seed + map_index))
+        pathfinder = AStar(grid)
+
+        for _ in range(args.pairs):
+            start, goal = random_free_cell(grid, rng), random_free_cell(grid, rng)
+
+            forward_path, forward_time = run_search(pathfinder.find_path, start, goal)
+            forward_expanded = pathfinder.expanded_nodes
+            both_path, both_time = run_search(pathfinder.find_path_bidirectional, start, goal)
+            both_expanded = pathfinder.expanded_nodes
+
+            if forward_path is None or both_path is None:
+                continue  # Only compare routes that exist
+
+            routes += 1
+            totals["unidirectional"][0] += forward_expanded
+            totals["unidirectional"][1] += forward_time
+            totals["bidirectional"][0] += both_expanded
+            totals["bidirectional"][1] += both_time
+            cost_difference = path_cost(grid, both_path) - path_cost(grid, forward_path)
+            if cost_difference < -1e-6:
+                cheaper += 1
+            elif cost_difference > 1e-6:
+                costlier += 1
+
+    if not routes:
+        print("No reachable start/goal pairs found")
+        return
+
+    print(f"{routes} routes on {args.maps} maps")
+    for name, (expanded, seconds) in totals.items():
+        print(f"{name:>15}: {expanded / routes:9.1f} nodes expanded, {seconds / routes * 1000:8.2f} ms per route")
+    print(f"Bidirectional path cheaper on {cheaper} routes, costlier on {costlier}")
+
+if __name__ == "__main__":
+    main()
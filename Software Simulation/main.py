@@ -1,19 +1,40 @@
 import pygame
 import math
 import time
+import argparse
+import os
 from robot import Robot
 from map import World
+from scenario import load_scenario, save_scenario, default_spawn_points
 from slam import GridBasedSLAM
-from a_star import AStar
+from planner import PlannerService
+from costmap import CostMap
+from render import draw_slam_map
+from viewport import Viewport
+from compositor import Compositor
+from profiler import Profiler
+from map_store import load_slam, MapCheckpointer
+from telemetry import TelemetryPublisher
 import cv2
-from pyzbar.pyzbar import decode
+from qr_scanner import QRScanner
 import tkinter as tk
 from tkinter import messagebox
 import random
+from collections import deque
+import numpy as np
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+parser = argparse.ArgumentParser(description="TragerX SLAM simulator")
+parser.add_argument("--seed", type=int, help="Seed for the random world (same seed, same map)")
+parser.add_argument("--scenario", help="Load the world, counters and robots from a scenario file")
+parser.add_argument("--save-scenario", help="Save this run's world, counters and robots to a scenario file")
+parser.add_argument("--map", help="Continue from the occupancy map saved in this file and keep it up to date")
+parser.add_argument("--telemetry-port", type=int, help="Stream the map and robot state to dashboards on this local port")
+parser.add_argument("--profile-export", help="Periodically write per-stage loop timings to this .json or .csv file")
+args = parser.parse_args()
+
 pygame.init()
 
 # Screen dimensions
@@ -111,13 +132,40 @@ if not continue_app:
 # Font for telemetry data and other texts
 font = pygame.font.SysFont("Arial", 24)
 small_red_font = pygame.font.SysFont("Arial", 18)
-
-# Create world object
-world = World()
-slam = GridBasedSLAM(80, 60)  # Start with 80x60 grid for the map
+profile_font = pygame.font.SysFont("Courier New", 14)  # Monospaced so the timing table lines up
+
+# Create world object, from a scenario file or generated from the seed
+scenario = load_scenario(args.scenario) if args.scenario else None
+world = scenario.world if scenario else World(seed=args.seed)
+if args.map and os.path.exists(args.map):
+    slam = load_slam(args.map)  # Continue from the saved map (only meaningful for the same world)
+else:
+    slam = GridBasedSLAM(80, 60)  # Start with 80x60 grid for the map
+
+# Save the map's changed tiles every few seconds
+MAP_CHECKPOINT_INTERVAL = 10
+map_checkpointer = MapCheckpointer(args.map, slam) if args.map else None
+
+# Stream map changes and robot state to the dashboard a few times a second
+TELEMETRY_INTERVAL = 0.2
+telemetry_publisher = TelemetryPublisher(port=args.telemetry_port) if args.telemetry_port else None
+
+def robot_telemetry(robot):
+    """State of one robot as sent to the dashboard"""
+    return {
+        "id": robot.id,
+        "position": [round(robot.position[0], 1), round(robot.position[1], 1)],
+        "angle": round(robot.angle, 1),
+        "workflow_state": getattr(robot, "workflow_state", None),
+        "location": robot.location,
+        "destination": list(robot.destination) if robot.destination else None,
+        "path": [list(cell) for cell in robot.current_path] if robot.current_path else None,
+        "waiting": robot.is_waiting,
+        "stationary": robot.stationary,
+    }
 
 # Define counter positions
-counter_positions = {
+default_counter_positions = {
     "source": [SCREEN_WIDTH // 2, UI_HEIGHT + MAP_HEIGHT // 2],  # Center of the map
     "customer": [SCREEN_WIDTH // 2 + 200, UI_HEIGHT + MAP_HEIGHT // 2 + 200],
     "counter1-A": [SCREEN_WIDTH // 2 - 300, UI_HEIGHT + MAP_HEIGHT // 2 - 100],
@@ -128,42 +176,45 @@ counter_positions = {
     "counter3-B": [SCREEN_WIDTH // 2 + 300, UI_HEIGHT + MAP_HEIGHT // 2 + 100],
 }
 
+counter_positions = scenario.counter_positions if scenario else default_counter_positions
+
+# Robot spawn points: by default 2 stationary robots at source, 5 at the counters,
+# the mobile robot at source and two more stationary ones there, 10 in all
+spawn_points = scenario.spawn_points if scenario else default_spawn_points(counter_positions)
+
 # Create the robots
-robots = []
-
-# Create stationary robots at source (2)
-for i in range(2):
-    robot = Robot(counter_positions["source"].copy(), 0, id=i, stationary=True, location="source")
-    robots.append(robot)
-
-# Create robots at counter positions
-locations = [
-    "counter1-A", "counter1-A",  # 2 at 1-A
-    "counter1-B",  # 1 at 1-B
-    "counter3-A",  # 1 at 3-A
-    "counter3-B"   # 1 at 3-B
-]
-
-for i, location in enumerate(locations, start=2):
-    robot = Robot(counter_positions[location].copy(), 0, id=i, stationary=True, location=location)
-    robots.append(robot)
-
-# Create mobile robot (the one that will navigate from source to counters)
-active_robot = Robot(counter_positions["source"].copy(), 0, id=len(robots), location="source")
+robots = [Robot(list(spawn["position"]), 0, id=i, stationary=spawn["stationary"], location=spawn["location"])
+          for i, spawn in enumerate(spawn_points)]
+
+# The mobile robot (the one that will navigate from source to counters)
+active_robot = next(robot for robot in robots if not robot.stationary)
 active_robot.workflow_state = "idle"  # New state for workflow tracking
-robots.append(active_robot)
 
-# Add two more robots to reach 10 total
-for i in range(len(robots), 10):
-    robot = Robot(counter_positions["source"].copy(), 0, id=i, stationary=True, location="source")
-    robots.append(robot)
+if args.save_scenario:
+    save_scenario(args.save_scenario, world, counter_positions, spawn_points)
+    print(f"Scenario saved to {args.save_scenario}")
 
-# Initialize pathfinder
-pathfinder = None  # We'll initialize this after the first SLAM update
+# Plans paths on a background thread so long searches don't freeze the frame
+# Found paths are compressed to the waypoints where they turn
+PLANNING_TIME_BUDGET = 0.2  # Seconds per search before settling for the best path so far
+planner = PlannerService(time_budget=PLANNING_TIME_BUDGET, mode="anytime", smoothing="compress")
+requested_goal = None  # Goal of the newest planning request
+show_expanded = False  # Press E to show the cells the planner expands, with its search statistics
+expanded_cells = None  # Cells expanded by the search that produced the current path
 
-# Timer for path recalculation
-path_recalc_timer = 0
-PATH_RECALC_INTERVAL = 30  # Recalculate path every 30 frames (about 1 second)
+# Planning costs inflated around obstacles, refreshed only where SLAM changed cells
+cost_map = CostMap(slam.occupancy_grid, robot_radius=active_robot.radius // 10)
+slam.add_change_listener(cost_map.mark_dirty)
+
+def invalidate_blocked_path(changed_cells):
+    """SLAM change listener: drop the active robot's path when an obstacle appears on it"""
+    if active_robot.path_blocked(changed_cells, slam.occupancy_grid):
+        print(f"Obstacle detected on Robot {active_robot.id}'s path, replanning")
+        active_robot.current_path = None
+        planner.cancel()  # A search still running was planned on the old map
+
+# Paths are only replanned when SLAM puts an obstacle on them or the robot strays off them
+slam.add_change_listener(invalidate_blocked_path)
 
 # Rest of your code continues...
 
@@ -180,13 +231,19 @@ def find_counter_with_fewest_robots(counter_num):
     else:
         return counter_B
 
+def destination_grid_position(robot):
+    """Grid cell of the robot's destination, clamped to the map"""
+    dest_grid_x, dest_grid_y = slam.world_to_grid(robot.destination)
+
+    # Make sure the destination coordinates are within grid bounds
+    dest_grid_x = min(dest_grid_x, slam.occupancy_grid.shape[0] - 1)
+    dest_grid_y = min(dest_grid_y, slam.occupancy_grid.shape[1] - 1)
+    return dest_grid_x, dest_grid_y
+
 # Colors
 BACKGROUND_COLOR = (0, 0, 0)  # Black for map background
 UI_BACKGROUND_COLOR = (50, 50, 50)  # Darker grey for UI section
 TEXT_COLOR = (255, 255, 255)  # White text for telemetry
-CLEAR_SPACE_COLOR = (128, 128, 128)  # Grey for clear space
-OBSTACLE_FIRST_DETECTED_COLOR = (255, 255, 0)  # Yellow for first detection of obstacle
-OBSTACLE_CONFIRMED_COLOR = (0, 255, 0)  # Green for confirmed obstacles
 FRONTIER_COLOR = (64, 64, 64)  # Dark grey for frontier
 ROBOT_COLOR = (0, 0, 255)  # Blue for robot
 ACTIVE_ROBOT_COLOR = (255, 0, 0)  # Red for active robot
@@ -194,10 +251,32 @@ PATH_COLOR = (255, 255, 255)  # White for path
 PLANNED_PATH_COLOR = (255, 0, 255)  # Magenta for planned path
 CURRENT_TARGET_COLOR = (255, 0, 0)  # Red for current target
 DESTINATION_COLOR = (0, 255, 255)  # Cyan for destination point
+EXPANDED_COLOR = (255, 200, 0)  # Amber for cells the planner expanded
 RED_TEXT_COLOR = (255, 0, 0)  # Red for the custom simulator text
 
-# Track robot path (real-world coordinates)
-path_points = []
+# Track robot path (real-world coordinates); only the most recent points are
+# kept, so drawing the trail costs the same however long the run
+PATH_TRAIL_LENGTH = 2000
+path_points = deque(maxlen=PATH_TRAIL_LENGTH)
+
+# Camera over the map area; zoom with +/- or the mouse wheel
+viewport = Viewport(pygame.Rect(0, UI_HEIGHT, SCREEN_WIDTH, MAP_HEIGHT), min_zoom=0.2)
+
+# Screen regions are only redrawn when what they show changes
+compositor = Compositor(screen)
+hud_rect = pygame.Rect(0, 0, SCREEN_WIDTH, UI_HEIGHT)
+map_version = 0  # Bumped whenever SLAM changes a cell, so the cached map layer is repainted
+
+def count_map_change(cells):
+    global map_version
+    map_version += 1
+
+slam.add_change_listener(count_map_change)
+
+def draw_map_layer(surface, slam_map, offset_x, offset_y, cell_size):
+    """Paint the SLAM map onto the cached layer behind the map area"""
+    surface.fill(BACKGROUND_COLOR)
+    draw_slam_map(surface, slam_map, offset_x, offset_y, cell_size=cell_size)
 
 class OTPVerificationApp:
     def __init__(self, root):
@@ -303,18 +382,61 @@ class OTPVerificationApp:
 
 qr_scan_result = None
 k = 0
+qr_scanner = QRScanner(0)
+
+def finish_qr_scan():
+    """Send the active robot to the counter selected by the QR scan"""
+    global qr_scan_result
+
+    if not qr_scan_result:
+        qr_scan_result = "1"  # Default to counter1
+
+    counter = find_counter_with_fewest_robots(qr_scan_result)
+    print(f"QR Scan Result: {qr_scan_result}, Selected Counter: {counter}")
+    active_robot.set_destination(counter_positions[counter][0], counter_positions[counter][1])
+    active_robot.location = counter
+    active_robot.workflow_state = "to_counter"
 
 
+# The robots move in simulated seconds, so the frame rate doesn't change their speed
+FRAME_RATE = 60  # Frame cap
+SIMULATION_SPEED = 1.0  # Simulated seconds per real second; raise to fast-forward
+MAX_FRAME_TIME = 0.1  # Longest frame simulated in one step; stalls (dialogs, window drags) are not caught up
+clock = pygame.time.Clock()
+
+# Per-stage timings of the main loop; press P to show them
+profiler = Profiler()
+show_profile = False
+PROFILE_EXPORT_INTERVAL = 5  # Seconds between --profile-export writes
+PROFILE_OVERLAY_REFRESH = 0.5  # Seconds between updates of the on-screen timings
+
 # Main game loop
 running = True
 while running:
+    dt = min(clock.tick(FRAME_RATE) / 1000, MAX_FRAME_TIME) * SIMULATION_SPEED
+    profiler.start_frame()
+
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
+        if event.type in (pygame.VIDEORESIZE, pygame.WINDOWEXPOSED):
+            compositor.invalidate()  # The window contents may have been lost
+        if event.type == pygame.MOUSEWHEEL:
+            viewport.zoom_by(1.25 if event.y > 0 else 0.8)
         # Exit on pressing the Escape key or 'Q'
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_ESCAPE or event.key == pygame.K_q:
                 running = False
+            if event.key == pygame.K_p:
+                show_profile = not show_profile
+            # Zoom the map view
+            if event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                viewport.zoom_by(1.25)
+            if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                viewport.zoom_by(0.8)
+            if event.key == pygame.K_e:
+                show_expanded = not show_expanded
+                planner.record_expanded = show_expanded
             # Start the workflow cycle when at source and in idle state
             if event.key == pygame.K_SPACE and active_robot.workflow_state == "idle" and active_robot.location == "source":
                 active_robot.workflow_state = "to_customer"
@@ -327,78 +449,82 @@ while running:
                     root = tk.Tk()
                     app = OTPVerificationApp(root)
                     root.mainloop()
-                    cap = cv2.VideoCapture(0)
                     qr_scan_result = None
 
-                    while True:
-                        ret, frame = cap.read()
-                        if not ret:
-                            continue
-
-                        qr_codes = decode(frame)
-                        for qr in qr_codes:
-                            qr_scan_result = qr.data.decode('utf-8')
-                            cap.release()
-
-                        cv2.imshow("QR Code Scanner", frame)
-
-                        if cv2.waitKey(1) & 0xFF == ord('q') or qr_scan_result:
-                            k = 1
-                            break
-                            
-                    cap.release()
-                    cv2.destroyAllWindows()
-
-                if not qr_scan_result:
-                    qr_scan_result = "1"  # Default to counter1
-
-                counter = find_counter_with_fewest_robots(qr_scan_result)
-                print(f"QR Scan Result: {qr_scan_result}, Selected Counter: {counter}")
-                active_robot.set_destination(counter_positions[counter][0], counter_positions[counter][1])
-                active_robot.location = counter
-                active_robot.workflow_state = "to_counter"
+                    # Capture and decode on background threads so the simulation keeps running
+                    try:
+                        qr_scanner.start_async()
+                        active_robot.workflow_state = "scanning_qr"
+                    except ValueError as e:
+                        print(f"QR scanner unavailable: {e}")
+                        k = 1
+                        finish_qr_scan()
+                else:
+                    finish_qr_scan()
+
+    # Poll the background QR scanner without blocking the frame
+    if active_robot.workflow_state == "scanning_qr":
+        qr_scan_result = qr_scanner.get_result()
+        frame = qr_scanner.get_latest_frame()
+        if frame is not None:
+            cv2.imshow("QR Code Scanner", frame)
+
+        if cv2.waitKey(1) & 0xFF == ord('q') or qr_scan_result:
+            qr_scanner.stop()
+            cv2.destroyAllWindows()
+            k = 1
+            finish_qr_scan()
+    profiler.lap("events")
 
     # Get sensor data for the active robot (now scanning in multiple directions)
-    sensor_data = active_robot.simulate_ultrasonic(world.obstacles)
+    sensor_data = active_robot.simulate_ultrasonic(world.obstacles, dt)
+    profiler.lap("sensing")
 
     # Update SLAM for each sensor angle from active robot
     for sensor_angle, distance in sensor_data.items():
         slam.sensor_update(active_robot.position, sensor_angle, distance)
+    cost_map.refresh(slam.occupancy_grid)
+    if map_checkpointer:
+        map_checkpointer.maybe_checkpoint(MAP_CHECKPOINT_INTERVAL)
+    profiler.lap("slam")
+
+    if telemetry_publisher:
+        telemetry_publisher.maybe_publish(TELEMETRY_INTERVAL, slam.occupancy_grid,
+                                 lambda: [robot_telemetry(robot) for robot in robots])
+        profiler.lap("telemetry")
+
+    # Pick up a path finished by the background planner
+    plan = planner.get_result()
+    if plan is not None and active_robot.destination and plan.goal == destination_grid_position(active_robot):
+        expanded_cells = plan.expanded
+        if plan.path:
+            active_robot.set_path(plan.path)
+            print(f"New path planned for Robot {active_robot.id} with {len(plan.path)} points")
+
+            # Obstacles may have been confirmed on the path while the search ran
+            # (tentative cells are passable, so the planner may route through them)
+            if active_robot.path_blocked(active_robot.path_cells, slam.occupancy_grid, blocking=3):
+                active_robot.current_path = None
+        else:
+            print(f"No path found for Robot {active_robot.id}, will try again later")
 
-    # Initialize or update pathfinder with current map
-    if pathfinder is None:
-        pathfinder = AStar(slam.occupancy_grid)
-    else:
-        pathfinder.grid = slam.occupancy_grid
-
-    # Path planning for active robot
-    path_recalc_timer += 1
-    
-
+    # Replan if the robot has strayed from the segment it is driving
+    if active_robot.current_path and active_robot.distance_from_path() > active_robot.path_corridor:
+        print(f"Robot {active_robot.id} left its path corridor, replanning")
+        active_robot.current_path = None
 
-    # Check if active robot needs to calculate a new path
-    if active_robot.destination and (active_robot.current_path is None or path_recalc_timer >= PATH_RECALC_INTERVAL) and not active_robot.has_reached_destination:
-        path_recalc_timer = 0
-        
+    # Check if active robot needs to calculate a new path: it has none, or its
+    # destination changed. Only one request is in flight at a time unless the
+    # destination changed, which supersedes it.
+    destination_changed = requested_goal != destination_grid_position(active_robot) if active_robot.destination else False
+    if active_robot.destination and (active_robot.current_path is None or destination_changed) and not active_robot.has_reached_destination and (not planner.is_busy() or destination_changed):
         # Convert robot position to grid coordinates
         robot_grid_x, robot_grid_y = slam.world_to_grid(active_robot.position)
         
-        # Convert destination to grid coordinates
-        dest_grid_x, dest_grid_y = slam.world_to_grid(active_robot.destination)
-            
-        # Make sure the destination coordinates are within grid bounds
-        dest_grid_x = min(dest_grid_x, slam.occupancy_grid.shape[0] - 1)
-        dest_grid_y = min(dest_grid_y, slam.occupancy_grid.shape[1] - 1)
-        
-        # Plan path to destination
-        new_path = pathfinder.find_path((robot_grid_x, robot_grid_y), (dest_grid_x, dest_grid_y))
-        
-        if new_path:
-            active_robot.current_path = new_path
-            active_robot.path_index = 0
-            print(f"New path planned for Robot {active_robot.id} with {len(new_path)} points")
-        else:
-            print(f"No path found for Robot {active_robot.id}, will try again later")
+        # Plan path to destination in the background
+        requested_goal = destination_grid_position(active_robot)
+        planner.request((robot_grid_x, robot_grid_y), requested_goal, slam.occupancy_grid, cost_map.costs)
+    profiler.lap("planning")
     
     # State machine for the workflow
     if active_robot.has_reached_destination:
@@ -422,7 +548,7 @@ while running:
     
     # Check if robot has finished waiting at counter
     if active_robot.workflow_state == "at_counter" and active_robot.is_waiting:
-        active_robot.wait_timer += 1
+        active_robot.wait_timer += dt
         if active_robot.wait_timer >= active_robot.wait_duration:
             active_robot.is_waiting = False
             active_robot.wait_timer = 0
@@ -432,18 +558,12 @@ while running:
 
     # Update all robots' movements
     for robot in robots:
-        robot.update_navigation(slam.occupancy_grid)
-
-    # Clear the screen with background color
-    screen.fill(BACKGROUND_COLOR)
+        robot.update_navigation(slam.occupancy_grid, dt)
+    profiler.lap("navigation")
 
-    # Draw the UI section at the top
-    pygame.draw.rect(screen, UI_BACKGROUND_COLOR, pygame.Rect(0, 0, SCREEN_WIDTH, UI_HEIGHT))
+    # Only regions whose content changed are redrawn; a frame where nothing
+    # changed is skipped entirely
 
-    # Text for Telemetry display and top UI
-    title_text = small_red_font.render("TragerX SLAM simulation", True, RED_TEXT_COLOR)
-    robot_text = font.render("Robot sensor: HC-SR04", True, TEXT_COLOR)
-   
     # Show navigation status of active robot
     if active_robot.workflow_state == "idle":
         if active_robot.location == "source":
@@ -454,133 +574,158 @@ while running:
         status = "Navigating to Customer"
     elif active_robot.workflow_state == "at_customer":
         status = "At Customer - Ready for QR Scan (Press SPACE)"
+    elif active_robot.workflow_state == "scanning_qr":
+        status = "Scanning QR Code (press q in the camera window to skip)"
     elif active_robot.workflow_state == "to_counter":
         status = f"Navigating to {active_robot.location}"
     elif active_robot.workflow_state == "at_counter":
-        status = f"At {active_robot.location} - Waiting {active_robot.wait_timer/30:.1f}s"
+        status = f"At {active_robot.location} - Waiting {active_robot.wait_timer:.1f}s"
     elif active_robot.workflow_state == "to_source":
         status = "Returning to Charging Station"
    
-    telemetry_text = font.render(f"Robot {active_robot.id} | Angle: {active_robot.angle:.2f}° | Position: ({int(active_robot.position[0])}, {int(active_robot.position[1])})", True, TEXT_COLOR)
-    status_text = font.render(f"Status: {status}", True, TEXT_COLOR)
-    
-    screen.blit(title_text, (10, 10))
-    screen.blit(robot_text, (10, 40))
-    screen.blit(telemetry_text, (10, 70))
-    screen.blit(status_text, (10, 100))
-
-    # Track active robot's path
-    path_points.append((active_robot.position[0], active_robot.position[1]))
-
-    # Centering: Keep the active robot centered in the map area
-    robot_screen_x = SCREEN_WIDTH // 2
-    robot_screen_y = UI_HEIGHT + MAP_HEIGHT // 2
-
-    # Calculate offset based on active robot's position relative to the grid
-    offset_x = SCREEN_WIDTH // 2 - active_robot.position[0]
-    offset_y = UI_HEIGHT + MAP_HEIGHT // 2 - active_robot.position[1]
-
-    # Draw the SLAM map (only what the robot has detected)
-    slam_map = slam.get_map()
-    for x in range(slam_map.shape[0]):
-        for y in range(slam_map.shape[1]):
-            rect_x = x * 10 + offset_x
-            rect_y = y * 10 + offset_y
-
-            if rect_y > UI_HEIGHT:  # Ensure map is drawn below the UI section
-                if slam_map[x, y] == 1:  # Clear space (grey)
-                    pygame.draw.rect(screen, CLEAR_SPACE_COLOR, pygame.Rect(rect_x, rect_y, 10, 10), 1)
-                elif slam_map[x, y] == 2:  # First detected obstacle (yellow)
-                    pygame.draw.rect(screen, OBSTACLE_FIRST_DETECTED_COLOR, pygame.Rect(rect_x, rect_y, 10, 10))
-                elif slam_map[x, y] == 3:  # Confirmed obstacle (green)
-                    pygame.draw.rect(screen, OBSTACLE_CONFIRMED_COLOR, pygame.Rect(rect_x, rect_y, 10, 10))
-
-    # Draw robot's path using the real-world positions
-    if len(path_points) > 1:
-        # Keep path static relative to the world, rather than shifting with the robot
-        transformed_path = [(x - active_robot.position[0] + robot_screen_x, y - active_robot.position[1] + robot_screen_y) for (x, y) in path_points]
-        # Ensure the path does not draw in the telemetry area
-        transformed_path = [(x, y) for (x, y) in transformed_path if y > UI_HEIGHT]
-        pygame.draw.lines(screen, PATH_COLOR, False, transformed_path, 2)
-    
-    # Draw all counter positions
-    for name, pos in counter_positions.items():
-        # Skip the source position as it might clutter the view
-        if name == "source":
-            # Draw charging station marker
-            source_screen_x = pos[0] - active_robot.position[0] + robot_screen_x
-            source_screen_y = pos[1] - active_robot.position[1] + robot_screen_y
-            if source_screen_y > UI_HEIGHT:
-                pygame.draw.circle(screen, (0, 255, 0), (source_screen_x, source_screen_y), 15)
+    telemetry = f"Robot {active_robot.id} | Angle: {active_robot.angle:.2f}° | Position: ({int(active_robot.position[0])}, {int(active_robot.position[1])})"
+    planner_line = None
+    if show_expanded:
+        metrics = planner.get_metrics()
+        planner_line = (f"Planner: {metrics['searches']} searches, {metrics['mean_expanded']:.0f} expanded, "
+                        f"{metrics['mean_time_ms']:.1f} ms mean, {metrics['max_time_ms']:.1f} ms max")
+
+    if compositor.region("hud", hud_rect, (telemetry, status, planner_line)):
+        # Draw the UI section at the top
+        pygame.draw.rect(screen, UI_BACKGROUND_COLOR, hud_rect)
+
+        # Text for Telemetry display and top UI
+        title_text = small_red_font.render("TragerX SLAM simulation", True, RED_TEXT_COLOR)
+        robot_text = font.render("Robot sensor: HC-SR04", True, TEXT_COLOR)
+        telemetry_text = font.render(telemetry, True, TEXT_COLOR)
+        status_text = font.render(f"Status: {status}", True, TEXT_COLOR)
+
+        screen.blit(title_text, (10, 10))
+        screen.blit(robot_text, (10, 40))
+        screen.blit(telemetry_text, (10, 70))
+        screen.blit(status_text, (10, 100))
+        if planner_line:
+            screen.blit(small_red_font.render(planner_line, True, TEXT_COLOR), (10, 125))
+
+    # Track active robot's path (only when it moves, so an idle robot doesn't grow it)
+    if not path_points or path_points[-1] != tuple(active_robot.position):
+        path_points.append((active_robot.position[0], active_robot.position[1]))
+
+    # Keep the active robot centered in the map area; everything below is
+    # drawn through the viewport and culled against it
+    viewport.follow(active_robot.position)
+    map_view = (viewport.center, viewport.zoom, map_version)
+    scene = (map_view, path_points[-1] if path_points else None, tuple(active_robot.current_path or ()), active_robot.path_index,
+             tuple((robot.position[0], robot.position[1], robot.angle) for robot in robots),
+             show_expanded and id(expanded_cells),
+             show_profile and int(time.perf_counter() / PROFILE_OVERLAY_REFRESH))
+    if compositor.region("map", viewport.rect, scene):
+        cell_size = 10 * viewport.zoom
+        offset_x, offset_y = viewport.offset()
+
+        # Draw the SLAM map (only what the robot has detected) from a cached
+        # layer, repainted only when the map or the camera changed. Zoomed far
+        # out, draw a coarser pyramid level instead of many sub-pixel cells.
+        map_factor = next((factor for factor in (1,) + slam.pyramid_factors if cell_size * factor >= 3),
+                          slam.pyramid_factors[-1])
+        map_layer = compositor.layer("slam", viewport.rect.size, map_view, lambda surface: draw_map_layer(
+            surface, slam.get_map(map_factor), offset_x - viewport.rect.left, offset_y - viewport.rect.top,
+            cell_size * map_factor))
+        screen.blit(map_layer, viewport.rect)
+        screen.set_clip(viewport.rect)
+
+        # Draw the cells expanded by the last search
+        if show_expanded and expanded_cells:
+            expanded_screen = viewport.to_screen_array(np.array(expanded_cells) * 10 + 5)
+            marker_size = max(1, int(4 * viewport.zoom))
+            for screen_x, screen_y in expanded_screen[viewport.visible_mask(expanded_screen)]:
+                pygame.draw.rect(screen, EXPANDED_COLOR, pygame.Rect(screen_x - marker_size // 2, screen_y - marker_size // 2,
+                                                                     marker_size, marker_size))
+
+        # Draw robot's path using the real-world positions, so it stays put in the world
+        for run in viewport.visible_runs(viewport.to_screen_array(path_points)):
+            pygame.draw.lines(screen, PATH_COLOR, False, run, 2)
+
+        # Draw all counter positions (labels may stick out of the viewport, hence the margin)
+        for name, pos in counter_positions.items():
+            pos_screen_x, pos_screen_y = viewport.to_screen(pos)
+            if not viewport.is_visible((pos_screen_x, pos_screen_y), margin=150):
+                continue
+
+            if name == "source":
+                # Draw charging station marker
+                pygame.draw.circle(screen, (0, 255, 0), (pos_screen_x, pos_screen_y), max(2, int(15 * viewport.zoom)))
                 label = small_red_font.render("Charging Station", True, (0, 255, 255))
-                screen.blit(label, (source_screen_x + 15, source_screen_y - 10))
-            continue
-        
-        # Calculate screen coordinates for counter/customer
-        pos_screen_x = pos[0] - active_robot.position[0] + robot_screen_x
-        pos_screen_y = pos[1] - active_robot.position[1] + robot_screen_y
-        
-        if pos_screen_y > UI_HEIGHT:  # Don't draw in UI area
+                screen.blit(label, (pos_screen_x + 15, pos_screen_y - 10))
+                continue
+
             if name == "customer":
                 # Draw customer marker
-                pygame.draw.circle(screen, (255, 165, 0), (pos_screen_x, pos_screen_y), 12)  # Orange for customer
+                pygame.draw.circle(screen, (255, 165, 0), (pos_screen_x, pos_screen_y), max(2, int(12 * viewport.zoom)))  # Orange for customer
                 label = small_red_font.render("Customer", True, (255, 165, 0))
             else:
                 # Draw counter marker
-                pygame.draw.circle(screen, DESTINATION_COLOR, (pos_screen_x, pos_screen_y), 12)
+                pygame.draw.circle(screen, DESTINATION_COLOR, (pos_screen_x, pos_screen_y), max(2, int(12 * viewport.zoom)))
                 label = small_red_font.render(name, True, DESTINATION_COLOR)
-            
+
             screen.blit(label, (pos_screen_x + 10, pos_screen_y - 10))
-    
-    # Draw the planned path
-    if active_robot.current_path:
-        # Draw all points in the planned path
-        for i, (grid_x, grid_y) in enumerate(active_robot.current_path):
-            # Convert grid coordinates to screen coordinates
-            screen_x = grid_x * 10 + 5 + offset_x  # Center of the grid cell
-            screen_y = grid_y * 10 + 5 + offset_y  # Center of the grid cell
-            
-            if screen_y > UI_HEIGHT:  # Don't draw in UI area
-                # Highlight the current target
+
+        # Draw the planned path (grid cells, drawn at their centers)
+        if active_robot.current_path:
+            path_screen = viewport.to_screen_array(np.array(active_robot.current_path) * 10 + 5)
+
+            # Draw lines connecting the path points
+            for run in viewport.visible_runs(path_screen):
+                pygame.draw.lines(screen, PLANNED_PATH_COLOR, False, run, 1)
+
+            # Draw the visible points, highlighting the current target
+            for i in np.flatnonzero(viewport.visible_mask(path_screen, margin=5)):
                 if i == active_robot.path_index:
-                    pygame.draw.circle(screen, CURRENT_TARGET_COLOR, (screen_x, screen_y), 5)
+                    pygame.draw.circle(screen, CURRENT_TARGET_COLOR, path_screen[i], 5)
                 else:
-                    pygame.draw.circle(screen, PLANNED_PATH_COLOR, (screen_x, screen_y), 3)
-        
-        # Draw lines connecting the path points
-        if len(active_robot.current_path) > 1:
-            path_lines = [(p[0] * 10 + 5 + offset_x, p[1] * 10 + 5 + offset_y) for p in active_robot.current_path]
-            path_lines = [(x, y) for (x, y) in path_lines if y > UI_HEIGHT]  # Filter out UI area
-            if path_lines:
-                pygame.draw.lines(screen, PLANNED_PATH_COLOR, False, path_lines, 1)
-
-    # Draw all robots
-    for robot in robots:
-        # Calculate screen position for this robot
-        screen_x = robot.position[0] - active_robot.position[0] + robot_screen_x
-        screen_y = robot.position[1] - active_robot.position[1] + robot_screen_y
-        
-        if screen_y > UI_HEIGHT:  # Don't draw in UI area
+                    pygame.draw.circle(screen, PLANNED_PATH_COLOR, path_screen[i], 3)
+
+        # Draw all robots
+        robots_screen = viewport.to_screen_array([robot.position for robot in robots])
+        for i in np.flatnonzero(viewport.visible_mask(robots_screen, margin=(active_robot.radius + 10) * viewport.zoom)):
+            robot = robots[i]
+            screen_x, screen_y = robots_screen[i]
+
             # Choose color based on whether it's the active robot
             color = ACTIVE_ROBOT_COLOR if robot is active_robot else ROBOT_COLOR
-            
+
             # Draw the robot
-            pygame.draw.circle(screen, color, (screen_x, screen_y), robot.radius)
-            
+            pygame.draw.circle(screen, color, (screen_x, screen_y), max(2, int(robot.radius * viewport.zoom)))
+
             # Draw direction indicator
-            line_length = robot.radius + 10
+            line_length = (robot.radius + 10) * viewport.zoom
             direction_x = screen_x + line_length * math.cos(math.radians(robot.angle))
             direction_y = screen_y + line_length * math.sin(math.radians(robot.angle))
             pygame.draw.line(screen, (255, 255, 255), (screen_x, screen_y), (direction_x, direction_y), 2)
-            
+
             # Draw robot ID
             id_text = small_red_font.render(str(robot.id), True, (255, 255, 255))
             screen.blit(id_text, (screen_x - 5, screen_y - 10))
 
-    # Update the display
-    pygame.display.flip()
-
-    # Small delay to control the frame rate
-    pygame.time.delay(30)
-
+        screen.set_clip(None)
+
+        if show_profile:
+            profiler.draw_overlay(screen, profile_font, SCREEN_WIDTH - 330, UI_HEIGHT + 10, PROFILE_OVERLAY_REFRESH)
+    profiler.lap("drawing")
+
+    # Send the redrawn regions to the display
+    compositor.present()
+    profiler.lap("display")
+    profiler.end_frame()
+    if args.profile_export:
+        profiler.maybe_export(args.profile_export, PROFILE_EXPORT_INTERVAL)
+
+qr_scanner.stop()
+planner.stop()
+if map_checkpointer:
+    map_checkpointer.checkpoint()
+if telemetry_publisher:
+    telemetry_publisher.close()
+if args.profile_export:
+    profiler.export(args.profile_export)
 pygame.quit()
\ No newline at end of file
@@ -1,10 +1,35 @@
 import pygame
 import random
 
+# How obstacle positions are drawn
+OBSTACLE_DISTRIBUTIONS = ("uniform", "clustered")
+
 class World:
-    def __init__(self):
-        self.width = 1000  # Define the world width
-        self.height = 1000  # Define the world height
+    def __init__(self, width=1000, height=1000, seed=None, num_obstacles=None, density=None,
+                 obstacle_size=(30, 70), distribution="uniform", keep_clear=None, generate=True):
+        """
+        Args:
+            width, height: World size in pixels
+            seed: Seed for obstacle generation; the same seed and parameters
+                  always give the same world (None = different every run)
+            num_obstacles: Number of obstacles (default 100-105)
+            density: Fraction of the world to cover with obstacles; overrides
+                     num_obstacles
+            obstacle_size: (min, max) obstacle side length in pixels
+            distribution: "uniform" or "clustered" (obstacles grouped
+                          around a few random centres)
+            keep_clear: Optional list of (x, y, radius) circles that no
+                        obstacle may overlap, e.g. counters and spawn points
+            generate: Generate random obstacles (False for an empty world,
+                      e.g. when loading a scenario)
+        """
+        if distribution not in OBSTACLE_DISTRIBUTIONS:
+            raise ValueError(f"Unknown obstacle distribution: {distribution}")
+
+        self.width = width  # Define the world width
+        self.height = height  # Define the world height
+        self.seed = seed
+        self.rng = random.Random(seed)
 
         # World boundaries (obstacles)
         self.obstacles = [
@@ -14,19 +39,51 @@ class World:
             pygame.Rect(self.width - 10, 0, 10, self.height)  # Right boundary
         ]
 
-        # Generate 3-5 random obstacles
-        self.generate_random_obstacles()
+        if generate:
+            if density is not None:
+                # Enough average-sized obstacles to cover the requested fraction
+                mean_side = sum(obstacle_size) / 2
+                num_obstacles = round(density * (width - 40) * (height - 40) / mean_side ** 2)
+            elif num_obstacles is None:
+                num_obstacles = self.rng.randint(100, 105)
+            self.generate_random_obstacles(num_obstacles, obstacle_size, distribution, keep_clear or [])
+
+    def generate_random_obstacles(self, num_obstacles, obstacle_size=(30, 70), distribution="uniform", keep_clear=()):
+        min_size, max_size = obstacle_size
+
+        if distribution == "clustered":
+            # A cluster per ~15 obstacles, each spread over a tenth of the world
+            centers = [(self.rng.uniform(0, self.width), self.rng.uniform(0, self.height))
+                       for _ in range(max(1, num_obstacles // 15))]
+            spread = min(self.width, self.height) / 10
 
-    def generate_random_obstacles(self):
-        num_obstacles = random.randint(100, 105)  # Random number of obstacles between 3 and 5
         for _ in range(num_obstacles):
-            # Generate random position and size for each obstacle
-            obstacle_width = random.randint(30, 70)  # Random width between 30 and 70
-            obstacle_height = random.randint(30, 70)  # Random height between 30 and 70
+            # Retry placements that cover a keep-clear area, then give up on this obstacle
+            for _ in range(20):
+                # Generate random position and size for each obstacle
+                obstacle_width = self.rng.randint(min_size, max_size)
+                obstacle_height = self.rng.randint(min_size, max_size)
+
+                # Ensure obstacles are placed within the world bounds
+                max_x = self.width - obstacle_width - 20
+                max_y = self.height - obstacle_height - 20
+                if distribution == "clustered":
+                    center_x, center_y = self.rng.choice(centers)
+                    obstacle_x = int(min(max(self.rng.gauss(center_x, spread), 20), max_x))
+                    obstacle_y = int(min(max(self.rng.gauss(center_y, spread), 20), max_y))
+                else:
+                    obstacle_x = self.rng.randint(20, max_x)
+                    obstacle_y = self.rng.randint(20, max_y)
 
-            # Ensure obstacles are placed within the world bounds
-            obstacle_x = random.randint(20, self.width - obstacle_width - 20)
-            obstacle_y = random.randint(20, self.height - obstacle_height - 20)
+                obstacle = pygame.Rect(obstacle_x, obstacle_y, obstacle_width, obstacle_height)
+                if not any(self.overlaps_circle(obstacle, x, y, radius) for x, y, radius in keep_clear):
+                    # Create and add the obstacle to the list
+                    self.obstacles.append(obstacle)
+                    break
 
-            # Create and add the obstacle to the list
-            self.obstacles.append(pygame.Rect(obstacle_x, obstacle_y, obstacle_width, obstacle_height))
+    @staticmethod
+    def overlaps_circle(rect, x, y, radius):
+        """True if rect overlaps the circle of the given radius around (x, y)"""
+        nearest_x = min(max(x, rect.left), rect.right)
+        nearest_y = min(max(y, rect.top), rect.bottom)
+        return (nearest_x - x) ** 2 + (nearest_y - y) ** 2 < radius ** 2
@@ -0,0 +1,173 @@
+import os
+import struct
+import time
+import numpy as np
+
+from slam import GridBasedSLAM
+
+# On-disk map: a 64 byte header, then the occupancy grid (uint8) and the
+# obstacle detection counts (uint16), each width x height in row-major order
+MAP_MAGIC = b"TRGXMAP\0"
+MAP_VERSION = 1
+HEADER = struct.Struct("<8sHHIIddd")  # magic, version, tile size, width, height, origin x, origin y, resolution
+HEADER_SIZE = 64
+CELL_SIZE = 10  # World units per grid cell (GridBasedSLAM.world_to_grid)
+TILE_SIZE = 16  # Cells per side of a checkpoint tile
+MAX_COUNT = np.iinfo(np.uint16).max
+
+def array_offsets(width, height):
+    """File offsets of the occupancy grid and the detection counts"""
+    counts_offset = HEADER_SIZE + width * height
+    counts_offset += counts_offset % 2  # Keep the counts 2-byte aligned
+    return HEADER_SIZE, counts_offset
+
+def write_map(path, occupancy_grid, detection_count, origin=(0.0, 0.0), resolution=CELL_SIZE, tile_size=TILE_SIZE):
+    """
+    Write a complete map file
+
+    The file is written next to path and renamed over it, so a crash never
+    leaves a half-written map behind.
+    """
+    width, height = occupancy_grid.shape
+    grid_offset, counts_offset = array_offsets(width, height)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAP_MAGIC, MAP_VERSION, tile_size, width, height,
+                            origin[0], origin[1], resolution).ljust(HEADER_SIZE, b"\0"))
+        f.seek(grid_offset)
+        f.write(np.ascontiguousarray(occupancy_grid, dtype=np.uint8).tobytes())
+        f.seek(counts_offset)
+        f.write(np.ascontiguousarray(np.minimum(detection_count, MAX_COUNT), dtype=np.uint16).tobytes())
+    os.replace(temp_path, path)
+
+def read_header(path):
+    """Header of a map file as a dict"""
+    with open(path, "rb") as f:
+        data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a map file")
+
+    magic, version, tile_size, width, height, origin_x, origin_y, resolution = HEADER.unpack(data)
+    if magic != MAP_MAGIC:
+        raise ValueError(f"{path} is not a map file")
+    if version != MAP_VERSION:
+        raise ValueError(f"Unsupported map version {version}")
+    return {
+        "version": version,
+        "tile_size": tile_size,
+        "width": width,
+        "height": height,
+        "origin": (origin_x, origin_y),
+        "resolution": resolution,
+    }
+
+def read_map(path, mode="c"):
+    """
+    Memory-map the arrays of a map file
+
+    Nothing is read up front; pages are loaded as cells are touched, so even
+    very large maps open instantly.
+
+    Args:
+        mode: np.memmap mode. The default "c" (copy-on-write) gives arrays
+              that can be updated without changing the file.
+
+    Returns:
+        (occupancy_grid, detection_count, header)
+    """
+    header = read_header(path)
+    shape = (header["width"], header["height"])
+    grid_offset, counts_offset = array_offsets(*shape)
+    occupancy_grid = np.memmap(path, dtype=np.uint8, mode=mode, offset=grid_offset, shape=shape)
+    detection_count = np.memmap(path, dtype=np.uint16, mode=mode, offset=counts_offset, shape=shape)
+    return occupancy_grid, detection_count, header
+
+def load_slam(path):
+    """A GridBasedSLAM continuing from the map saved at path"""
+    occupancy_grid, detection_count, header = read_map(path)
+    if header["resolution"] != CELL_SIZE or header["origin"] != (0.0, 0.0):
+        raise ValueError(f"{path} has a {header['resolution']} unit grid at {header['origin']}; "
+                         f"expected {CELL_SIZE} units at the origin")
+
+    # The file stores counts as uint16, which the SLAM's increments would
+    # wrap around; it counts in its usual wide integers
+    return GridBasedSLAM(header["width"], header["height"], occupancy_grid, np.array(detection_count, dtype=int))
+
+class MapCheckpointer:
+    def __init__(self, path, slam, tile_size=TILE_SIZE):
+        """
+        Keeps a map file in step with a GridBasedSLAM
+
+        The checkpointer listens to slam's cell and detection count changes
+        and remembers which tiles they fall in, so a checkpoint writes just
+        those tiles without comparing the map against anything. The whole
+        file is written when it doesn't exist yet or the grid has grown.
+
+        Create it before slam is updated, with slam either loaded from path
+        (load_slam) or new when path doesn't exist; earlier changes aren't
+        seen.
+
+        Args:
+            path: Map file to keep up to date
+            slam: The GridBasedSLAM to save
+            tile_size: Cells per side of the tiles written by checkpoints
+        """
+        self.path = path
+        self.slam = slam
+        self.tile_size = tile_size
+        self.last_checkpoint = time.perf_counter()
+        self.dirty_tiles = set()
+        if os.path.exists(path):
+            header = read_header(path)
+            self.saved_shape = (header["width"], header["height"])
+        else:
+            self.saved_shape = None  # First checkpoint writes the whole map
+
+        slam.add_change_listener(self.mark_dirty)
+        slam.add_detection_listener(self.mark_dirty)
+
+    def mark_dirty(self, cells):
+        """Record the tiles containing cells as needing to be written"""
+        tile_size = self.tile_size
+        self.dirty_tiles.update((x // tile_size, y // tile_size) for x, y in cells)
+
+    def save(self):
+        """Write the whole map"""
+        write_map(self.path, self.slam.occupancy_grid, self.slam.obstacle_detection_count, tile_size=self.tile_size)
+        self.saved_shape = self.slam.occupancy_grid.shape
+        self.dirty_tiles = set()
+
+    def checkpoint(self):
+        """
+        Write the tiles that changed since the last checkpoint
+
+        Returns:
+            Number of tiles written (-1 when the whole map was written)
+        """
+        grid = self.slam.occupancy_grid
+        if self.saved_shape != grid.shape:
+            self.save()
+            return -1
+        if not self.dirty_tiles:
+            return 0
+
+        tiles, self.dirty_tiles = self.dirty_tiles, set()
+        counts = self.slam.obstacle_detection_count
+        file_grid, file_counts, _ = read_map(self.path, mode="r+")
+        for tile_x, tile_y in tiles:
+            x0, y0 = tile_x * self.tile_size, tile_y * self.tile_size
+            tile = np.s_[x0:x0 + self.tile_size, y0:y0 + self.tile_size]
+            file_grid[tile] = grid[tile]
+            file_counts[tile] = np.minimum(counts[tile], MAX_COUNT)
+        file_grid.flush()
+        file_counts.flush()
+        return len(tiles)
+
+    def maybe_checkpoint(self, interval):
+        """Checkpoint if interval seconds have passed since the last checkpoint"""
+        now = time.perf_counter()
+        if now - self.last_checkpoint >= interval:
+            self.last_checkpoint = now
+            return self.checkpoint()
+        return 0
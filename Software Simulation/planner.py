@@ -0,0 +1,252 @@
+import threading
+from collections import deque, namedtuple
+import numpy as np
+
+from a_star import AStar
+from costmap import CELL_COSTS, obstacle_distance
+from path_smoothing import smooth_path
+
+# Outcome of a planning request; path is None when no path was found. stats is
+# the search's SearchStats and expanded its expanded cells (None unless the
+# planner records them).
+PlanResult = namedtuple("PlanResult", ["request_id", "start", "goal", "path", "stats", "expanded"])
+
+# Search used by PlannerService for each mode
+PLANNER_MODES = ("astar", "anytime", "bidirectional", "theta")
+
+# Post-processing applied to found paths
+SMOOTHING_MODES = (None, "compress", "spline")
+
+def plan_coarse_to_fine(grid, coarse_grid, factor, start, goal, costs=None, corridor=1, **search_args):
+    """
+    Plan on a coarse map first, then refine within a corridor around that route
+
+    The coarse search (e.g. on GridBasedSLAM.get_map(4)) covers factor^2
+    fewer cells; the full-resolution search is then limited to the fine
+    cells under the coarse route, widened by corridor coarse cells. Max
+    pooling can close narrow gaps at the coarse level, so when either stage
+    fails the full map is searched as usual.
+
+    Args:
+        grid: Full-resolution occupancy grid
+        coarse_grid: grid max-pooled by factor
+        factor: Cells of grid per coarse cell along each axis
+        start, goal: (x, y) cells in grid
+        costs: Optional per-cell cost array for grid (e.g. CostMap.costs)
+        corridor: Coarse cells either side of the coarse route the fine
+                  search may use
+        search_args: Passed on to AStar.find_path
+
+    Returns:
+        List of (x, y) cells from start to goal, or None
+    """
+    costs = costs if costs is not None else CELL_COSTS[grid]
+    coarse_path = AStar(coarse_grid).find_path((start[0] // factor, start[1] // factor),
+                                               (goal[0] // factor, goal[1] // factor), **search_args)
+    if coarse_path:
+        on_route = np.zeros(coarse_grid.shape, dtype=bool)
+        on_route[tuple(np.array(coarse_path).T)] = True
+        allowed = obstacle_distance(on_route, corridor + 1) <= corridor
+        allowed = np.repeat(np.repeat(allowed, factor, axis=0), factor, axis=1)[:grid.shape[0], :grid.shape[1]]
+
+        path = AStar(grid, np.where(allowed, costs, np.inf)).find_path(start, goal, **search_args)
+        if path:
+            return path
+    return AStar(grid, costs).find_path(start, goal, **search_args)
+
+class PlannerMetrics:
+    def __init__(self, window=100):
+        """
+        Search statistics aggregated over a planner's completed requests
+
+        Args:
+            window: Number of recent SearchStats kept for inspection
+        """
+        self.lock = threading.Lock()
+        self.searches = 0
+        self.reached = 0  # Searches whose path ends at the goal
+        self.total_expanded = 0
+        self.total_pushes = 0
+        self.total_time_ms = 0.0
+        self.total_cost = 0.0  # Over reached searches
+        self.max_open = 0
+        self.max_time_ms = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, stats):
+        with self.lock:
+            self.searches += 1
+            self.total_expanded += stats.expanded
+            self.total_pushes += stats.pushes
+            self.total_time_ms += stats.time_ms
+            self.max_open = max(self.max_open, stats.max_open)
+            self.max_time_ms = max(self.max_time_ms, stats.time_ms)
+            if stats.reachable:
+                self.reached += 1
+                self.total_cost += stats.cost
+            self.recent.append(stats)
+
+    def summary(self):
+        """Return the aggregated statistics as a dict (times in milliseconds)"""
+        with self.lock:
+            searches = max(self.searches, 1)
+            return {
+                "searches": self.searches,
+                "reached": self.reached,
+                "mean_expanded": self.total_expanded / searches,
+                "mean_pushes": self.total_pushes / searches,
+                "max_open": self.max_open,
+                "mean_time_ms": self.total_time_ms / searches,
+                "max_time_ms": self.max_time_ms,
+                "mean_cost": self.total_cost / self.reached if self.reached else None,
+                "last": self.recent[-1]._asdict() if self.recent else None,
+            }
+
+class PlannerService:
+    def __init__(self, time_budget=None, mode="astar", smoothing=None, record_expanded=False):
+        """
+        Runs A* on a background thread so planning never blocks the caller
+
+        Only the newest request matters: submitting a request cancels any
+        search that is still running for an older one, and results of
+        superseded requests are discarded.
+
+        Args:
+            time_budget: Optional per-request search time in seconds. In
+                         "astar", "anytime" and "theta" modes a partial path
+                         toward the goal is returned if no complete path was
+                         found in time.
+            mode: "astar", "anytime" (ARA*, best path within the budget),
+                  "bidirectional" or "theta" (Lazy Theta*, any-angle
+                  waypoints)
+            smoothing: None to return every cell of the path, "compress" to
+                       reduce it to the waypoints where it turns, or "spline"
+                       to also round those turns
+            record_expanded: Report the cells each search expanded in
+                             PlanResult.expanded (can be changed at any time)
+        """
+        if mode not in PLANNER_MODES:
+            raise ValueError(f"Unknown planner mode: {mode}")
+        if smoothing not in SMOOTHING_MODES:
+            raise ValueError(f"Unknown smoothing mode: {smoothing}")
+
+        self.time_budget = time_budget
+        self.mode = mode
+        self.smoothing = smoothing
+        self.record_expanded = record_expanded
+        self.metrics = PlannerMetrics()  # Statistics of searches that weren't superseded
+        self.condition = threading.Condition()
+        self.pending = None  # (request_id, start, goal, grid, costs) waiting to be planned
+        self.latest_request = 0  # Id of the newest request; older searches stop
+        self.result = None  # Newest finished PlanResult not yet collected
+        self.busy = False
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def request(self, start, goal, grid, costs=None):
+        """
+        Ask for a path from start to goal on grid
+
+        The grid (and costs, if given) are copied into read-only snapshots, so
+        the caller can keep updating its map while the search runs.
+
+        Args:
+            costs: Optional per-cell cost array such as CostMap.costs
+
+        Returns:
+            The request id, which is reported back in the PlanResult
+        """
+        snapshot = np.array(grid, copy=True)
+        snapshot.setflags(write=False)
+        if costs is not None:
+            costs = np.array(costs, copy=True)
+            costs.setflags(write=False)
+
+        with self.condition:
+            self.latest_request += 1
+            self.pending = (self.latest_request, tuple(start), tuple(goal), snapshot, costs)
+            self.condition.notify()
+            return self.latest_request
+
+    def is_busy(self):
+        """True while a request is queued or being planned"""
+        with self.condition:
+            return self.busy or self.pending is not None
+
+    def get_result(self):
+        """Return the newest finished PlanResult (once), or None if there isn't one"""
+        with self.condition:
+            result, self.result = self.result, None
+            return result
+
+    def get_metrics(self):
+        """Search statistics aggregated over completed requests (see PlannerMetrics.summary)"""
+        return self.metrics.summary()
+
+    def cancel(self):
+        """Drop any queued or running request"""
+        with self.condition:
+            self.latest_request += 1
+            self.pending = None
+            self.result = None
+
+    def stop(self):
+        """Stop the worker thread"""
+        with self.condition:
+            self.running = False
+            self.latest_request += 1
+            self.condition.notify()
+        self.thread.join(1.0)
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                while self.running and self.pending is None:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                request_id, start, goal, grid, costs = self.pending
+                self.pending = None
+                self.busy = True
+
+            # The search polls this so a newer request cancels it promptly
+            superseded = lambda: self.latest_request != request_id
+            pathfinder = path = None
+            try:
+                pathfinder, path = self._search(start, goal, grid, costs, superseded)
+            except Exception as e:
+                # A failed search only drops its request; the worker keeps serving new ones
+                print(f"Planning from {start} to {goal} failed: {e}")
+            finally:
+                with self.condition:
+                    self.busy = False
+                    if pathfinder is not None and not superseded():
+                        self.metrics.add(pathfinder.last_stats)
+                        self.result = PlanResult(request_id, start, goal, path, pathfinder.last_stats,
+                                                 pathfinder.expanded_cells)
+
+    def _search(self, start, goal, grid, costs, superseded):
+        """Run one search with the service's mode and smoothing; returns (pathfinder, path)"""
+        pathfinder = AStar(grid, costs)
+        pathfinder.record_expanded = self.record_expanded
+        if self.mode == "anytime":
+            path = pathfinder.find_path_anytime(start, goal, time_budget=self.time_budget,
+                                                should_stop=superseded)
+        elif self.mode == "bidirectional":
+            path = pathfinder.find_path_bidirectional(start, goal, should_stop=superseded,
+                                                      time_budget=self.time_budget)
+        elif self.mode == "theta":
+            path = pathfinder.find_path_theta(start, goal, should_stop=superseded,
+                                              time_budget=self.time_budget,
+                                              partial=self.time_budget is not None)
+        else:
+            path = pathfinder.find_path(start, goal, should_stop=superseded,
+                                        time_budget=self.time_budget,
+                                        partial=self.time_budget is not None)
+
+        if path and self.smoothing and not superseded():
+            path = smooth_path(path, costs if costs is not None else CELL_COSTS[grid],
+                               spline=self.smoothing == "spline",
+                               compress=self.mode != "theta")  # Theta* paths are already waypoints
+        return pathfinder, path
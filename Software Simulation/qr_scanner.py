@@ -0,0 +1,303 @@
+import cv2
+from pyzbar.pyzbar import decode
+import numpy as np
+import time
+import threading
+import queue
+
+class QRDecoder:
+    def __init__(self, scale=0.5, roi_margin=0.5, change_threshold=3.0,
+                 max_roi_misses=3, full_scan_interval=15):
+        """
+        Decode pipeline that avoids running pyzbar on every full-resolution frame
+
+        1. Frames that barely differ from the last decoded one are skipped.
+        2. While a code is tracked, only its bounding box (plus a margin) is
+           decoded, at full resolution.
+        3. Otherwise the code is searched for on a grayscale, downscaled frame.
+        4. Every full_scan_interval untracked frames (skipped ones included),
+           the full-resolution frame is tried in case the code is too small
+           for the downscaled pass.
+
+        Args:
+            scale: Downscale factor for the search pass
+            roi_margin: Margin added around the tracked box, as a fraction of its size
+            change_threshold: Mean absolute thumbnail difference (0-255) below
+                              which a frame counts as unchanged
+            max_roi_misses: Failed ROI decodes before the track is dropped
+            full_scan_interval: Untracked frames (changed or not) between
+                                full-resolution attempts
+        """
+        self.scale = scale
+        self.roi_margin = roi_margin
+        self.change_threshold = change_threshold
+        self.max_roi_misses = max_roi_misses
+        self.full_scan_interval = full_scan_interval
+
+        self.roi = None  # Tracked (x, y, w, h) box in full-resolution pixels
+        self.roi_misses = 0
+        self.last_thumbnail = None
+        self.last_result = None
+        self.untracked_frames = 0
+
+        # How each frame was handled, for benchmarking
+        self.stats = {"frames": 0, "skipped": 0, "roi": 0, "downscaled": 0, "full": 0}
+
+    def reset(self):
+        """Forget the tracked code and the last decoded frame"""
+        self.roi = None
+        self.roi_misses = 0
+        self.last_thumbnail = None
+        self.last_result = None
+        self.untracked_frames = 0
+
+    def decode(self, frame):
+        """Return the data of the QR code in frame, or None"""
+        self.stats["frames"] += 1
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        # Skip decoding when the frame hasn't changed meaningfully
+        thumbnail = cv2.resize(gray, (64, 48), interpolation=cv2.INTER_AREA).astype(np.int16)
+        if self.last_thumbnail is not None:
+            if np.mean(np.abs(thumbnail - self.last_thumbnail)) < self.change_threshold:
+                # Unchanged frames still count toward the periodic full-resolution
+                # attempt, so a code the downscaled pass misses on a static
+                # scene is eventually found
+                full_scan_due = self.roi is None and (self.untracked_frames + 1) % self.full_scan_interval == 0
+                if not full_scan_due:
+                    self.stats["skipped"] += 1
+                    if self.roi is None:
+                        self.untracked_frames += 1
+                    return self.last_result
+        self.last_thumbnail = thumbnail
+
+        self.last_result = self._decode_tracked(gray)
+        return self.last_result
+
+    def _decode_tracked(self, gray):
+        # Decode only the tracked region at full resolution
+        if self.roi is not None:
+            self.stats["roi"] += 1
+            x, y, w, h = self.roi
+            margin_x, margin_y = int(w * self.roi_margin), int(h * self.roi_margin)
+            x0, y0 = max(0, x - margin_x), max(0, y - margin_y)
+            x1 = min(gray.shape[1], x + w + margin_x)
+            y1 = min(gray.shape[0], y + h + margin_y)
+
+            qr_codes = decode(gray[y0:y1, x0:x1])
+            if qr_codes:
+                self.roi_misses = 0
+                self._track(qr_codes[0].rect, x0, y0, 1.0)
+                return qr_codes[0].data.decode('utf-8')
+
+            self.roi_misses += 1
+            if self.roi_misses < self.max_roi_misses:
+                return None
+            # Lost the code; fall back to searching the whole frame
+            self.roi = None
+
+        self.untracked_frames += 1
+        if self.untracked_frames % self.full_scan_interval == 0:
+            self.stats["full"] += 1
+            qr_codes = decode(gray)
+            scale = 1.0
+        else:
+            self.stats["downscaled"] += 1
+            small = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+            qr_codes = decode(small)
+            scale = self.scale
+
+        if qr_codes:
+            self.untracked_frames = 0
+            self.roi_misses = 0
+            self._track(qr_codes[0].rect, 0, 0, scale)
+            return qr_codes[0].data.decode('utf-8')
+
+        return None
+
+    def _track(self, rect, offset_x, offset_y, scale):
+        """Store a pyzbar rect as the tracked box in full-resolution pixels"""
+        self.roi = (int(rect.left / scale) + offset_x, int(rect.top / scale) + offset_y,
+                    max(1, int(rect.width / scale)), max(1, int(rect.height / scale)))
+
+class QRScanner:
+    def __init__(self, camera_id=0, capture=None, recorder=None):
+        """
+        Args:
+            camera_id: OpenCV camera index
+            capture: Optional VideoCapture-like object to use instead of the
+                     camera (e.g. a replay capture)
+            recorder: Optional LogRecorder that logs every captured frame
+        """
+        self.camera_id = camera_id
+        self.capture = capture
+        self.recorder = recorder
+        self.cap = None
+        self.last_scan = None
+        self.last_scan_time = 0
+        self.decoder = QRDecoder()
+
+        # Background capture/decode state
+        self.running = False
+        self.capture_thread = None
+        self.decoder_thread = None
+        self.frame_condition = threading.Condition()  # Guards latest_frame and frame_id
+        self.latest_frame = None  # Only the most recent frame is kept
+        self.frame_id = 0  # Incremented for every captured frame
+        self.results = queue.Queue()  # Decoded QR data from the decoder worker
+        self.last_reported = None  # Last data put on results, so a code held in view is reported once
+        self.callback = None
+
+    def start(self):
+        """Start the camera"""
+        self.cap = self.capture if self.capture is not None else cv2.VideoCapture(self.camera_id)
+        if not self.cap.isOpened():
+            raise ValueError("Could not open camera")
+
+    def _read(self):
+        """Read a frame from the camera, logging it when recording"""
+        ret, frame = self.cap.read()
+        if ret and self.recorder:
+            self.recorder.record_frame(frame)
+        return ret, frame
+
+    def scan(self):
+        """Scan for QR codes and return decoded data"""
+        # When the background worker is running, never touch the camera here
+        if self.running:
+            return self.get_result()
+
+        if not self.cap or not self.cap.isOpened():
+            self.start()
+
+        ret, frame = self._read()
+        if not ret:
+            return None
+
+        return self._decode_frame(frame)
+
+    def _decode_frame(self, frame):
+        """Decode a frame and return the first QR code data, if any"""
+        qr_data = self.decoder.decode(frame)
+
+        # Remember the first QR code data if found
+        if qr_data:
+            self.last_scan = qr_data
+            self.last_scan_time = time.time()
+            return qr_data
+
+        return None
+
+    def start_async(self, callback=None):
+        """
+        Start capturing and decoding on background threads
+
+        Args:
+            callback: Optional function called with the decoded data from the
+                      decoder thread. Results are also put on self.results.
+        """
+        if self.running:
+            return
+
+        if not self.cap or not self.cap.isOpened():
+            self.start()
+
+        self.callback = callback
+        self.decoder.reset()
+        self._clear_results()  # Never hand a new scan the previous scan's codes
+        self.running = True
+        self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.decoder_thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self.capture_thread.start()
+        self.decoder_thread.start()
+
+    def _capture_loop(self):
+        """Read frames as fast as the camera delivers them, keeping only the newest"""
+        while self.running:
+            ret, frame = self._read()
+            if not ret:
+                time.sleep(0.01)  # Camera hiccup; try again shortly
+                continue
+
+            with self.frame_condition:
+                self.latest_frame = frame  # Stale frames are simply dropped
+                self.frame_id += 1
+                self.frame_condition.notify()
+
+    def _decode_loop(self):
+        """Decode the newest frame whenever one arrives"""
+        last_decoded_id = 0
+        while self.running:
+            with self.frame_condition:
+                # Wait for a frame we haven't decoded yet
+                while self.running and self.frame_id == last_decoded_id:
+                    self.frame_condition.wait(0.1)
+                if not self.running:
+                    break
+                frame = self.latest_frame
+                last_decoded_id = self.frame_id
+
+            qr_data = self._decode_frame(frame)
+            if qr_data and qr_data != self.last_reported:
+                self.last_reported = qr_data
+                self.results.put(qr_data)
+                if self.callback:
+                    self.callback(qr_data)
+
+    def _clear_results(self):
+        """Drop undelivered results and forget the last reported code"""
+        while True:
+            try:
+                self.results.get_nowait()
+            except queue.Empty:
+                break
+        self.last_reported = None
+
+    def get_result(self):
+        """Return the next decoded QR code from the background worker without blocking"""
+        try:
+            return self.results.get_nowait()
+        except queue.Empty:
+            return None
+
+    def get_latest_frame(self):
+        """Return the most recent frame captured by the background worker"""
+        with self.frame_condition:
+            return self.latest_frame
+
+    def get_frame(self):
+        """Get current camera frame"""
+        if self.running:
+            return self.get_latest_frame()
+
+        if not self.cap or not self.cap.isOpened():
+            self.start()
+
+        ret, frame = self._read()
+        if not ret:
+            return None
+
+        return frame
+
+    def stop_async(self):
+        """Stop the background capture and decoder threads"""
+        if not self.running:
+            return
+
+        self.running = False
+        with self.frame_condition:
+            self.frame_condition.notify_all()
+        for thread in (self.capture_thread, self.decoder_thread):
+            if thread and thread.is_alive() and thread is not threading.current_thread():
+                thread.join(1.0)
+        self.capture_thread = None
+        self.decoder_thread = None
+        self.latest_frame = None
+        self._clear_results()
+
+    def stop(self):
+        """Stop the camera"""
+        self.stop_async()
+        if self.cap and self.cap.isOpened():
+            self.cap.release()
+            self.cap = None
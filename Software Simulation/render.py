@@ -0,0 +1,50 @@
+import math
+import pygame
+
+# SLAM map colors
+CLEAR_SPACE_COLOR = (128, 128, 128)  # Grey for clear space
+OBSTACLE_FIRST_DETECTED_COLOR = (255, 255, 0)  # Yellow for first detection of obstacle
+OBSTACLE_CONFIRMED_COLOR = (0, 255, 0)  # Green for confirmed obstacles
+
+def draw_slam_map(surface, slam_map, offset_x, offset_y, top=None, cell_size=10, clip=None):
+    """
+    Draw the SLAM map (only what the robot has detected)
+
+    Args:
+        surface: Surface to draw on (the screen, or an off-screen surface)
+        slam_map: Occupancy grid (0 = Unknown, 1 = Free, 2 = Tentative, 3 = Confirmed)
+        offset_x, offset_y: Screen position of grid cell (0, 0)
+        top: Cells at or above this screen y are not drawn (e.g. the UI section);
+             None draws every row in the clip area
+        cell_size: Cell size in pixels (may be fractional when zoomed)
+        clip: Screen rectangle to draw in (default: the surface's clip area);
+              cells outside it are skipped without being looked at
+    """
+    clip = pygame.Rect(clip) if clip is not None else surface.get_clip()
+    size = math.ceil(cell_size)
+
+    # Only visit the cells that can land inside the clip area
+    x_start = max(0, math.floor((clip.left - offset_x) / cell_size))
+    x_end = min(slam_map.shape[0], math.floor((clip.right - offset_x) / cell_size) + 1)
+    y_start = max(0, math.floor(((clip.top if top is None else max(clip.top, top)) - offset_y) / cell_size))
+    y_end = min(slam_map.shape[1], math.floor((clip.bottom - offset_y) / cell_size) + 1)
+
+    # Screen positions of the visible columns and rows, and their cell values
+    # as nested lists (much faster to index than NumPy scalars)
+    xs = [int(x * cell_size + offset_x) for x in range(x_start, x_end)]
+    ys = [int(y * cell_size + offset_y) for y in range(y_start, y_end)]
+    if top is not None:
+        # Ensure map is drawn below the UI section
+        skipped = sum(1 for rect_y in ys if rect_y <= top)
+        ys = ys[skipped:]
+        y_start += skipped
+    rows = slam_map[x_start:x_end, y_start:y_end].tolist()
+
+    for rect_x, row in zip(xs, rows):
+        for rect_y, value in zip(ys, row):
+            if value == 1:  # Clear space (grey)
+                pygame.draw.rect(surface, CLEAR_SPACE_COLOR, pygame.Rect(rect_x, rect_y, size, size), 1)
+            elif value == 2:  # First detected obstacle (yellow)
+                pygame.draw.rect(surface, OBSTACLE_FIRST_DETECTED_COLOR, pygame.Rect(rect_x, rect_y, size, size))
+            elif value == 3:  # Confirmed obstacle (green)
+                pygame.draw.rect(surface, OBSTACLE_CONFIRMED_COLOR, pygame.Rect(rect_x, rect_y, size, size))
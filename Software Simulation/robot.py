@@ -1,23 +1,32 @@
 import math
 
+from path_smoothing import line_cells
+
 
 class Robot:
     def __init__(self, position, angle, id=0, stationary=False, location=None):
         self.position = position
         self.angle = angle
         self.sensor_angle = 0  # New: Sensor starts at 0°
-        self.sensor_rotation_speed = 1  # New: Degrees per frame (adjust for speed)
-        self.speed = 2  
-        self.rotation_speed = 2
+        self.sensor_rotation_speed = 30  # Sensor sweep rate (degrees/s)
+        self.max_speed = 60  # Forward speed limit (px/s)
+        self.max_turn_rate = 60  # Turn rate limit (degrees/s)
+        self.heading_gain = 3.0  # Turn rate per degree of heading error (1/s)
+        self.turn_in_place_angle = 45  # Heading error (degrees) above which the robot turns without driving
+        self.control_step = 1 / 60  # Fixed integration step (s)
+        self.time_accumulator = 0.0  # Simulated time not yet integrated
         self.radius = 20  
         
         self.current_path = None
         self.current_target = None
         self.path_index = 0
+        self.path_cells = set()  # Grid cells the current path runs through
+        self.path_start = None  # World position the current path was started from
+        self.path_corridor = 30  # Max distance (px) from the current path segment before replanning
         self.target_reached_threshold = 15  
-        self.stuck_counter = 0  
-        self.stuck_threshold = 20  
-        self.last_position = position.copy()  
+        self.stuck_time = 0.0  # Seconds without getting closer to the current target
+        self.stuck_timeout = 5  # Seconds without progress before requesting a new path
+        self.closest_distance = float('inf')  # Closest approach (px) to the current target
         
         self.destination = None
         self.has_reached_destination = False
@@ -26,8 +35,8 @@ class Robot:
         self.id = id  # Unique identifier for each robot
         self.stationary = stationary  # Whether the robot should stay in place
         self.location = location  # Current location name (e.g., "source", "counter1-A")
-        self.wait_timer = 0  # Timer for waiting at counters
-        self.wait_duration = 5 * 30  # 5 seconds at 30 frames per second
+        self.wait_timer = 0  # Seconds spent waiting at the current counter
+        self.wait_duration = 5  # Seconds to wait at a counter
         self.is_waiting = False
         self.returning_to_source = False
         self.next_destination = None  # Store next destination for multi-point navigation
@@ -35,8 +44,12 @@ class Robot:
         # New workflow state for the robot
         self.workflow_state = "idle"  # Initial state is idle
 
-    def simulate_ultrasonic(self, obstacles):
-        """Simulates an ultrasonic sensor scanning at multiple angles while moving."""
+    def simulate_ultrasonic(self, obstacles, dt=0.0):
+        """
+        Simulates an ultrasonic sensor scanning at multiple angles while moving.
+
+        The sensor then rotates by however far it sweeps in dt seconds.
+        """
         max_distance = 200  
         step_size = 5  
         
@@ -57,7 +70,7 @@ class Robot:
                     sensor_readings[actual_angle] = max_distance  # No obstacle
 
         # Rotate sensor continuously
-        self.sensor_angle = (self.sensor_angle + self.sensor_rotation_speed) % 360
+        self.sensor_angle = (self.sensor_angle + self.sensor_rotation_speed * dt) % 360
 
         return sensor_readings  # Return all scanned angles
 
@@ -73,8 +86,59 @@ class Robot:
         self.next_destination = [x, y]
         print(f"Robot {self.id}: Next destination set to ({x}, {y})")
 
-    def update_navigation(self, slam_map):
-        """Update robot movement for A to B navigation"""
+    def set_path(self, path):
+        """Follow a new path of grid waypoints, remembering the cells it runs through"""
+        self.current_path = path
+        self.path_index = 0
+        self.closest_distance = float('inf')
+        self.stuck_time = 0.0
+        self.path_start = self.position.copy()
+        self.path_cells = set()
+        if path:
+            self.path_cells.add(tuple(path[0]))
+            for a, b in zip(path, path[1:]):
+                self.path_cells.update((int(x), int(y)) for x, y in line_cells(a, b))
+
+    def path_blocked(self, changed_cells, slam_map, blocking=2):
+        """
+        True if any changed cell on the current path is now an obstacle
+
+        Args:
+            blocking: Lowest occupancy value counted as an obstacle
+                      (2 = tentative, 3 = confirmed only)
+        """
+        if not self.current_path:
+            return False
+        return any(slam_map[x, y] >= blocking for x, y in self.path_cells.intersection(changed_cells))
+
+    def distance_from_path(self):
+        """Distance (px) from the segment currently being driven, or 0 without a path"""
+        if not self.current_path or self.path_index >= len(self.current_path):
+            return 0
+
+        # Segment from the previous waypoint (or where the path was started) to the target
+        if self.path_index > 0:
+            previous = self.current_path[self.path_index - 1]
+            start_x, start_y = previous[0] * 10 + 5, previous[1] * 10 + 5
+        else:
+            start_x, start_y = self.path_start
+        target = self.current_path[self.path_index]
+        end_x, end_y = target[0] * 10 + 5, target[1] * 10 + 5
+
+        seg_x, seg_y = end_x - start_x, end_y - start_y
+        length_sq = seg_x**2 + seg_y**2
+        t = 0 if length_sq == 0 else ((self.position[0] - start_x) * seg_x + (self.position[1] - start_y) * seg_y) / length_sq
+        t = max(0, min(1, t))
+        return math.dist(self.position, (start_x + t * seg_x, start_y + t * seg_y))
+
+    def update_navigation(self, slam_map, dt):
+        """
+        Update robot movement for A to B navigation over dt seconds
+
+        Motion is integrated in fixed control_step substeps, so a trajectory
+        depends only on the simulated time elapsed, not on how it was split
+        into frames: one large dt gives the same result as many small ones.
+        """
         # If robot is stationary, don't move
         if self.stationary:
             return
@@ -83,64 +147,80 @@ class Robot:
         if self.is_waiting:
             # We handle the wait timer in main.py now with the workflow state machine
             return
-                
-        # Check if we're stuck by comparing current position to last position
-        position_diff = math.sqrt((self.position[0] - self.last_position[0])**2 + 
-                                 (self.position[1] - self.last_position[1])**2)
-        if position_diff < 0.5:  # If we've barely moved
-            self.stuck_counter += 1
-        else:
-            self.stuck_counter = 0
-            
-        # Save current position for next comparison
-        self.last_position = self.position.copy()
-        
-        # If we're stuck for too long, request a new path
-        if self.stuck_counter > self.stuck_threshold:
-            self.current_path = None
-            self.stuck_counter = 0
-            
+
+        self.time_accumulator += dt
+        while self.time_accumulator >= self.control_step - 1e-9:
+            self.time_accumulator -= self.control_step
+            self.control_update(self.control_step)
+
+    def control_update(self, step):
+        """Advance the path-following controller by one fixed step of step seconds"""
         # If we have a current target point from the path
-        if self.current_path and self.path_index < len(self.current_path):
-            # Convert grid coordinates to world coordinates (center of grid cell)
-            target_x = self.current_path[self.path_index][0] * 10 + 5
-            target_y = self.current_path[self.path_index][1] * 10 + 5
-            
-            # Calculate angle to target
-            dx = target_x - self.position[0]
-            dy = target_y - self.position[1]
-            target_angle = math.degrees(math.atan2(dy, dx)) % 360
+        if not self.current_path or self.path_index >= len(self.current_path):
+            self.stuck_time = 0.0
+            return
+
+        # Convert grid coordinates to world coordinates (center of grid cell)
+        target_x = self.current_path[self.path_index][0] * 10 + 5
+        target_y = self.current_path[self.path_index][1] * 10 + 5
+        
+        # Calculate angle to target
+        dx = target_x - self.position[0]
+        dy = target_y - self.position[1]
+        target_angle = math.degrees(math.atan2(dy, dx)) % 360
+        
+        # Calculate distance to target
+        distance = math.sqrt(dx**2 + dy**2)
+        
+        # If we've reached the current target, move to the next one
+        if distance < self.target_reached_threshold:
+            self.path_index += 1
+            self.closest_distance = float('inf')
+            self.stuck_time = 0.0
             
-            # Calculate distance to target
-            distance = math.sqrt(dx**2 + dy**2)
+            # Check if we've reached the end of the path (destination)
+            if self.path_index >= len(self.current_path) and self.destination:
+                # Calculate distance to actual destination (not just the last grid point)
+                dest_distance = math.sqrt((self.destination[0] - self.position[0])**2 + 
+                                       (self.destination[1] - self.position[1])**2)
+
+                # A budget-limited plan may end short of the destination; plan again from here
+                if dest_distance > 2 * self.target_reached_threshold:
+                    self.current_path = None
+                    return
+              
+                self.has_reached_destination = True
+                print(f"Robot {self.id}: Destination reached!")
+            return
             
-            # If we've reached the current target, move to the next one
-            if distance < self.target_reached_threshold:
-                self.path_index += 1
-                
-                # Check if we've reached the end of the path (destination)
-                if self.path_index >= len(self.current_path) and self.destination:
-                    # Calculate distance to actual destination (not just the last grid point)
-                    dest_distance = math.sqrt((self.destination[0] - self.position[0])**2 + 
-                                           (self.destination[1] - self.position[1])**2)
-                  
-                    self.has_reached_destination = True
-                    print(f"Robot {self.id}: Destination reached!")
-                return
-                
-            # Rotate towards the target
-            angle_diff = (target_angle - self.angle) % 360
-            if angle_diff > 180:
-                angle_diff -= 360
-                
-            # Apply rotation
-            if abs(angle_diff) > 5:  # Only rotate if the angle difference is significant
-                if angle_diff > 0:
-                    self.angle += min(self.rotation_speed, angle_diff)
-                else:
-                    self.angle -= min(self.rotation_speed, abs(angle_diff))
-                self.angle %= 360
-            else:
-                # Move forward when pointing in the right direction
-                self.position[0] += self.speed * math.cos(math.radians(self.angle))
-                self.position[1] += self.speed * math.sin(math.radians(self.angle))
\ No newline at end of file
+        # Heading error to the target
+        angle_diff = (target_angle - self.angle) % 360
+        if angle_diff > 180:
+            angle_diff -= 360
+
+        # Turn toward the target, proportionally to the error, while driving
+        turn_rate = max(-self.max_turn_rate, min(self.max_turn_rate, self.heading_gain * angle_diff))
+        if abs(angle_diff) >= self.turn_in_place_angle:
+            speed = 0  # Facing too far off; turn on the spot first
+        else:
+            speed = self.max_speed * math.cos(math.radians(angle_diff))
+            # Slow down enough that the tightest possible turn still passes through the target
+            sin_diff = abs(math.sin(math.radians(angle_diff)))
+            if sin_diff > 1e-6:
+                speed = min(speed, math.radians(self.max_turn_rate) * distance / (2 * sin_diff))
+
+        # Unicycle kinematics, integrated at the mid-step heading
+        heading = math.radians(self.angle + turn_rate * step / 2)
+        self.position[0] += speed * step * math.cos(heading)
+        self.position[1] += speed * step * math.sin(heading)
+        self.angle = (self.angle + turn_rate * step) % 360
+
+        # If we stop getting closer to the target for too long, request a new path
+        if distance < self.closest_distance - 1:
+            self.closest_distance = distance
+            self.stuck_time = 0.0
+        else:
+            self.stuck_time += step
+            if self.stuck_time > self.stuck_timeout:
+                self.current_path = None
+                self.stuck_time = 0.0
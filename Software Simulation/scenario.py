@@ -0,0 +1,112 @@
+import argparse
+import gzip
+import json
+import os
+from collections import namedtuple
+import pygame
+
+from map import World
+
+SCENARIO_VERSION = 1
+
+# A world with its counters and robot spawn points. spawn_points is a list of
+# {"location", "position", "stationary"} dicts; robots get ids in list order.
+Scenario = namedtuple("Scenario", ["world", "counter_positions", "spawn_points", "metadata"])
+
+# Fixed corpus for benchmarks, from small maps to terminal scale: (name, width, height)
+CORPUS_SIZES = [
+    ("small", 500, 500),
+    ("medium", 1000, 1000),
+    ("large", 2000, 2000),
+    ("terminal", 4000, 3000),
+]
+
+def default_counter_positions(width, height):
+    """The simulator's counter layout, centred on a width x height world and scaled to it"""
+    center_x, center_y = width // 2, height // 2
+    scale = min(width, height) / 1000
+    offsets = {
+        "source": (0, 0),
+        "customer": (200, 200),
+        "counter1-A": (-300, -100),
+        "counter1-B": (-300, 100),
+        "counter2-A": (0, -300),
+        "counter2-B": (0, 300),
+        "counter3-A": (300, -100),
+        "counter3-B": (300, 100),
+    }
+    return {name: [center_x + int(dx * scale), center_y + int(dy * scale)] for name, (dx, dy) in offsets.items()}
+
+def default_spawn_points(counter_positions):
+    """The simulator's robots: 10 in all, one mobile robot starting at the source"""
+    spawns = [("source", True)] * 2  # Stationary robots at the source
+    spawns += [("counter1-A", True), ("counter1-A", True), ("counter1-B", True),
+               ("counter3-A", True), ("counter3-B", True)]
+    spawns.append(("source", False))  # The mobile robot
+    spawns += [("source", True)] * (10 - len(spawns))
+
+    return [{"location": location, "position": list(counter_positions[location]), "stationary": stationary}
+            for location, stationary in spawns]
+
+def generate_scenario(width, height, seed, density=0.3, distribution="uniform", clearance=40):
+    """
+    Generate a seeded scenario with the default counter layout
+
+    Obstacles are kept clearance pixels away from every counter.
+    """
+    counter_positions = default_counter_positions(width, height)
+    keep_clear = [(x, y, clearance) for x, y in counter_positions.values()]
+    world = World(width, height, seed=seed, density=density, distribution=distribution, keep_clear=keep_clear)
+    metadata = {"seed": seed, "density": density, "distribution": distribution}
+    return Scenario(world, counter_positions, default_spawn_points(counter_positions), metadata)
+
+def save_scenario(path, world, counter_positions, spawn_points, **metadata):
+    """
+    Save a scenario as gzipped JSON
+
+    Obstacles are stored as a flat [x, y, w, h, ...] list; the boundary
+    walls are left out since World recreates them.
+    """
+    data = {
+        "version": SCENARIO_VERSION,
+        "width": world.width,
+        "height": world.height,
+        "obstacles": [value for rect in world.obstacles[4:] for value in (rect.x, rect.y, rect.w, rect.h)],
+        "counter_positions": counter_positions,
+        "spawn_points": spawn_points,
+        "metadata": {"seed": world.seed, **metadata},
+    }
+    # A fixed gzip timestamp keeps regenerated corpus files byte-identical
+    with open(path, "wb") as f:
+        f.write(gzip.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"), mtime=0))
+
+def load_scenario(path):
+    """Load a scenario written by save_scenario"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != SCENARIO_VERSION:
+        raise ValueError(f"Unsupported scenario version {data.get('version')}")
+
+    world = World(data["width"], data["height"], seed=data["metadata"].get("seed"), generate=False)
+    values = data["obstacles"]
+    world.obstacles.extend(pygame.Rect(*values[i:i + 4]) for i in range(0, len(values), 4))
+    return Scenario(world, data["counter_positions"], data["spawn_points"], data["metadata"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the fixed benchmark scenario corpus")
+    parser.add_argument("--output", default="scenarios", help="Directory to write scenarios to")
+    parser.add_argument("--seed", type=int, default=0, help="Base random seed")
+    parser.add_argument("--density", type=float, default=0.3, help="Fraction of each map covered by obstacles")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    for index, (name, width, height) in enumerate(CORPUS_SIZES):
+        for distribution in ("uniform", "clustered"):
+            scenario = generate_scenario(width, height, args.seed + index, args.density, distribution)
+            path = os.path.join(args.output, f"{name}_{distribution}.json.gz")
+            save_scenario(path, scenario.world, scenario.counter_positions, scenario.spawn_points,
+                          **scenario.metadata)
+            print(f"{path}: {width}x{height}, {len(scenario.world.obstacles) - 4} obstacles")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import json
+import socket
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+
+# Telemetry stream: length-prefixed messages over a local TCP connection.
+# A subscriber first receives a keyframe (the whole occupancy grid,
+# compressed), then only the cells that changed since the previous update,
+# plus the robots' state.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MESSAGE_HEADER = struct.Struct("<BII")  # kind, sequence, payload length
+GRID_HEADER = struct.Struct("<II")  # width, height
+DELTA_HEADER = struct.Struct("<III")  # width, height, changed cells
+
+MAP_KEYFRAME = 1
+MAP_DELTA = 2
+ROBOT_STATE = 3
+
+def encode_message(kind, sequence, payload):
+    return MESSAGE_HEADER.pack(kind, sequence, len(payload)) + payload
+
+def encode_keyframe(grid):
+    width, height = grid.shape
+    return GRID_HEADER.pack(width, height) + zlib.compress(np.ascontiguousarray(grid, dtype=np.uint8).tobytes())
+
+def encode_delta(grid, previous):
+    """
+    Cells of grid that differ from previous (same shape)
+
+    Returns:
+        Payload of flat cell indices (uint32) followed by their new values
+        (uint8), or None when nothing changed
+    """
+    changed = np.flatnonzero(grid != previous)
+    if not len(changed):
+        return None
+    width, height = grid.shape
+    values = grid.reshape(-1)[changed]
+    return (DELTA_HEADER.pack(width, height, len(changed)) +
+            changed.astype(np.uint32).tobytes() + values.astype(np.uint8).tobytes())
+
+def decode_keyframe(payload):
+    width, height = GRID_HEADER.unpack_from(payload)
+    data = zlib.decompress(payload[GRID_HEADER.size:])
+    return np.frombuffer(data, dtype=np.uint8).reshape(width, height).copy()
+
+def apply_delta(grid, payload):
+    """Apply a delta payload to grid in place; returns the number of cells changed"""
+    width, height, count = DELTA_HEADER.unpack_from(payload)
+    if grid is None or grid.shape != (width, height):
+        raise ValueError(f"Delta for a {width}x{height} grid does not match the current map")
+    offset = DELTA_HEADER.size
+    cells = np.frombuffer(payload, dtype=np.uint32, count=count, offset=offset)
+    values = np.frombuffer(payload, dtype=np.uint8, count=count, offset=offset + 4 * count)
+    grid.reshape(-1)[cells] = values
+    return count
+
+class TelemetryPublisher:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, send_timeout=0.05):
+        """
+        Streams the occupancy map and robot state to subscribers
+
+        The publisher listens on a local TCP port and never blocks the main
+        loop waiting for subscribers: connections are accepted when
+        publishing, and a subscriber too slow to take an update within
+        send_timeout is dropped (it reconnects and gets a fresh keyframe).
+
+        Args:
+            host, port: Address to listen on (port 0 picks a free one)
+            send_timeout: Seconds a send to one subscriber may take
+        """
+        self.send_timeout = send_timeout
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen()
+        self.server.setblocking(False)
+        self.address = self.server.getsockname()
+
+        self.clients = []
+        self.sequence = 0
+        self.last_grid = None  # Map as of the last update, what deltas are computed against
+        self.last_publish = time.perf_counter()
+        self.bytes_sent = 0
+
+    def accept(self):
+        """Accept waiting subscribers and bring them up to date with a keyframe"""
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except (BlockingIOError, OSError):
+                return
+            client.settimeout(self.send_timeout)
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.last_grid is not None:
+                if not self.send(client, encode_message(MAP_KEYFRAME, self.sequence, encode_keyframe(self.last_grid))):
+                    continue
+            self.clients.append(client)
+
+    def send(self, client, message):
+        try:
+            client.sendall(message)
+        except OSError:
+            client.close()
+            return False
+        self.bytes_sent += len(message)
+        return True
+
+    def broadcast(self, message):
+        self.clients = [client for client in self.clients if self.send(client, message)]
+
+    def publish(self, grid, robots):
+        """
+        Send one update
+
+        Args:
+            grid: Occupancy grid (0 = Unknown, 1 = Free, 2 = Tentative, 3 = Confirmed)
+            robots: List of JSON-serializable robot state dicts
+        """
+        self.accept()
+        self.sequence += 1
+        if self.clients:
+            if self.last_grid is None or self.last_grid.shape != grid.shape:
+                self.broadcast(encode_message(MAP_KEYFRAME, self.sequence, encode_keyframe(grid)))
+            else:
+                delta = encode_delta(grid, self.last_grid)
+                if delta is not None:
+                    self.broadcast(encode_message(MAP_DELTA, self.sequence, delta))
+            state = json.dumps({"time": time.time(), "robots": robots}).encode()
+            self.broadcast(encode_message(ROBOT_STATE, self.sequence, state))
+        self.last_grid = np.array(grid, dtype=np.uint8)
+
+    def maybe_publish(self, interval, grid, robot_states):
+        """
+        Publish if interval seconds have passed since the last update
+
+        robot_states() is only called when an update is due, so building the
+        robots' state costs nothing on the frames in between.
+        """
+        now = time.perf_counter()
+        if now - self.last_publish >= interval:
+            self.last_publish = now
+            self.publish(grid, robot_states())
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+        self.clients = []
+        self.server.close()
+
+class TelemetrySubscriber:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, reconnect_interval=1.0):
+        """
+        Keeps a live copy of a publisher's map and robot state
+
+        A background thread connects (retrying every reconnect_interval
+        seconds), applies keyframes and deltas to a local grid as they
+        arrive, and keeps the latest robot state. Readers take consistent
+        copies with snapshot().
+        """
+        self.host = host
+        self.port = port
+        self.reconnect_interval = reconnect_interval
+        self.lock = threading.Lock()
+        self.grid = None
+        self.robots = []
+        self.state_time = None  # Publisher timestamp of the robot state
+        self.version = 0  # Bumped by every applied update
+        self.connected = False
+        self.stats = {"keyframes": 0, "deltas": 0, "cells": 0, "bytes": 0}
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                with socket.create_connection((self.host, self.port), timeout=self.reconnect_interval) as connection:
+                    connection.settimeout(0.5)  # Wake up now and then to notice stop()
+                    self.connected = True
+                    self.receive(connection)
+            except (OSError, ValueError, zlib.error):
+                pass
+            self.connected = False
+            self.stop_event.wait(self.reconnect_interval)
+
+    def receive(self, connection):
+        """Apply messages from connection until it closes"""
+        buffer = bytearray()
+        while not self.stop_event.is_set():
+            try:
+                data = connection.recv(65536)
+            except socket.timeout:
+                continue
+            if not data:
+                return
+            buffer += data
+
+            # Apply every complete message received so far
+            while len(buffer) >= MESSAGE_HEADER.size:
+                kind, sequence, length = MESSAGE_HEADER.unpack_from(buffer)
+                end = MESSAGE_HEADER.size + length
+                if len(buffer) < end:
+                    break
+                self.apply(kind, bytes(buffer[MESSAGE_HEADER.size:end]))
+                del buffer[:end]
+
+    def apply(self, kind, payload):
+        with self.lock:
+            if kind == MAP_KEYFRAME:
+                self.grid = decode_keyframe(payload)
+                self.stats["keyframes"] += 1
+            elif kind == MAP_DELTA:
+                self.stats["cells"] += apply_delta(self.grid, payload)
+                self.stats["deltas"] += 1
+            elif kind == ROBOT_STATE:
+                state = json.loads(payload)
+                self.robots = state["robots"]
+                self.state_time = state["time"]
+            self.stats["bytes"] += MESSAGE_HEADER.size + len(payload)
+            self.version += 1
+
+    def snapshot(self):
+        """
+        Returns:
+            (version, grid copy or None, robots, publisher timestamp)
+        """
+        with self.lock:
+            grid = self.grid.copy() if self.grid is not None else None
+            return self.version, grid, list(self.robots), self.state_time
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join(timeout=1.0)
@@ -0,0 +1,85 @@
+import numpy as np
+import pygame
+
+class Viewport:
+    def __init__(self, rect, zoom=1.0, min_zoom=0.1, max_zoom=4.0):
+        """
+        Camera mapping world coordinates onto an area of the screen
+
+        The camera looks at center (a world position), which appears at the
+        middle of rect. Everything drawn through the viewport is culled
+        against rect first, so drawing cost follows what is on screen rather
+        than the size of the map or fleet.
+
+        Args:
+            rect: Screen area the world is drawn in (pygame.Rect)
+            zoom: Screen pixels per world unit
+            min_zoom, max_zoom: Limits for zoom_by
+        """
+        self.rect = pygame.Rect(rect)
+        self.zoom = zoom
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.center = (0.0, 0.0)
+
+    def follow(self, position):
+        """Center the camera on a world position"""
+        self.center = (position[0], position[1])
+
+    def zoom_by(self, factor):
+        self.zoom = min(max(self.zoom * factor, self.min_zoom), self.max_zoom)
+
+    def offset(self):
+        """Screen position of the world origin"""
+        return (self.rect.centerx - self.center[0] * self.zoom,
+                self.rect.centery - self.center[1] * self.zoom)
+
+    def to_screen(self, point):
+        """Screen position of one world point, as integers"""
+        offset_x, offset_y = self.offset()
+        return int(point[0] * self.zoom + offset_x), int(point[1] * self.zoom + offset_y)
+
+    def to_screen_array(self, points):
+        """Screen positions of many world points at once, as an (n, 2) float array"""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return points * self.zoom + self.offset()
+
+    def visible_mask(self, screen_points, margin=0):
+        """Which screen points lie within the viewport (widened by margin pixels)"""
+        x, y = screen_points[:, 0], screen_points[:, 1]
+        return ((x >= self.rect.left - margin) & (x < self.rect.right + margin) &
+                (y >= self.rect.top - margin) & (y < self.rect.bottom + margin))
+
+    def is_visible(self, screen_point, margin=0):
+        x, y = screen_point
+        return (self.rect.left - margin <= x < self.rect.right + margin and
+                self.rect.top - margin <= y < self.rect.bottom + margin)
+
+    def visible_runs(self, screen_points, margin=0):
+        """
+        Split a polyline into the runs of points worth drawing
+
+        A point is kept if it, or a neighbour along the line, is visible, so
+        segments crossing the viewport edge are still drawn (and clipped).
+
+        Returns:
+            List of point lists with at least two points each
+        """
+        if len(screen_points) < 2:
+            return []
+        visible = self.visible_mask(screen_points, margin)
+        keep = visible.copy()
+        keep[1:] |= visible[:-1]
+        keep[:-1] |= visible[1:]
+
+        # Boundaries between kept and skipped stretches
+        edges = np.flatnonzero(np.diff(keep.astype(np.int8))) + 1
+        runs = np.split(screen_points, edges)
+        starts = np.concatenate(([0], edges))
+        return [run.tolist() for start, run in zip(starts, runs) if keep[start] and len(run) > 1]
+
+    def visible_world_rect(self):
+        """World-space (left, top, right, bottom) of the area the viewport shows"""
+        offset_x, offset_y = self.offset()
+        return ((self.rect.left - offset_x) / self.zoom, (self.rect.top - offset_y) / self.zoom,
+                (self.rect.right - offset_x) / self.zoom, (self.rect.bottom - offset_y) / self.zoom)
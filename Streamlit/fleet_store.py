@@ -0,0 +1,162 @@
+import sqlite3
+import threading
+
+# Dimensions the fleet is aggregated by, and the battery buckets (upper bounds in %)
+DIMENSIONS = ("status", "battery_bucket", "location")
+BATTERY_BUCKETS = [(20, "Critical (<20%)"), (50, "Low (20-50%)"), (80, "Medium (50-80%)"), (101, "High (>80%)")]
+UNKNOWN_BATTERY = "Unknown"
+COLUMNS = ["ID", "Status", "Battery", "Location", "Last Active"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trolleys (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    battery INTEGER,
+    battery_bucket TEXT NOT NULL,
+    location TEXT NOT NULL,
+    last_active TEXT
+);
+CREATE INDEX IF NOT EXISTS trolleys_status ON trolleys (status, id);
+CREATE INDEX IF NOT EXISTS trolleys_location ON trolleys (location, id);
+
+-- Trolley counts per dimension value, kept up to date by the triggers below
+CREATE TABLE IF NOT EXISTS fleet_counts (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, value)
+);
+"""
+FLEET_SIZE = "SELECT COALESCE(SUM(count), 0) FROM fleet_counts WHERE dimension = 'status'"
+
+def battery_bucket(battery):
+    if battery is None:
+        return UNKNOWN_BATTERY
+    return next(name for limit, name in BATTERY_BUCKETS if battery < limit)
+
+def count_triggers():
+    """Triggers adjusting fleet_counts on every insert, update and delete"""
+    def change(row, dimension, delta):
+        return (f"INSERT INTO fleet_counts VALUES ('{dimension}', {row}.{dimension}, {delta}) "
+                f"ON CONFLICT (dimension, value) DO UPDATE SET count = count + ({delta});")
+
+    add = "".join(change("NEW", dimension, 1) for dimension in DIMENSIONS)
+    remove = "".join(change("OLD", dimension, -1) for dimension in DIMENSIONS)
+    return f"""
+CREATE TRIGGER IF NOT EXISTS trolleys_insert AFTER INSERT ON trolleys BEGIN {add} END;
+CREATE TRIGGER IF NOT EXISTS trolleys_delete AFTER DELETE ON trolleys BEGIN {remove} END;
+CREATE TRIGGER IF NOT EXISTS trolleys_update AFTER UPDATE OF {", ".join(DIMENSIONS)} ON trolleys
+BEGIN {remove}{add} END;
+"""
+
+def filter_clause(status=None, location=None, id_prefix=None):
+    """WHERE clause and its parameters for the fleet table filters"""
+    conditions, parameters = [], []
+    if status:
+        conditions.append("status = ?")
+        parameters.append(status)
+    if location:
+        conditions.append("location = ?")
+        parameters.append(location)
+    if id_prefix:
+        conditions.append("id LIKE ? ESCAPE '\\'")
+        parameters.append(id_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), parameters
+
+class FleetStore:
+    def __init__(self, path=":memory:"):
+        """
+        Fleet state behind the admin dashboard
+
+        Trolleys live in an SQLite table, and their counts by status,
+        battery bucket and location are maintained by triggers as rows
+        change, so the dashboard metrics never scan the fleet. The table is
+        read a page at a time with filters applied in SQL, so a rerun costs
+        the same for 15 trolleys or 15000.
+
+        Args:
+            path: Database file (default: in memory, for this process only)
+        """
+        # Streamlit reruns scripts on different threads; one connection
+        # shared under a lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.connection.executescript(SCHEMA + count_triggers())
+
+    def upsert(self, trolleys):
+        """
+        Insert or update trolleys
+
+        Args:
+            trolleys: Dicts with the keys of COLUMNS ("Battery" may be None)
+        """
+        with self.lock, self.connection:
+            self.write(trolleys)
+
+    def replace(self, trolleys):
+        """
+        Make the fleet exactly trolleys, a full snapshot of it
+
+        Trolleys missing from the snapshot are deleted (their counts go with
+        them through the delete trigger) and values no trolley has any more
+        are dropped from the counts, all in one transaction.
+        """
+        with self.lock, self.connection:
+            self.write(trolleys)
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS snapshot_ids (id TEXT PRIMARY KEY)")
+            self.connection.execute("DELETE FROM snapshot_ids")
+            self.connection.executemany("INSERT OR IGNORE INTO snapshot_ids VALUES (?)",
+                                        [(trolley["ID"],) for trolley in trolleys])
+            self.connection.execute("DELETE FROM trolleys WHERE id NOT IN (SELECT id FROM snapshot_ids)")
+            self.connection.execute("DELETE FROM fleet_counts WHERE count = 0")
+
+    def write(self, trolleys):
+        """Insert or update trolleys; the caller holds the lock and the transaction"""
+        rows = [(trolley["ID"], trolley["Status"], trolley["Battery"], battery_bucket(trolley["Battery"]),
+                 trolley["Location"], trolley["Last Active"]) for trolley in trolleys]
+        self.connection.executemany(
+            "INSERT INTO trolleys VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+            "status = excluded.status, battery = excluded.battery, battery_bucket = excluded.battery_bucket, "
+            "location = excluded.location, last_active = excluded.last_active", rows)
+
+    def counts(self, dimension):
+        """Trolleys per value of dimension (one of DIMENSIONS), from the precomputed counts"""
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension {dimension}")
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT value, count FROM fleet_counts WHERE dimension = ? AND count > 0 ORDER BY value",
+                (dimension,)).fetchall()
+        return dict(rows)
+
+    def size(self):
+        """Number of trolleys, from the precomputed counts"""
+        with self.lock:
+            return self.connection.execute(FLEET_SIZE).fetchone()[0]
+
+    def count(self, status=None, location=None, id_prefix=None):
+        """Number of trolleys matching the filters (see page)"""
+        where, parameters = filter_clause(status, location, id_prefix)
+        # Without filters the total is known without counting rows
+        query = f"SELECT COUNT(*) FROM trolleys {where}" if where else FLEET_SIZE
+        with self.lock:
+            return self.connection.execute(query, parameters).fetchone()[0]
+
+    def page(self, page=0, page_size=50, status=None, location=None, id_prefix=None):
+        """
+        One page of the fleet table, filtered and ordered by ID in SQL
+
+        Args:
+            page: Page number, from 0
+            status, location: Only trolleys with this status / at this location
+            id_prefix: Only trolleys whose ID starts with this
+
+        Returns:
+            Rows as tuples in COLUMNS order
+        """
+        where, parameters = filter_clause(status, location, id_prefix)
+        with self.lock:
+            return self.connection.execute(
+                f"SELECT id, status, battery, location, last_active FROM trolleys {where} "
+                f"ORDER BY id LIMIT ? OFFSET ?", parameters + [page_size, page * page_size]).fetchall()
@@ -3,6 +3,7 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import time
+import threading
 from datetime import datetime
 import random
 import base64
@@ -10,6 +11,9 @@ from io import BytesIO
 from PIL import Image, ImageDraw, ImageFont
 import qrcode
 
+from telemetry import TelemetrySubscriber, DEFAULT_HOST, DEFAULT_PORT
+from fleet_store import FleetStore, BATTERY_BUCKETS, UNKNOWN_BATTERY, COLUMNS
+
 # Set page configuration
 st.set_page_config(
     page_title="TragerX Dashboard",
@@ -18,7 +22,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Function to create a simple logo image
+# Function to create a simple logo image (encoded once, not on every rerun)
+@st.cache_data
 def create_logo_image():
     img = Image.new('RGB', (150, 150), color=(53, 106, 195))
     d = ImageDraw.Draw(img)
@@ -34,15 +39,18 @@ def create_logo_image():
 def create_qr_code_image():
     # Generate a random number between 1 and 3
     random_number = random.randint(1, 3)
-    
-    # Create a QR code with the random number as data
+    return encode_qr_code_image(random_number), random_number
+
+# QR code image for data; there are only a few codes, so each is encoded once
+@st.cache_data
+def encode_qr_code_image(data):
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
         box_size=10,
         border=4,
     )
-    qr.add_data(str(random_number))  # Embed the random number in the QR code
+    qr.add_data(str(data))  # Embed the random number in the QR code
     qr.make(fit=True)
     
     # Create an image from the QR code
@@ -52,7 +60,7 @@ def create_qr_code_image():
     buffered = BytesIO()
     qr_img.save(buffered, format="PNG")
     img_str = base64.b64encode(buffered.getvalue()).decode()
-    return f"data:image/png;base64,{img_str}", random_number
+    return f"data:image/png;base64,{img_str}"
 
 # Function to generate airline and counter numbers based on the QR code data
 def generate_airline_and_counter(qr_data):
@@ -82,7 +90,33 @@ st.sidebar.image(logo_image, width=150)
 # User type selection
 user_type = st.sidebar.radio("User Type", ["Admin", "User"])
 
-# Function to simulate trolley data
+# Live telemetry from the simulator or robot (started with --telemetry-port).
+# One subscriber is kept across reruns and sessions; changing the port stops
+# it and connects a new one, so typed-in ports don't leave threads behind
+@st.cache_resource
+def telemetry_connection():
+    return {"subscriber": None, "lock": threading.Lock()}
+
+def get_telemetry_subscriber(host, port):
+    connection = telemetry_connection()
+    with connection["lock"]:
+        subscriber = connection["subscriber"]
+        if subscriber is None or (subscriber.host, subscriber.port) != (host, port):
+            if subscriber is not None:
+                subscriber.stop()
+            subscriber = connection["subscriber"] = TelemetrySubscriber(host, port)
+        return subscriber
+
+st.sidebar.subheader("Live Telemetry")
+telemetry_port = st.sidebar.number_input("Telemetry Port", min_value=1, max_value=65535, value=DEFAULT_PORT)
+telemetry = get_telemetry_subscriber(DEFAULT_HOST, int(telemetry_port))
+if telemetry.connected:
+    st.sidebar.success(f"Connected: {telemetry.stats['keyframes']} keyframes, {telemetry.stats['deltas']} updates, "
+                       f"{telemetry.stats['bytes'] / 1024:.1f} KB received")
+else:
+    st.sidebar.info("Not connected, showing demo data")
+
+# Function to simulate trolley data (list of fleet table rows)
 def generate_trolley_data(num_trolleys=10):
     trolleys = []
     statuses = ["Active", "Idle", "Charging", "Maintenance"]
@@ -102,9 +136,64 @@ def generate_trolley_data(num_trolleys=10):
             "Last Active": last_active
         })
     
-    return pd.DataFrame(trolleys)
+    return trolleys
+
+# Live trolleys away from a named location are placed in zones of a coarse
+# grid over the map (world units), so the fleet's locations stay a short,
+# stable list as trolleys move
+LIVE_ZONE_SIZE = 300
+
+def live_location(robot):
+    if robot.get("location"):
+        return robot["location"]
+    column = max(0, int(robot["position"][0] // LIVE_ZONE_SIZE))
+    row = max(0, int(robot["position"][1] // LIVE_ZONE_SIZE))
+    return f"Zone {chr(ord('A') + min(column, 25))}{row + 1}"
+
+# Fleet table rows from live robot states
+def live_trolley_data(robots, state_time):
+    trolleys = []
+    last_active = datetime.fromtimestamp(state_time).strftime("%H:%M:%S") if state_time else ""
+
+    for robot in robots:
+        if robot.get("location") == "source" and robot.get("workflow_state") in (None, "idle"):
+            status = "Charging"  # Parked at the charging station
+        elif robot.get("stationary") or robot.get("waiting") or robot.get("workflow_state") in (None, "idle"):
+            status = "Idle"
+        else:
+            status = "Active"
+
+        trolleys.append({
+            "ID": f"TX-{robot['id']:03d}",
+            "Status": status,
+            "Battery": None,  # Not reported by the robots yet
+            "Location": live_location(robot),
+            "Last Active": last_active
+        })
 
-# Simulated SLAM map data
+    return trolleys
+
+DEMO_FLEET_SIZE = 15
+FLEET_PAGE_SIZES = [25, 50, 100]
+
+# Fleet state behind the admin view, one store per data source kept across
+# reruns and sessions; the demo fleet is generated once
+@st.cache_resource
+def get_fleet_store(source):
+    store = FleetStore()
+    if source == "demo":
+        store.upsert(generate_trolley_data(DEMO_FLEET_SIZE))
+    return store
+
+# Live map: the SLAM grid is indexed [x, y] in 10 unit cells and robot
+# positions are in world units, so transpose to rows of y and scale
+def live_map_data(grid, robots):
+    robot_cells = [(robot["position"][1] / 10, robot["position"][0] / 10) for robot in robots]
+    labels = [f"TX-{robot['id']:03d}" for robot in robots]
+    return grid.T, robot_cells, labels
+
+# Simulated SLAM map data (the same every time, so built once)
+@st.cache_data
 def generate_map_data(size=50):
     # Create a grid with: 
     # 0: Unknown (Black)
@@ -130,31 +219,56 @@ def generate_map_data(size=50):
     
     return grid, robot_pos
 
-# Create a heatmap from grid data
-def create_slam_map(grid, robot_pos):
-    # Color mapping
-    colors = [
-        [0, 0, 0, 1],       # Black (Unknown)
-        [0.8, 0.8, 0.8, 1],  # Grey (Free space)
-        [1, 1, 0, 1],        # Yellow (Tentative obstacle)
-        [1, 0, 0, 1]         # Red (Confirmed obstacle)
-    ]
-    
-    colorscale = []
-    for i, color in enumerate(colors):
-        colorscale.append([i/3, f'rgba({int(color[0]*255)},{int(color[1]*255)},{int(color[2]*255)},{color[3]})'])
-    
+# Map colors, indexed by cell value
+SLAM_COLORS = [
+    [0, 0, 0, 1],       # Black (Unknown)
+    [0.8, 0.8, 0.8, 1],  # Grey (Free space)
+    [1, 1, 0, 1],        # Yellow (Tentative obstacle)
+    [1, 0, 0, 1]         # Red (Confirmed obstacle)
+]
+SLAM_COLORSCALE = [[i/3, f'rgba({int(color[0]*255)},{int(color[1]*255)},{int(color[2]*255)},{color[3]})']
+                   for i, color in enumerate(SLAM_COLORS)]
+MAX_MAP_CELLS = 150  # Largest map side sent to the browser; bigger maps are downsampled
+
+# Shrink a map so neither side exceeds max_cells, keeping the highest value
+# (the most certain obstacle) of each block so obstacles never disappear
+def downsample_map(grid, max_cells=MAX_MAP_CELLS):
+    factor = -(-max(grid.shape) // max_cells)
+    if factor <= 1:
+        return grid, 1
+    rows, cols = -(-grid.shape[0] // factor), -(-grid.shape[1] // factor)
+    padded = np.zeros((rows * factor, cols * factor), dtype=grid.dtype)
+    padded[:grid.shape[0], :grid.shape[1]] = grid
+    return padded.reshape(rows, factor, cols, factor).max(axis=(1, 3)), factor
+
+# Replace the map and robot positions of a figure made by create_slam_map
+def update_slam_map(fig, grid, robot_pos, labels=None):
+    grid, factor = downsample_map(np.asarray(grid))
+    positions = robot_pos if isinstance(robot_pos, list) else [robot_pos]
+    
+    # Downsampled cells are drawn factor cells wide, so the axes (and robot
+    # positions) stay in map cells
+    fig.data[0].update(z=grid, x0=(factor - 1) / 2, dx=factor, y0=(factor - 1) / 2, dy=factor)
+    fig.data[1].update(
+        x=[pos[1] for pos in positions],
+        y=[pos[0] for pos in positions],
+        text=labels,
+        mode='markers+text' if labels else 'markers',
+    )
+    return fig
+
+# Create a heatmap from grid data (robot_pos is one (row, col) position or a list of them)
+def create_slam_map(grid, robot_pos, labels=None):
     fig = go.Figure(data=go.Heatmap(
-        z=grid,
-        colorscale=colorscale,
+        colorscale=SLAM_COLORSCALE,
+        zmin=0,
+        zmax=3,
         showscale=False,
     ))
     
-    # Add robot position
+    # Add robot positions
     fig.add_trace(go.Scatter(
-        x=[robot_pos[1]],
-        y=[robot_pos[0]],
-        mode='markers',
+        textposition='top center',
         marker=dict(
             symbol='circle',
             color='blue',
@@ -170,52 +284,92 @@ def create_slam_map(grid, robot_pos):
         yaxis=dict(scaleanchor='x', scaleratio=1),
     )
     
-    return fig
+    return update_slam_map(fig, grid, robot_pos, labels)
+
+# Map figure for the chart named key, kept in the session across reruns;
+# only its map and robot data are replaced
+def slam_map_figure(key, grid, robot_pos, labels=None):
+    if key not in st.session_state:
+        st.session_state[key] = create_slam_map(grid, robot_pos, labels)
+        return st.session_state[key]
+    return update_slam_map(st.session_state[key], grid, robot_pos, labels)
 
 # Admin Dashboard
 if user_type == "Admin":
     st.title("TragerX Admin Dashboard")
     
+    telemetry_version, live_grid, live_robots, state_time = telemetry.snapshot()
+    live = live_grid is not None and bool(live_robots)
+    
     # Dashboard metrics
     col1, col2, col3, col4 = st.columns(4)
     
+    # Metrics, charts and the table all read the fleet store; its counts
+    # are kept up to date as trolleys change, so nothing here scans the fleet.
+    # Each telemetry update is the whole live fleet, so trolleys that left it
+    # (or a restarted simulator's old fleet) are dropped
+    if live:
+        fleet = get_fleet_store("live")
+        fleet.replace(live_trolley_data(live_robots, state_time))
+    else:
+        fleet = get_fleet_store("demo")
+    status_counts = fleet.counts("status")
+    
     with col1:
-        st.metric(label="Active Trolleys", value=random.randint(15, 30))
+        st.metric(label="Active Trolleys", value=status_counts.get("Active", 0))
     with col2:
-        st.metric(label="Idle Trolleys", value=random.randint(5, 15))
+        st.metric(label="Idle Trolleys", value=status_counts.get("Idle", 0))
     with col3:
-        st.metric(label="Charging", value=random.randint(3, 10))
+        st.metric(label="Charging", value=status_counts.get("Charging", 0))
     with col4:
-        st.metric(label="Maintenance", value=random.randint(0, 5))
+        st.metric(label="Maintenance", value=status_counts.get("Maintenance", 0))
     
     # Maps and trolley monitoring
     col1, col2 = st.columns([2, 1])
     
     with col1:
         st.subheader("Real-time SLAM Mapping")
-        grid, robot_pos = generate_map_data()
-        map_fig = create_slam_map(grid, robot_pos)
-        map_chart = st.plotly_chart(map_fig, use_container_width=True)
+        if live:
+            map_fig = slam_map_figure("admin_map", *live_map_data(live_grid, live_robots))
+        else:
+            grid, robot_pos = generate_map_data()
+            map_fig = slam_map_figure("admin_map", grid, robot_pos)
+        map_chart = st.empty()
+        map_chart.plotly_chart(map_fig, use_container_width=True)
+        
+        if live and st.button("Follow Live Telemetry"):
+            # Follow the stream for a while; the figure is only updated when
+            # an update arrived, and only its map and robot data are replaced
+            for i in range(60):
+                time.sleep(0.5)
+                version, grid, robots, state_time = telemetry.snapshot()
+                if version == telemetry_version or grid is None:
+                    continue
+                telemetry_version = version
+                update_slam_map(map_fig, *live_map_data(grid, robots))
+                map_chart.plotly_chart(map_fig, use_container_width=True)
         
         # Simulate real-time updates if button is clicked
-        if st.button("Simulate Movement"):
+        if not live and st.button("Simulate Movement"):
             for i in range(5):
-                grid, robot_pos = generate_map_data()
-                # Modify robot position to show movement
-                robot_pos = (robot_pos[0] + random.randint(-3, 3), 
+                # Modify robot position to show movement; the map stays the same
+                moved_pos = (robot_pos[0] + random.randint(-3, 3), 
                              robot_pos[1] + random.randint(-3, 3))
-                new_map = create_slam_map(grid, robot_pos)
-                map_chart.plotly_chart(new_map, use_container_width=True)
+                update_slam_map(map_fig, grid, moved_pos)
+                map_chart.plotly_chart(map_fig, use_container_width=True)
                 time.sleep(1)
     
     with col2:
         st.subheader("System Status")
         
         # Battery status chart
+        battery_counts = fleet.counts("battery_bucket")
+        levels = [name for _, name in BATTERY_BUCKETS]
+        if battery_counts.get(UNKNOWN_BATTERY):
+            levels.append(UNKNOWN_BATTERY)
         battery_data = {
-            'Level': ['Critical (<20%)', 'Low (20-50%)', 'Medium (50-80%)', 'High (>80%)'],
-            'Count': [random.randint(0, 3), random.randint(2, 8), 
-                      random.randint(5, 15), random.randint(10, 20)]
+            'Level': levels,
+            'Count': [battery_counts.get(level, 0) for level in levels]
         }
         battery_df = pd.DataFrame(battery_data)
         st.bar_chart(battery_df.set_index('Level'))
@@ -233,11 +387,33 @@ if user_type == "Admin":
     
     # Trolley management table
     st.subheader("Trolley Fleet Management")
-    trolleys_df = generate_trolley_data(15)
+    
+    # Filters and paging are applied by the store, so only one page of the
+    # fleet is ever sent to the browser
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+    with filter_col1:
+        status_filter = st.selectbox("Status", ["All"] + list(status_counts))
+    with filter_col2:
+        location_filter = st.selectbox("Location", ["All"] + list(fleet.counts("location")))
+    with filter_col3:
+        id_filter = st.text_input("Trolley ID")
+    with filter_col4:
+        page_size = st.selectbox("Rows per Page", FLEET_PAGE_SIZES)
+    
+    filters = dict(
+        status=None if status_filter == "All" else status_filter,
+        location=None if location_filter == "All" else location_filter,
+        id_prefix=id_filter.strip() or None,
+    )
+    matching = fleet.count(**filters)
+    page_count = max(1, -(-matching // page_size))
+    page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1)
+    trolleys_df = pd.DataFrame(fleet.page(page - 1, page_size, **filters), columns=COLUMNS)
     
     # Add action buttons
     df_with_actions = trolleys_df.copy()
     st.dataframe(df_with_actions, use_container_width=True)
+    st.caption(f"Showing {len(trolleys_df)} of {matching} matching trolleys ({fleet.size()} in the fleet)")
     
     # Trolley control section
     st.subheader("Trolley Control")
@@ -347,7 +523,7 @@ else:
                     # Simple map showing trolley location
                     st.write("Trolley Location:")
                     grid, robot_pos = generate_map_data(30)
-                    map_fig = create_slam_map(grid, robot_pos)
+                    map_fig = slam_map_figure("user_map", grid, robot_pos)
                     st.plotly_chart(map_fig, use_container_width=True)
             else:
                 st.info("You don't have an active trolley. Please request one from the 'Request Trolley' tab.")